@@ -31,6 +31,8 @@
 # partner consortium (www.5gtango.eu).
 
 import os
+import queue
+import threading
 import tempfile
 import argparse
 import logging
@@ -38,21 +40,21 @@ import coloredlogs
 import time
 import shutil
 import subprocess
-from tngsdk.benchmark.experiment import ServiceExperiment, FunctionExperiment
-from tngsdk.benchmark.generator.sonata \
-                import SonataServiceConfigurationGenerator
-from tngsdk.benchmark.generator.tango \
-                import TangoServiceConfigurationGenerator
-from tngsdk.benchmark.executor import Executor
 from tngsdk.benchmark.helper import read_yaml, get_prometheus_path
-from tngsdk.benchmark.ietf import IetfBmwgVnfBD_Generator
-from tngsdk.benchmark.resultprocessor.vimemu import VimemuResultProcessor
 from tngsdk.benchmark.logger import TangoLogger
+from tngsdk.benchmark.cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+# Attention: the components of the single phases (generators, executor,
+# result processors) are imported when the phase runs. They pull in heavy
+# dependencies (tngsdk.package, docker, pandas, pyangbind) which would
+# otherwise slow down the startup, e.g., of 'tng-bench --help'.
 
 
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
 
+PIPELINE_QUEUE_SIZE = 8  # max. generated but not yet executed configs
+
+
 def setup_logging(args):
     """
     Configure logging.
@@ -124,13 +126,28 @@ class ProfileManager(object):
         self.check_rd_existence()
         self.populate_experiments()
         # trigger experiment execution
-        self.cgen = self.load_generator()
-        if self.cgen is None:
-            return
-        self.generate_experiments()
-        if not self.args.no_prometheus:
-            self.start_prometheus_monitoring()
-        self.execute_experiments()
+        self.cgen = None
+        if not self.args.no_generation:
+            self.cgen = self.load_generator()
+        if self.args.pipeline and any(
+                ex.adaptive is not None for ex in self.service_experiments):
+            # adaptive experiments select from generated configurations
+            self.logger.warning(
+                "--pipeline not supported for adaptive experiments.")
+            self.args.pipeline = False
+        if self.args.pipeline:
+            if self.args.ibbd_dir is not None:
+                # BD generation needs the generated configurations
+                for ex in self.service_experiments:
+                    ex.materialize_configurations()
+            if not self.args.no_prometheus:
+                self.start_prometheus_monitoring()
+            self.generate_and_execute_experiments()
+        else:
+            self.generate_experiments()
+            if not self.args.no_prometheus:
+                self.start_prometheus_monitoring()
+            self.execute_experiments()
         self.process_results()
         self.copy_ped()
         if not self.args.no_prometheus:
@@ -140,6 +157,11 @@ class ProfileManager(object):
         if os.path.exists(self.args.result_dir):
             self.logger.info("Found old results: {}"
                              .format(self.args.result_dir))
+            if self.args.resume:
+                # keep finished runs, the executor skips them
+                self.logger.info("Resuming experiments in: {}"
+                                 .format(self.args.result_dir))
+                return
             # ask for overwrite (if not -y/--force-yes)
             if not self.args.force_yes:
                 # ask user
@@ -198,8 +220,12 @@ class ProfileManager(object):
         # select and instantiate configuration generator
         cgen = None
         if self.args.service_generator == "sonata":
+            from tngsdk.benchmark.generator.sonata \
+                import SonataServiceConfigurationGenerator
             cgen = SonataServiceConfigurationGenerator(self.args)
         if self.args.service_generator == "eu.5gtango":
+            from tngsdk.benchmark.generator.tango \
+                import TangoServiceConfigurationGenerator
             cgen = TangoServiceConfigurationGenerator(self.args)
         else:
             self.logger.error(
@@ -225,37 +251,84 @@ class ProfileManager(object):
         #    .project_path
         #    .package_path
         self.cgen.generate(
-            os.path.join(  # ensure that the reference is an absolute path
-                 os.path.dirname(
-                     self.ped.get("ped_path", "/")),
-                 self.ped.get("service_package")),
+            self._get_service_package_path(),
             self.function_experiments,
             self.service_experiments)
         # display generator statistics
         if not self.args.no_display:
             self.cgen.print_generation_and_packaging_statistics()
 
-    def execute_experiments(self):
+    def execute_experiments(self, ec_iter=None):
         if self.args.no_execution:
             print("Skipping execution: --no-execution")
             return
+        from tngsdk.benchmark.executor import Executor
         # create an executor
         exe = Executor(self.args, self.service_experiments)
         # prepare
         exe.setup()
         # run
-        exe.run()
+        exe.run(ec_iter)
         # clean
         exe.teardown()
 
+    def generate_and_execute_experiments(self):
+        """
+        Pipelined mode (--pipeline): The generator runs in a background
+        thread and puts each finished configuration into a bounded
+        queue from which the executor takes the configurations
+        as soon as they are available.
+        """
+        if self.args.no_generation or self.args.no_execution:
+            # nothing to overlap
+            self.generate_experiments()
+            self.execute_experiments()
+            return
+        ec_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+        gen_errors = list()
+
+        def _produce():
+            try:
+                for ec in self.cgen.generate_iter(
+                        self._get_service_package_path(),
+                        self.function_experiments,
+                        self.service_experiments):
+                    ec_queue.put(ec)
+            except BaseException as ex:
+                self.logger.exception("Generation failed")
+                gen_errors.append(ex)
+            finally:
+                ec_queue.put(None)  # end marker
+
+        producer = threading.Thread(target=_produce, name="generator")
+        producer.daemon = True
+        producer.start()
+        self.execute_experiments(iter(ec_queue.get, None))
+        producer.join()
+        if len(gen_errors) > 0:
+            raise gen_errors[0]
+        # display generator statistics
+        if not self.args.no_display:
+            self.cgen.print_generation_and_packaging_statistics()
+
     def process_results(self):
         if self.args.no_result:
             self.logger.info("Skipping results: --no-result")
             return
+        from tngsdk.benchmark.ietf import IetfBmwgVnfBD_Generator
+        from tngsdk.benchmark.resultprocessor.vimemu \
+            import VimemuResultProcessor
+        from tngsdk.benchmark.resultprocessor.prometheus \
+            import PrometheusResultProcessor
         # create result prcessor
         rp_list = list()
         rp_list.append(IetfBmwgVnfBD_Generator(
             self.args, self.service_experiments))
+        if (self.args.config is not None
+                and "prometheus" in self.args.config):
+            # needs to run before VimemuResultProcessor (adds aggregates)
+            rp_list.append(PrometheusResultProcessor(
+                self.args, self.service_experiments))
         rp_list.append(VimemuResultProcessor(
             self.args, self.service_experiments))
         self.logger.info("Prepared {} result processor(s)"
@@ -280,6 +353,12 @@ class ProfileManager(object):
             self.logger.error("Couldn't copy used PED to result folder.")
             self.logger.debug(ex)
 
+    def _get_service_package_path(self):
+        # ensure that the reference is an absolute path
+        return os.path.join(
+            os.path.dirname(self.ped.get("ped_path", "/")),
+            self.ped.get("service_package"))
+
     def _load_config(self, path):
         try:
             self.logger.info("Using config: {}".format(path))
@@ -330,8 +409,14 @@ class ProfileManager(object):
         :param input_ped: ped dictionary
         :return: service experiments list, function experiments list
         """
+        from tngsdk.benchmark.experiment import ServiceExperiment
+        from tngsdk.benchmark.experiment import FunctionExperiment
+        from tngsdk.benchmark.experiment import ExperimentConfiguration
         service_experiments = list()
         function_experiments = list()
+        # restart run_id numbering: the same PED always results in
+        # the same configuration to run_id mapping (needed by --resume)
+        ExperimentConfiguration.RUN_ID = 0
 
         # service experiments
         for e in input_ped.get("service_experiments", []):
@@ -457,6 +542,34 @@ def parse_args(manual_args=None,
         dest="no_result",
         action="store_true")
 
+    parser.add_argument(
+        "--result-workers",
+        help="Number of worker processes used during result processing"
+        + " (parsing run folders, generating IETF BMWG BDs). Default: 1",
+        required=False,
+        default=1,
+        type=int,
+        dest="result_workers")
+
+    parser.add_argument(
+        "--no-incremental",
+        help="Re-process all runs in the result directory. Default: Only"
+        + " parse new or changed runs (see result_manifest.json).",
+        required=False,
+        default=False,
+        dest="no_incremental",
+        action="store_true")
+
+    parser.add_argument(
+        "--result-format",
+        help="Format of the result tables: csv (default), or columnar"
+        + " parquet or feather (requires pyarrow), partitioned by"
+        + " experiment and config_id.",
+        required=False,
+        default="csv",
+        choices=["csv", "parquet", "feather"],
+        dest="result_format")
+
     parser.add_argument(
         "--validation",
         help="Skip all package validation steps.",
@@ -482,6 +595,51 @@ def parse_args(manual_args=None,
         default=None,
         dest="max_experiments")
 
+    parser.add_argument(
+        "--gen-workers",
+        help="Number of worker processes used to generate"
+        + " the experiment packages. Default: 1",
+        required=False,
+        default=1,
+        type=int,
+        dest="gen_workers")
+
+    parser.add_argument(
+        "--no-cache",
+        help="Do not use the persistent cache of unpacked"
+        + " and generated service packages.",
+        required=False,
+        default=False,
+        dest="no_cache",
+        action="store_true")
+
+    parser.add_argument(
+        "--cache-dir",
+        help="Folder of the persistent cache."
+        + " Default: '{}'".format(DEFAULT_CACHE_DIR),
+        required=False,
+        default=DEFAULT_CACHE_DIR,
+        dest="cache_dir")
+
+    parser.add_argument(
+        "--cache-size",
+        help="Maximum size of the persistent cache in MB. Least recently"
+        + " used entries are removed. Default: {}".format(
+            DEFAULT_CACHE_SIZE),
+        required=False,
+        default=DEFAULT_CACHE_SIZE,
+        type=int,
+        dest="cache_size")
+
+    parser.add_argument(
+        "--pipeline",
+        help="Start to execute experiments while the remaining"
+        + " experiment packages are still being generated.",
+        required=False,
+        default=False,
+        dest="pipeline",
+        action="store_true")
+
     parser.add_argument(
         "--no-display",
         help="Disable additional outputs.",
@@ -507,6 +665,25 @@ def parse_args(manual_args=None,
         default=None,
         dest="ibbd_dir")
 
+    parser.add_argument(
+        "--ibbd-mode",
+        help="Write a full BD per configuration ('full') or one base BD"
+        + " per experiment plus a JSON patch per configuration"
+        + " ('delta'). Default: full",
+        required=False,
+        default="full",
+        choices=["full", "delta"],
+        dest="ibbd_mode")
+
+    parser.add_argument(
+        "--ibbd-validate",
+        help="Validate each generated IETF BMWG BD against the"
+        + " vnf_bd model (slow).",
+        required=False,
+        default=False,
+        dest="ibbd_validate",
+        action="store_true")
+
     parser.add_argument(
         "-y",
         "--force-yes",
@@ -516,6 +693,36 @@ def parse_args(manual_args=None,
         dest="force_yes",
         action="store_true")
 
+    parser.add_argument(
+        "--all-targets",
+        help="Distribute the experiment configurations over all targets"
+        + " defined in the config file (one worker per target)."
+        + " Default: Only use the target named 'default'.",
+        required=False,
+        default=False,
+        dest="all_targets",
+        action="store_true")
+
+    parser.add_argument(
+        "--reuse-emulation",
+        help="Keep the emulation and service running between"
+        + " configurations that use the same package, e.g., repetitions."
+        + " Only the start/stop commands are re-executed.",
+        required=False,
+        default=False,
+        dest="reuse_emulation",
+        action="store_true")
+
+    parser.add_argument(
+        "--resume",
+        help="Keep existing results in the result directory and skip"
+        + " all configurations that were already executed."
+        + " Incomplete runs are executed again.",
+        required=False,
+        default=False,
+        dest="resume",
+        action="store_true")
+
     parser.add_argument(
         "--no-prometheus",
         help="Do not launch Prometheus automatically.",
@@ -0,0 +1,238 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import numpy as np
+from tngsdk.benchmark.logger import TangoLogger
+from tngsdk.benchmark.resultprocessor.vimemu import VimemuResultProcessor
+from tngsdk.benchmark.resultprocessor.vimemu import get_metric_column
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+KEY_REPETITION = "ep::header::all::repetition"
+KEY_CONFIG_ID = "ep::header::all::config_id"
+DEFAULT_TOLERANCE = .05  # max. uncertainty relative to observed range
+DEFAULT_NOISE = .01  # GP noise (relative to normalized metric variance)
+LENGTH_SCALES = [.1, .2, .5, 1., 2.]  # candidates for GP hyper parameter
+
+
+class AdaptiveExplorer(object):
+    """
+    Adaptive (model-guided) profiling of a single experiment.
+    Instead of executing all configurations, it fits a Gaussian
+    process to the metric of the finished configurations and
+    executes the configuration with the highest predicted
+    uncertainty next. Stops once the uncertainty of all remaining
+    configurations is below the target.
+    PED (experiment level):
+        adaptive:
+          metric: "mp.output__throughput"  # result.yml value of a container
+          parameters: ["ep::function::vnf0::cpu_bw"]  # default: all varied
+          initial: 3  # configurations executed before the model is used
+          max_configs: 20  # budget (default: all)
+          tolerance: 0.05  # target: max. std / observed metric range
+    """
+
+    def __init__(self, args, experiment):
+        self.args = args
+        self.ex = experiment
+        self.definition = experiment.adaptive
+        if self.definition.get("metric") is None:
+            raise BaseException("Adaptive experiment '{}' needs a metric."
+                                .format(experiment.name))
+        self.metric = get_metric_column(self.definition.get("metric"))
+        self.tolerance = float(self.definition.get(
+            "tolerance", DEFAULT_TOLERANCE))
+        self.rp = VimemuResultProcessor(args, [experiment])
+        # group configurations (with all their repetitions)
+        self.configs = dict()
+        for ec in experiment.experiment_configurations:
+            self.configs.setdefault(
+                ec.parameter.get(KEY_CONFIG_ID), list()).append(ec)
+        self.config_ids = sorted(self.configs)
+        self.X = self._get_normalized_parameter_space()
+        self.observed = dict()  # config index -> mean metric
+        self.complete = set()  # config indices with all results
+
+    def iter_configurations(self):
+        """
+        Yields the configurations to be executed one after the other.
+        Results of a configuration are read from the result directory
+        when the next configuration is requested.
+        Finally, the experiment only keeps the executed configurations.
+        """
+        n_initial = int(self.definition.get(
+            "initial", min(len(self.config_ids), self.X.shape[1] + 2)))
+        max_configs = int(self.definition.get(
+            "max_configs", len(self.config_ids)))
+        selected = list()
+        while len(selected) < min(max_configs, len(self.config_ids)):
+            self._read_results(selected)
+            if len(selected) < n_initial:
+                idx = self._select_space_filling(selected)
+            else:
+                idx = self._select_most_uncertain(selected)
+                if idx is None:
+                    break
+            selected.append(idx)
+            LOG.info("Adaptive: selected config {} ({}/{})"
+                     .format(self.config_ids[idx], len(selected),
+                             len(self.config_ids)))
+            for ec in self.configs[self.config_ids[idx]]:
+                yield ec
+        self._read_results(selected)
+        LOG.info("Adaptive: executed {} of {} configurations of '{}'"
+                 .format(len(selected), len(self.config_ids), self.ex.name))
+        # only keep executed configurations (e.g. for result processing)
+        self.ex.experiment_configurations = [
+            ec for idx in sorted(selected)
+            for ec in self.configs[self.config_ids[idx]]]
+
+    def _read_results(self, selected):
+        """
+        Update the mean metric of the selected configurations.
+        The mean is re-computed until results of all repetitions
+        of a configuration are available.
+        """
+        for idx in selected:
+            if idx in self.complete:
+                continue
+            values = list()
+            ecs = self.configs[self.config_ids[idx]]
+            for ec in ecs:
+                rd = os.path.join(self.args.result_dir, ec.name)
+                if not os.path.exists(rd):
+                    continue
+                try:
+                    v = self.rp.read_run_metrics(rd).get(self.metric)
+                    if v is not None:
+                        values.append(float(v))
+                except BaseException as ex:
+                    LOG.debug("Adaptive: no results in {}: {}"
+                              .format(rd, ex))
+            if len(values) >= len(ecs):
+                self.complete.add(idx)
+            if len(values) > 0:
+                self.observed[idx] = float(np.mean(values))
+            else:
+                LOG.warning("Adaptive: metric '{}' not found for config {}"
+                            .format(self.metric, self.config_ids[idx]))
+
+    def _get_normalized_parameter_space(self):
+        """
+        Matrix with one row per configuration and one column per
+        explored parameter (values mapped to [0, 1]).
+        """
+        params = self.definition.get("parameters")
+        first = [self.configs[cid][0].parameter for cid in self.config_ids]
+        if params is None:  # use all varied parameters
+            params = sorted(
+                k for k in first[0]
+                if k not in [KEY_REPETITION, KEY_CONFIG_ID]
+                and len(set(str(p.get(k)) for p in first)) > 1)
+        X = np.zeros((len(first), max(1, len(params))))
+        for col, k in enumerate(params):
+            values = [p.get(k) for p in first]
+            if all(isinstance(v, (int, float)) for v in values):
+                v = np.array(values, dtype=float)
+            else:  # categorical: position in sorted list of values
+                levels = sorted(set(str(v) for v in values))
+                v = np.array([levels.index(str(v)) for v in values],
+                             dtype=float)
+            span = v.max() - v.min()
+            X[:, col] = (v - v.min()) / span if span > 0 else 0
+        LOG.info("Adaptive: exploring {} configurations over {}"
+                 .format(len(first), params))
+        return X
+
+    def _select_space_filling(self, selected):
+        """
+        Initial design: the configuration farthest away from all
+        selected ones (starting with the first configuration).
+        """
+        if len(selected) < 1:
+            return 0
+        d = _sq_dist(self.X, self.X[selected]).min(axis=1)
+        d[selected] = -1
+        return int(np.argmax(d))
+
+    def _select_most_uncertain(self, selected):
+        """
+        Configuration with the highest predicted standard deviation.
+        Returns None if the target accuracy is reached.
+        """
+        idx_obs = [i for i in selected if i in self.observed]
+        if len(idx_obs) < 1:  # no results (yet), e.g., failed runs
+            return self._select_space_filling(selected)
+        candidates = [i for i in range(0, len(self.config_ids))
+                      if i not in selected]
+        y = np.array([self.observed[i] for i in idx_obs])
+        std = gp_predict_std(self.X[idx_obs], y, self.X[candidates])
+        best = int(np.argmax(std))
+        y_range = y.max() - y.min()
+        target = self.tolerance * (y_range if y_range > 0
+                                   else max(abs(y.mean()), 1e-12))
+        LOG.debug("Adaptive: max. std {} (target: {})"
+                  .format(std[best], target))
+        if std[best] <= target:
+            LOG.info("Adaptive: target accuracy reached (std {} <= {})"
+                     .format(std[best], target))
+            return None
+        return candidates[best]
+
+
+def _sq_dist(a, b):
+    return ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+
+
+def gp_predict_std(X, y, Xc, noise=DEFAULT_NOISE):
+    """
+    Predictive standard deviation of a Gaussian process
+    (RBF kernel) fitted to the observations (X, y) at points Xc.
+    The length scale is selected by maximum marginal likelihood.
+    """
+    y_std = y.std() if y.std() > 0 else 1.
+    yn = (y - y.mean()) / y_std
+    best = None
+    for ls in LENGTH_SCALES:
+        K = np.exp(-.5 * _sq_dist(X, X) / ls**2) + noise * np.eye(len(X))
+        L = np.linalg.cholesky(K)
+        alpha = np.linalg.solve(L.T, np.linalg.solve(L, yn))
+        lml = -.5 * yn.dot(alpha) - np.log(np.diag(L)).sum()
+        if best is None or lml > best[0]:
+            best = (lml, ls, L)
+    _, ls, L = best
+    Ks = np.exp(-.5 * _sq_dist(Xc, X) / ls**2)
+    v = np.linalg.solve(L, Ks.T)
+    var = (1. - (v ** 2).sum(axis=0)).clip(0, None)
+    return np.sqrt(var) * y_std
@@ -0,0 +1,238 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from tngsdk.benchmark.logger import TangoLogger
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+DEFAULT_CACHE_DIR = "~/.cache/tng-bench"
+DEFAULT_CACHE_SIZE = 2048  # MB
+HASH_CHUNK_SIZE = 1024 * 1024  # bytes read at once when hashing files
+TMP_PREFIX = ".tmp-"  # entries that are currently inserted
+EVICT_TARGET = .9  # evict down to this fraction of max_size
+
+_CACHES = dict()  # one cache object per process and cache folder
+
+
+class ContentCache(object):
+    """
+    Persistent on-disk cache shared by all tng-bench invocations.
+    Entries (files or folders) are stored under a content hash:
+    <path>/<kind>/<key>. If the cache grows beyond max_size bytes,
+    the least recently used entries (mtime) are evicted.
+    The cache size is only counted once per process and then
+    kept as a running total of the inserted entries.
+    """
+
+    def __init__(self, path, max_size):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.max_size = max_size
+        self.size = None  # bytes, counted on first insert
+        LOG.debug("Using cache {} (max. {} bytes)"
+                  .format(self.path, self.max_size))
+
+    def get(self, kind, key):
+        """
+        Return the path of the entry or None if not cached.
+        """
+        p = self._get_entry_path(kind, key)
+        try:
+            os.utime(p)  # mark as recently used
+        except OSError:
+            return None  # not cached (or evicted concurrently)
+        LOG.debug("Cache hit: {}/{}".format(kind, key))
+        return p
+
+    def put(self, kind, key, src_path):
+        """
+        Insert a copy of the file or folder src_path.
+        Atomic: other invocations either see the complete
+        entry or no entry at all.
+        Returns the path of the entry.
+        """
+        p = self._get_entry_path(kind, key)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=TMP_PREFIX, dir=os.path.dirname(p))
+        try:
+            tmp_entry = os.path.join(tmp, "entry")
+            if os.path.isdir(src_path):
+                shutil.copytree(src_path, tmp_entry)
+            else:
+                link_or_copy(src_path, tmp_entry)
+            size = get_path_size(tmp_entry)
+            try:
+                if os.path.isdir(tmp_entry):
+                    os.rename(tmp_entry, p)
+                else:
+                    # unlike rename, link never replaces an existing entry
+                    os.link(tmp_entry, p)
+            except OSError:
+                # inserted concurrently by another invocation
+                if not os.path.exists(p):
+                    raise
+                size = 0
+            os.utime(p)  # copies keep the mtime of src_path
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+        LOG.debug("Cache insert: {}/{}".format(kind, key))
+        if self.size is None:
+            self.size = self._count_size()
+        else:
+            self.size += size
+        if self.size > self.max_size:
+            self.evict(keep=p)
+        return p
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache size is
+        below EVICT_TARGET * max_size (never removes keep).
+        Evicting below max_size leaves room for further inserts
+        before the cache has to be scanned again.
+        """
+        entries = list(self._list_entries())
+        total = sum(size for _, _, size in entries)
+        for _, p, size in sorted(entries):
+            if total <= EVICT_TARGET * self.max_size:
+                break
+            if p == keep:
+                continue
+            LOG.debug("Cache evict: {}".format(p))
+            if os.path.isdir(p):
+                shutil.rmtree(p, ignore_errors=True)
+            else:
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+        self.size = total
+
+    def _count_size(self):
+        return sum(size for _, _, size in self._list_entries())
+
+    def _list_entries(self):
+        """
+        Yields (mtime, path, size) of all entries.
+        """
+        for kind in os.listdir(self.path):
+            kind_path = os.path.join(self.path, kind)
+            if not os.path.isdir(kind_path):
+                continue
+            for key in os.listdir(kind_path):
+                if key.startswith(TMP_PREFIX):
+                    continue
+                p = os.path.join(kind_path, key)
+                try:
+                    yield (os.lstat(p).st_mtime, p, get_path_size(p))
+                except OSError:
+                    pass  # evicted concurrently
+
+    def _get_entry_path(self, kind, key):
+        return os.path.join(self.path, kind, key)
+
+
+def get_cache(args):
+    """
+    Return the cache configured by args or None (--no-cache).
+    All callers of a process share the same cache object
+    (and its running size total).
+    """
+    if getattr(args, "no_cache", False):
+        return None
+    path = getattr(args, "cache_dir", DEFAULT_CACHE_DIR)
+    max_size = getattr(args, "cache_size", DEFAULT_CACHE_SIZE) * 1024 * 1024
+    if (path, max_size) not in _CACHES:
+        _CACHES[(path, max_size)] = ContentCache(path, max_size)
+    return _CACHES.get((path, max_size))
+
+
+def hash_path(path):
+    """
+    Content hash of a file or of a folder (relative paths and
+    contents of all its files).
+    """
+    h = hashlib.sha256()
+    if not os.path.isdir(path):
+        _hash_file(h, path)
+        return h.hexdigest()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()  # walk in a stable order
+        for fname in sorted(files):
+            p = os.path.join(root, fname)
+            h.update("{}:{}\0".format(
+                os.path.relpath(p, path), os.path.getsize(p)).encode())
+            _hash_file(h, p)
+    return h.hexdigest()
+
+
+def hash_object(obj):
+    """
+    Hash of a JSON serializable object (independent of dict order).
+    """
+    return hashlib.sha256(
+        json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_path_size(path):
+    """
+    Size of a file or folder in bytes.
+    """
+    if not os.path.isdir(path):
+        return os.lstat(path).st_size
+    size = 0
+    for root, _, files in os.walk(path):
+        for fname in files:
+            size += os.lstat(os.path.join(root, fname)).st_size
+    return size
+
+
+def link_or_copy(src, dst):
+    """
+    Hard link src to dst (copy, e.g., across file systems).
+    """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _hash_file(h, path):
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            h.update(chunk)
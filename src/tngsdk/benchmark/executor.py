@@ -31,14 +31,21 @@
 # partner consortium (www.5gtango.eu).
 import os
 import json
+import queue
+import shutil
+import threading
 from tngsdk.benchmark.logger import TangoLogger
 from tngsdk.benchmark.helper import ensure_dir
+from tngsdk.benchmark.adaptive import AdaptiveExplorer
+from tngsdk.benchmark.stopping import EarlyStopping
 from tngsdk.benchmark.pdriver.vimemu import VimEmuDriver
 
 LOG = TangoLogger.getLogger(__name__)
 
 
 PATH_EC_FILE = "ex_config.json"
+PATH_EXPERIMENT_TIMES = "experiment_times.json"  # written after a run
+QUEUE_PUT_TIMEOUT = 1  # seconds (to re-check for aborted workers)
 
 
 class Executor(object):
@@ -49,15 +56,22 @@ class Executor(object):
         self.ex_list = ex_list
         LOG.info("Initialized executor with {} experiments and {} configs"
                  .format(len(self.ex_list),
-                         [len(ex.experiment_configurations)
+                         [ex.count_configurations()
                           for ex in self.ex_list]))
         LOG.debug("Config: {}".format(self.args.config))
-        # load pdriver module to be used
-        self.pd = None
-        # FIXME only load the "default" target for now
+        # load one pdriver instance per target to be used
+        self.pd_list = list()
         for t in self.args.config.get("targets"):
-            if t.get("name") == "default":
-                self.pd = self._load_pdriver(t)
+            if (getattr(self.args, "all_targets", False)
+                    or t.get("name") == "default"):
+                self.pd_list.append((t.get("name"), self._load_pdriver(t)))
+        if len(self.pd_list) < 1:
+            raise BaseException("No usable target found in config.")
+        LOG.info("Using {} target(s): {}"
+                 .format(len(self.pd_list), [n for n, _ in self.pd_list]))
+        # state shared between the target worker threads
+        self._abort = threading.Event()
+        self._errors = list()
 
     def _load_pdriver(self, t):
         if t.get("pdriver") == "vimemu":
@@ -77,6 +91,7 @@ class Executor(object):
         LOG.debug("Writing ex. configuration: {}".format(dst_path))
         data = {
             "name": ec.name,
+            "experiment": ec.experiment.name,
             "run_id": ec.run_id,
             "parameter": ec.parameter,
             "project_path": ec.project_path,
@@ -90,29 +105,174 @@ class Executor(object):
         Prepare the target platform.
         """
         LOG.info("Preparing target platforms")
-        self.pd.setup_platform()
+        for _, pd in self.pd_list:
+            pd.setup_platform()
 
-    def run(self):
+    def run(self, ec_iter=None):
         """
         Executes all experiments and configurations.
+        With a single target, configurations are executed one by one.
+        With multiple targets, one worker thread per target pulls
+        configurations from a shared queue.
+        ec_iter: optional iterable of configurations to be executed
+        (default: all configurations of all experiments). It can block,
+        e.g., if configurations are still being generated.
         """
         LOG.info("Executing experiments")
-        # match to targets (TODO assignment problem)
-        t_pd = self.pd
-        # iterate over experiments/configs and execute
+        if ec_iter is None:
+            ec_iter = self._iter_configurations()
+        else:
+            ec_iter = self._filter_early_stopping(ec_iter)
+        if getattr(self.args, "resume", False):
+            ec_iter = self._skip_finished(ec_iter)
+        if len(self.pd_list) < 2:
+            _, t_pd = self.pd_list[0]
+            for ec in ec_iter:
+                self._execute_configuration(t_pd, ec)
+            return
+        self._run_parallel(ec_iter)
+
+    def _iter_configurations(self):
         for ex in self.ex_list:
-            for ec in ex.experiment_configurations:
-                self._write_experiment_configuration(ec)
-                LOG.info("Setting up '{}'".format(ec))
-                t_pd.setup_experiment(ec)
-                LOG.info("Executing '{}'".format(ec))
-                t_pd.execute_experiment(ec)
-                LOG.info("Teardown '{}'".format(ec))
-                t_pd.teardown_experiment(ec)
+            if ex.adaptive is not None:
+                # the next configuration depends on the previous results
+                ec_iter = AdaptiveExplorer(
+                    self.args, ex).iter_configurations()
+            else:
+                ec_iter = ex.iter_configurations()
+            if ex.early_stopping is not None:
+                # skip repetitions of configurations with stable results
+                ec_iter = EarlyStopping(self.args, ex).filter(ec_iter)
+            yield from ec_iter
+
+    def _filter_early_stopping(self, ec_iter):
+        """
+        Apply the early stopping of each experiment to configurations
+        that are passed in, e.g., by the pipelined generator.
+        """
+        stoppers = dict()
+        for ec in ec_iter:
+            ex = ec.experiment
+            if ex.early_stopping is not None:
+                if ex not in stoppers:
+                    stoppers[ex] = EarlyStopping(self.args, ex)
+                if stoppers[ex].skip(ec):
+                    continue
+            yield ec
+        for es in stoppers.values():
+            es.finish()
+
+    def _skip_finished(self, ec_iter):
+        """
+        Filter out configurations with results from an earlier
+        (interrupted) execution (--resume).
+        """
+        n_skipped = 0
+        for ec in ec_iter:
+            if self._is_finished(ec):
+                n_skipped += 1
+                LOG.debug("Skipping finished '{}'".format(ec))
+                continue
+            yield ec
+        LOG.info("Skipped {} finished configurations".format(n_skipped))
+
+    def _is_finished(self, ec):
+        """
+        A run is finished if its configuration and timing files exist.
+        Partial results of unfinished runs are removed.
+        """
+        rd = os.path.join(self.args.result_dir, ec.name)
+        ec_path = os.path.join(rd, PATH_EC_FILE)
+        if (os.path.exists(ec_path)
+                and os.path.exists(os.path.join(rd, PATH_EXPERIMENT_TIMES))):
+            with open(ec_path, "r") as f:
+                data = json.load(f)
+            # the run_id mapping is only stable for the same PED
+            if (data.get("run_id") != ec.run_id
+                    or data.get("parameter") != json.loads(
+                        json.dumps(ec.parameter))):
+                raise BaseException(
+                    "Cannot resume: Results of '{}' do not match its "
+                    "configuration. Was the PED changed?".format(ec))
+            return True
+        if os.path.exists(rd):
+            LOG.info("Removing incomplete results: {}".format(rd))
+            shutil.rmtree(rd)
+        return False
+
+    def _execute_configuration(self, t_pd, ec):
+        self._write_experiment_configuration(ec)
+        LOG.info("Setting up '{}'".format(ec))
+        t_pd.setup_experiment(ec)
+        LOG.info("Executing '{}'".format(ec))
+        t_pd.execute_experiment(ec)
+        LOG.info("Teardown '{}'".format(ec))
+        t_pd.teardown_experiment(ec)
+
+    def _run_parallel(self, ec_iter):
+        """
+        Feed all configurations into a shared queue that is
+        consumed by one worker thread per target.
+        """
+        # bounded: configurations are only pulled from ec_iter
+        # when a target is (almost) ready for them
+        ec_queue = queue.Queue(maxsize=len(self.pd_list))
+        workers = list()
+        for name, t_pd in self.pd_list:
+            w = threading.Thread(target=self._target_worker,
+                                 args=(name, t_pd, ec_queue),
+                                 name="target-{}".format(name))
+            w.daemon = True
+            w.start()
+            workers.append(w)
+        # fill the queue (one None per worker marks the end)
+        for ec in ec_iter:
+            if not self._queue_put(ec_queue, ec):
+                break
+        for _ in workers:
+            self._queue_put(ec_queue, None)
+        for w in workers:
+            w.join()
+        if len(self._errors) > 0:
+            raise BaseException("Execution failed on {} target(s): {}"
+                                .format(len(self._errors), self._errors))
+
+    def _queue_put(self, ec_queue, item):
+        """
+        Put item to queue. Gives up if the workers were aborted.
+        """
+        while not self._abort.is_set():
+            try:
+                ec_queue.put(item, timeout=QUEUE_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _target_worker(self, name, t_pd, ec_queue):
+        """
+        Executes configurations from the queue on a single target.
+        Stops all workers on the first error (like the sequential mode).
+        """
+        while not self._abort.is_set():
+            try:
+                ec = ec_queue.get(timeout=QUEUE_PUT_TIMEOUT)
+            except queue.Empty:
+                continue
+            if ec is None:
+                break
+            LOG.info("Target '{}' picked '{}'".format(name, ec))
+            try:
+                self._execute_configuration(t_pd, ec)
+            except BaseException as ex:
+                LOG.exception("Target '{}' failed on '{}'".format(name, ec))
+                self._errors.append((name, str(ec), ex))
+                self._abort.set()
 
     def teardown(self):
         """
         Clean up target platform.
         """
         LOG.info("Teardown target platforms")
-        self.pd.teardown_platform()
+        for _, pd in self.pd_list:
+            pd.teardown_platform()
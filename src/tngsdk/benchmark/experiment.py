@@ -29,10 +29,13 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
-import json
+import copy
+import itertools as it
 from pprint import pformat
 from tngsdk.benchmark.macro import rewrite_parameter_macros_to_lists
-from tngsdk.benchmark.helper import compute_cartesian_product
+from tngsdk.benchmark.helper import iter_cartesian_product
+from tngsdk.benchmark.helper import get_cartesian_product_element
+from tngsdk.benchmark.sampling import sample_parameter_space
 from tngsdk.benchmark.logger import TangoLogger
 
 
@@ -40,6 +43,8 @@ LOG = TangoLogger.getLogger(__name__)
 
 
 DEFAULT_TIME_WARMUP = 10  # only used if not in PED
+KEY_REPETITION = "ep::header::all::repetition"
+KEY_CONFIG_ID = "ep::header::all::config_id"
 
 
 class Experiment(object):
@@ -53,22 +58,44 @@ class Experiment(object):
         self.repetitions = 0
         self.time_limit = 0
         self.time_warmup = DEFAULT_TIME_WARMUP
+        self.readiness_probes = list()
+        self.sampling = None  # default: full Cartesian product
+        self.adaptive = None  # default: execute all configurations
+        self.early_stopping = None  # default: execute all repetitions
         # populate object from YAML definition
         self.__dict__.update(definition)
         # attributes
         self.experiment_configurations = list()
-        self.configuration_space_list = list()
+        self.n_configurations = 0  # set by populate
+        self.run_id_offset = 0  # run_id of the first configuration
+        self._configuration_dict = None
+        self._sample = None  # sampled points of the parameter space
         # store original experiment definition for later use
         self.original_definition = definition.copy()
 
     def __repr__(self):
         return "Experiment({})".format(self.name)
 
+    @property
+    def experiment_configurations(self):
+        """
+        List of all configuration objects of the experiment.
+        Created on first access: use iter_configurations() to
+        stream large parameter spaces instead.
+        """
+        self.materialize_configurations()
+        return self._configurations
+
+    @experiment_configurations.setter
+    def experiment_configurations(self, ecs):
+        self._configurations = ecs
+
     def populate(self):
         """
-        Search for parameter study macros and generate
+        Search for parameter study macros and prepare
         one run configuration for each parameter combination
-        to be tested.
+        to be tested. The configuration objects are only created
+        when they are iterated (see iter_configurations).
         """
         # convert parameter macros from PED file to plain lists
         for ep in self.experiment_parameters:
@@ -87,56 +114,108 @@ class Experiment(object):
         configuration_dict.update(
             self._get_experiment_configuration_space_as_dict())
         LOG.debug("configuration space:{0}".format(configuration_dict))
-        # explore entire parameter space by calculating the
-        # Cartesian product over the given dict
-        configuration_space_list = compute_cartesian_product(
-            configuration_dict)
-        self.configuration_space_list = self._add_config_ids(
-            configuration_space_list)
-        # create a experiment configuration objects for each calculated
-        # configuration to test
-        for c in configuration_space_list:
-            rc = ExperimentConfiguration(self, c)
-            self.experiment_configurations.append(rc)
+        self._configuration_dict = configuration_dict
+        if self.sampling is None:
+            # explore entire parameter space
+            n = 1
+            for v in configuration_dict.values():
+                n *= len(v)
+        else:
+            # only explore a sample of the parameter space
+            self._sample = self._sample_parameter_space(configuration_dict)
+            n = len(self._sample)
         if self.args.max_experiments is not None:
             # reduce the number of experiments
-            self.experiment_configurations = self.experiment_configurations[
-                :int(self.args.max_experiments)]
+            n = min(n, int(self.args.max_experiments))
+        self.n_configurations = n
+        # reserve the run_ids of all configurations
+        self.run_id_offset = ExperimentConfiguration.RUN_ID
+        ExperimentConfiguration.RUN_ID += n
+        self._configurations = None  # not created yet
         LOG.info("Populated experiment specification: '{}' with {} "
-                 .format(self.name, len(self.experiment_configurations))
+                 .format(self.name, self.n_configurations)
                  + "configurations to be executed.")
 
-    def _add_config_ids(self, conf_list):
+    def iter_configurations(self):
+        """
+        Yield the configurations of the experiment. Creates new
+        objects for each call (same run_ids) unless the configuration
+        list was created, e.g., by accessing experiment_configurations.
         """
-        Add config_ids to the config list.
-        Needs to be that complex, because we do not loop
-        over the repetitions. So we have to diff the configs.
-        Ugly, but works.
+        if self._configurations is not None:
+            yield from self._configurations
+            return
+        yield from self._create_configurations()
+
+    def materialize_configurations(self):
         """
-        # count every different config (but ignore repetition field)
-        cnt = 0
-        cnt_dict = dict()
-        for c in conf_list:
-            tmpc = c.copy()
-            del tmpc["ep::header::all::repetition"]
-            k = json.dumps(tmpc, sort_keys=True)
-            if k not in cnt_dict:
-                cnt_dict[k] = cnt
-                cnt += 1
-        # add results to configs
-        for c in conf_list:
-            tmpc = c.copy()
-            del tmpc["ep::header::all::repetition"]
-            k = json.dumps(tmpc, sort_keys=True)
-            c["ep::header::all::config_id"] = cnt_dict.get(k, 0)
-        return conf_list
+        Create all configuration objects and keep them in memory
+        (needed if they are used more than once).
+        """
+        if self._configurations is None:
+            self._configurations = list(self._create_configurations())
+
+    def has_configuration_list(self):
+        """
+        True if the configurations are kept in memory.
+        """
+        return self._configurations is not None
+
+    def count_configurations(self):
+        if self._configurations is not None:
+            return len(self._configurations)
+        return self.n_configurations
+
+    def _create_configurations(self):
+        """
+        Lazily create one experiment configuration object for each
+        point of the parameter space (respects --max-experiments).
+        """
+        if self._configuration_dict is None:
+            return  # not populated
+        configuration_dict = self._configuration_dict
+        if self._sample is None:
+            # iterate over the Cartesian product of the given dict
+            c_iter = enumerate(iter_cartesian_product(configuration_dict))
+        else:
+            c_iter = ((i, get_cartesian_product_element(
+                configuration_dict, i)) for i in self._sample)
+        c_iter = it.islice(c_iter, self.n_configurations)
+        n_rep, n_inner = self._get_repetition_radix(configuration_dict)
+        for pos, (i, c) in enumerate(c_iter):
+            # config_id: index of c in the parameter space
+            # without the repetition dimension
+            c[KEY_CONFIG_ID] = (
+                i // (n_rep * n_inner) * n_inner + i % n_inner)
+            yield ExperimentConfiguration(
+                self, c, run_id=self.run_id_offset + pos)
+
+    def _sample_parameter_space(self, configuration_dict):
+        p_names = sorted(configuration_dict)
+        return sample_parameter_space(
+            self.sampling,
+            [len(configuration_dict[n]) for n in p_names],
+            p_names.index(KEY_REPETITION))
+
+    def _get_repetition_radix(self, configuration_dict):
+        """
+        The Cartesian product is a mixed-radix number (sorted keys,
+        last key varies fastest). Returns the radix of the repetition
+        dimension and the product of all radices behind it.
+        """
+        p_names = sorted(configuration_dict)
+        pos = p_names.index(KEY_REPETITION)
+        n_inner = 1
+        for n in p_names[pos + 1:]:
+            n_inner *= len(configuration_dict[n])
+        return len(configuration_dict[KEY_REPETITION]), n_inner
 
     def _get_header_configuration_space_as_dict(self):
         """
         {"repetition" : [0, 1, ...]}
         """
         r = dict()
-        r["ep::header::all::repetition"] = list(range(0, self.repetitions))
+        r[KEY_REPETITION] = list(range(0, self.repetitions))
         r["ep::header::all::time_limit"] = [self.time_limit]
         r["ep::header::all::time_warmup"] = [self.time_warmup]
         return r
@@ -241,13 +320,16 @@ class ExperimentConfiguration(object):
     # have globally unique run_ids for simplicity
     RUN_ID = 0
 
-    def __init__(self, experiment, p):
+    def __init__(self, experiment, p, run_id=None):
         self.experiment = experiment
         self.parameter = p
-        self.run_id = ExperimentConfiguration.RUN_ID
-        ExperimentConfiguration.RUN_ID += 1
+        if run_id is None:
+            run_id = ExperimentConfiguration.RUN_ID
+            ExperimentConfiguration.RUN_ID += 1
+        self.run_id = run_id
         self.project_path = None  # path of generated project
         self.package_path = None  # path of generated package
+        self.package_key = None  # content hash of generated package
         self.name = "{}_{:05d}".format(experiment.name, self.run_id)
         # additional information
         self.function_ids = dict()  # mapping between VNF names and IDs
@@ -262,3 +344,16 @@ class ExperimentConfiguration(object):
 
     def pprint(self):
         return "{}\n{}".format(self, pformat(self.parameter))
+
+    def detached_copy(self):
+        """
+        Return a shallow copy that is cheap to pickle, e.g., to
+        send it to a worker process. Its experiment does not
+        reference the other configurations of the experiment.
+        """
+        ex = copy.copy(self.experiment)
+        ex.experiment_configurations = list()
+        ex._sample = None
+        ec = copy.copy(self)
+        ec.experiment = ex
+        return ec
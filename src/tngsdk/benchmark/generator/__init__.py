@@ -51,5 +51,18 @@ class ServiceConfigurationGenerator(object):
         LOG.warning("Service configuration generation not implemented.")
         return list()
 
+    def generate_iter(self, input_reference,
+                      function_experiments, service_experiments):
+        """
+        Like generate() but yields each experiment configuration
+        once it is ready to be executed.
+        Default: generate everything first, then yield.
+        """
+        self.generate(input_reference,
+                      function_experiments, service_experiments)
+        for ex in service_experiments:
+            for ec in ex.experiment_configurations:
+                yield ec
+
     def print_generation_and_packaging_statistics(self):
         LOG.warning("Statistics printer not implemented.")
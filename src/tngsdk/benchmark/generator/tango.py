@@ -32,10 +32,16 @@
 
 import time
 import shutil
+import copy
 import os
+import collections
+import itertools as it
+import multiprocessing
 from tngsdk.benchmark.generator import ServiceConfigurationGenerator
 from tngsdk.benchmark.helper import ensure_dir, read_yaml, write_yaml
 from tngsdk.benchmark.helper import parse_ec_parameter_key
+from tngsdk.benchmark.cache import get_cache, hash_path, hash_object
+from tngsdk.benchmark.cache import link_or_copy
 import tngsdk.package as tngpkg
 from tngsdk.benchmark.logger import TangoLogger
 
@@ -47,6 +53,13 @@ BASE_PROJECT_PATH = "base_project/"
 GEN_PROJECT_PATH = "gen_projects/"
 GEN_PKG_PATH = "gen_pkgs/"
 TEMPLATE_VNFD_MP = "template/tango_vnfd_mp.yml"
+PROJECT_DESCRIPTOR = "project.yml"
+MIME_NSD = "application/vnd.5gtango.nsd"
+MIME_VNFD = "application/vnd.5gtango.vnfd"
+CACHE_BASE_PROJECT = "base_projects"  # cache kind of unpacked inputs
+CACHE_PACKAGE = "packages"  # cache kind of generated packages
+KEY_CONFIG_ID = "ep::header::all::config_id"
+GEN_CHUNK_SIZE = 8  # configurations per worker handed to the pool at once
 
 
 class TangoServiceConfigurationGenerator(
@@ -63,6 +76,10 @@ class TangoServiceConfigurationGenerator(
         self.start_time = -1
         self.stat_n_ex = 0
         self.stat_n_ec = 0
+        self.stat_n_pkg = 0
+        self._templates = dict()  # cache of parsed templates
+        self.cache = get_cache(args)  # None if --no-cache
+        self.base_hash = None  # content hash of the input package
         LOG.info("New 5GTANGO service configuration generator")
         LOG.debug("5GTANGO generator args: {}".format(self.args))
 
@@ -72,6 +89,21 @@ class TangoServiceConfigurationGenerator(
         Generates service configurations according to the inputs.
         Returns a list of identifiers / paths to the
         generated service configurations.
+        All configurations are kept in memory (to be executed later),
+        use generate_iter to stream them.
+        """
+        for ex in service_ex:
+            ex.materialize_configurations()
+        for _ in self.generate_iter(in_pkg_path, func_ex, service_ex):
+            pass
+        return func_ex, service_ex
+
+    def generate_iter(self, in_pkg_path, func_ex,
+                      service_ex):
+        """
+        Generates service configurations according to the inputs.
+        Yields each experiment configuration as soon as its
+        package is available.
         """
         if func_ex is not None and len(func_ex):
             # function experiments are not considered
@@ -84,23 +116,56 @@ class TangoServiceConfigurationGenerator(
             LOG.error("Could not load service referenced in PED: {}"
                       .format(in_pkg_path))
             exit(1)
+        # Step 0+1: Get unpacked base project
+        base_proj_path = self._get_base_project(in_pkg_path)
+        # Step 2: Parse base project once (kept in memory)
+        base_project = TangoProject.load(base_proj_path)
+        base_project.content_hash = self.base_hash
+        # Step 3: Generate for each experiment and package it
+        for ex in service_ex:
+            for ec in self._generate_projects(base_project, ex):
+                yield ec
+            self.stat_n_ex += 1
+
+    def _get_base_project(self, in_pkg_path):
+        """
+        Unpack the input package (or project) and return the path
+        of the base project. Reuses the base project from the cache
+        if the input did not change since an earlier invocation.
+        """
+        key = None
+        if self.cache is not None:
+            key = hash_path(in_pkg_path)
+            self.base_hash = key
+            cached = self.cache.get(CACHE_BASE_PROJECT, key)
+            if cached is not None:
+                # use a (hard linked) copy: the cache entry can be
+                # evicted by other invocations while we use it
+                base_proj_path = os.path.join(
+                    self.args.work_dir, BASE_PROJECT_PATH, "cached")
+                shutil.rmtree(base_proj_path, ignore_errors=True)
+                try:
+                    shutil.copytree(cached, base_proj_path,
+                                    copy_function=link_or_copy)
+                    LOG.info("Using cached base project of {}"
+                             .format(in_pkg_path))
+                    return base_proj_path
+                except (OSError, shutil.Error) as ex:
+                    LOG.debug("Cached base project evicted: {}"
+                              .format(ex))
+                    shutil.rmtree(base_proj_path, ignore_errors=True)
         # Step 0 (optional): Support 5GTANGO projects
         if self._is_tango_project(in_pkg_path):
             # package the project first to temp
-            r = self._pack(in_pkg_path, os.path.join(
+            in_pkg_path = self._pack(in_pkg_path, os.path.join(
                     self.args.work_dir, BASE_PKG_PATH))
-            # re-write in_pkg_path
-            in_pkg_path = r
         # Step 1: Unpack in_pkg to work_dir/BASE_PROJECT
         base_proj_path = os.path.join(
             self.args.work_dir, BASE_PROJECT_PATH)
         base_proj_path = self._unpack(in_pkg_path, base_proj_path)
-        # Step 2: Generate for each experiment and package it
-        for ex in service_ex:
-            self._generate_projects(base_proj_path, ex)
-            self.stat_n_ex += 1
-        # Step 3: Return pointers to func_ex and service_ex
-        return func_ex, service_ex
+        if self.cache is not None:
+            self.cache.put(CACHE_BASE_PROJECT, key, base_proj_path)
+        return base_proj_path
 
     def _unpack(self, pkg_path, proj_path):
         """
@@ -167,50 +232,195 @@ class TangoServiceConfigurationGenerator(
         LOG.debug("Packed {} to {}".format(proj_path, pkg_path))
         return pkg_path
 
-    def _generate_projects(self, base_proj_path, ex):
-        LOG.info("Generating {} projects for {}"
-                 .format(len(ex.experiment_configurations), ex))
-        # iterate over all experiment configurations
+    def _generate_projects(self, base_project, ex):
+        """
+        Generate all projects/packages of the given experiment.
+        Yields each experiment configuration once it is done.
+        """
+        n_total = ex.count_configurations()
+        LOG.info("Generating {} projects for {}".format(n_total, ex))
         n_done = 0
-        for ec in ex.experiment_configurations:
-            # 1. create project by copying base_proj
-            self._copy_project(base_proj_path, ec)
-            # 2. gather additional project infos
-            self._gather_project_infos(ec)
-            # 3. add MPs to project
-            self._add_mps_to_project(ec)
-            # 4. apply configuration parameters to project
-            self._add_params_to_project(ec)
-            # 5. package project
-            self._package_project(ec)
-            # 6. status output
+        # repetitions of a configuration share the same config_id
+        # and result in identical packages: only generate them once.
+        # The configurations are streamed, so only the generated
+        # ecs with outstanding repetitions are kept.
+        generated = dict()  # config_id -> generated ec (None: in progress)
+        n_left = dict()  # config_id -> repetitions still to come
+        ready = collections.deque()  # (config_id, ec) reusing a project
+        reused = set()  # names of ecs that are passed through generation
+
+        def _reuse(cid, rec):
+            self._reuse_project(generated.get(cid), rec)
+            n_left[cid] -= 1
+            if n_left[cid] < 1:  # no further repetitions
+                del generated[cid]
+                del n_left[cid]
+
+        def _iter_unique():
+            for ec in ex.iter_configurations():
+                cid = ec.parameter.get(KEY_CONFIG_ID)
+                if cid is not None and cid in generated:
+                    if generated.get(cid) is None:
+                        # still generated by the worker pool
+                        ready.append((cid, ec))
+                        continue
+                    # project exists: pass it on right away
+                    _reuse(cid, ec)
+                    reused.add(ec.name)
+                    yield ec
+                    continue
+                if cid is not None:
+                    generated[cid] = None
+                    n_left[cid] = ex.repetitions - 1
+                yield ec
+
+        def _iter_reused():
+            for _ in range(0, len(ready)):
+                cid, rec = ready.popleft()
+                if generated.get(cid) is None:
+                    ready.append((cid, rec))  # wait for the generated one
+                    continue
+                _reuse(cid, rec)
+                yield rec
+
+        def _iter_done():
+            # yields (ec, True if generated, False if reused)
+            for ec in self._iter_generate_projects(
+                    base_project, _iter_unique(),
+                    skip=lambda ec: ec.name in reused):
+                if ec.name in reused:
+                    reused.discard(ec.name)
+                    yield ec, False
+                    continue
+                cid = ec.parameter.get(KEY_CONFIG_ID)
+                if cid is not None:
+                    if n_left.get(cid, 0) > 0:
+                        generated[cid] = ec
+                    else:
+                        generated.pop(cid, None)
+                        n_left.pop(cid, None)
+                yield ec, True
+                for rec in _iter_reused():
+                    yield rec, False
+            # repetitions read after the last generated configuration
+            for rec in _iter_reused():
+                yield rec, False
+
+        # iterate over all experiment configurations
+        for ec, is_generated in _iter_done():
+            # status output
             n_done += 1
-            LOG.info("Generated project ({}/{}): {}"
-                     .format(n_done,
-                             len(ex.experiment_configurations),
+            self.stat_n_ec += 1
+            if is_generated:
+                self.stat_n_pkg += 1
+            LOG.info("{} project ({}/{}): {}"
+                     .format("Generated" if is_generated else "Reused",
+                             n_done, n_total,
                              os.path.basename(ec.package_path)))
-        self.stat_n_ec += n_done
+            yield ec
 
-    def _copy_project(self, base_proj_path, ec):
+    def _iter_generate_projects(self, base_project, ec_iter, skip=None):
+        """
+        Generate the projects/packages of the given configurations
+        and yield each configuration once it is done.
+        Configurations for which skip(ec) is True are passed through
+        without generation (e.g. repetitions with an existing project).
+        Uses a pool of worker processes if --gen-workers > 1.
+        """
+        if skip is None:
+            def skip(ec):
+                return False
+        n_workers = int(getattr(self.args, "gen_workers", 1) or 1)
+        if n_workers < 2:
+            for ec in ec_iter:
+                if not skip(ec):
+                    self._generate_project(base_project, ec)
+                yield ec
+            return
+        LOG.info("Using {} worker processes for generation"
+                 .format(n_workers))
+        # use 'spawn' to not fork a (maybe) multi-threaded parent
+        pool = multiprocessing.get_context("spawn").Pool(n_workers)
+        try:
+            while True:
+                # only take a chunk from the (maybe huge) ec_iter
+                chunk = list(it.islice(ec_iter, GEN_CHUNK_SIZE * n_workers))
+                if len(chunk) < 1:
+                    break
+                passed = [ec for ec in chunk if skip(ec)]
+                chunk = [ec for ec in chunk if not skip(ec)]
+                for ec in passed:
+                    yield ec
+                ec_dict = {ec.name: ec for ec in chunk}
+                tasks = [(self.args, base_project, ec.detached_copy())
+                         for ec in chunk]
+                for r in pool.imap_unordered(
+                        _generate_project_worker, tasks):
+                    if r.get("error") is not None:
+                        raise BaseException(
+                            "Generation of {} failed: {}"
+                            .format(r.get("name"), r.get("error")))
+                    ec = ec_dict.get(r.get("name"))
+                    ec.project_path = r.get("project_path")
+                    ec.package_path = r.get("package_path")
+                    ec.package_key = r.get("package_key")
+                    ec.function_ids = r.get("function_ids")
+                    ec.nsd = r.get("nsd")
+                    ec.vnfds = r.get("vnfds")
+                    yield ec
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _generate_project(self, base_project, ec):
+        """
+        Generate the project and package for a single configuration.
+        All modifications are done on an in-memory copy of the
+        base project which is written to disk only once, right
+        before it is packaged.
+        """
+        # 1. create project as copy of base_project
+        prj = self._copy_project(base_project, ec)
+        # 2. gather additional project infos
+        self._gather_project_infos(ec, prj)
+        # 3. add MPs to project
+        self._add_mps_to_project(ec, prj)
+        # 4. apply configuration parameters to project
+        self._add_params_to_project(ec, prj)
+        # 5. write and package project
+        self._package_project(ec, prj)
+
+    def _reuse_project(self, src_ec, ec):
+        """
+        Let ec use the project and package generated for src_ec.
+        """
+        ec.project_path = src_ec.project_path
+        ec.package_path = src_ec.package_path
+        ec.package_key = src_ec.package_key
+        ec.function_ids = src_ec.function_ids
+        ec.nsd = src_ec.nsd
+        ec.vnfds = src_ec.vnfds
+
+    def _copy_project(self, base_project, ec):
         ec.project_path = os.path.join(
             self.args.work_dir, GEN_PROJECT_PATH, ec.name)
         LOG.debug("Created project: {}".format(ec.project_path))
-        shutil.copytree(base_proj_path, ec.project_path)
+        return base_project.copy()
 
-    def _gather_project_infos(self, ec):
+    def _gather_project_infos(self, ec, prj):
         """
         Collect additional infors about project and store to ec.
         e.g. mapping between VNF IDs and names
         """
         # VNF names to ID mapping based on NSD
-        nsd = read_yaml(self._get_nsd_path(ec))
+        _, nsd = prj.get_nsd()
         for nf in nsd.get("network_functions"):
             k = "{}.{}.{}".format(nf.get("vnf_vendor"),
                                   nf.get("vnf_name"),
                                   nf.get("vnf_version"))
             ec.function_ids[k] = nf.get("vnf_id")
 
-    def _add_mps_to_project(self, ec):
+    def _add_mps_to_project(self, ec, prj):
         """
         Extend a project's VNFFG with the MPs
         and add the MPs as new VNFs.
@@ -218,46 +428,81 @@ class TangoServiceConfigurationGenerator(
         ex = ec.experiment
         for mp in ex.measurement_points:
             # 1. add MP VNFDs to project
-            self._add_mp_vnfd_to_project(mp, ec)
+            self._add_mp_vnfd_to_project(mp, ec, prj)
             # 2. extend NSD
-            self._add_mp_to_nsd(mp, ec)
+            self._add_mp_to_nsd(mp, ec, prj)
 
-    def _add_params_to_project(self, ec):
+    def _add_params_to_project(self, ec, prj):
         """
         Apply parameters, like resource limits, commands,
         to the project descriptors.
         """
-        # 1. read all VNFDs
-        vnfds = self._read_vnfds(ec)
+        # 1. get all VNFDs
+        vnfds = prj.get_vnfds()
         # 2. update VNFDs
         for _, vnfd in vnfds.items():
             self._apply_parameters_to_vnfds(ec, vnfd)
-        # 3. write updated VNFDs
-        for path, vnfd in vnfds.items():
-            write_yaml(path, vnfd)
-        # 4. also store in ec for later use
-        ec.vnfds = vnfds
+        # 3. also store in ec for later use (keyed by their final path)
+        ec.vnfds = {os.path.join(ec.project_path, p): vnfd
+                    for p, vnfd in vnfds.items()}
 
-    def _package_project(self, ec):
+    def _package_project(self, ec, prj):
         """
-        Package the project of the given experiment configuration.
+        Write and package the project of the given experiment
+        configuration.
         """
+        prj.write(ec.project_path)
         tmp = os.path.join(
             self.args.work_dir, GEN_PKG_PATH)
         ensure_dir(tmp)
         ec.package_path = "{}{}.tgo".format(tmp, ec.name)
+        # identical keys: identical packages (e.g. only commands differ)
+        ec.package_key = self._get_package_key(prj)
+        key = None
+        if self.cache is not None and prj.content_hash is not None:
+            key = ec.package_key
+        if key is not None:
+            cached = self.cache.get(CACHE_PACKAGE, key)
+            if cached is not None:
+                if os.path.exists(ec.package_path):
+                    os.remove(ec.package_path)
+                try:
+                    link_or_copy(cached, ec.package_path)
+                    LOG.debug("Using cached package for {}".format(ec))
+                    return
+                except OSError:
+                    pass  # evicted concurrently: package it again
         self._pack(ec.project_path, ec.package_path)
+        if key is not None:
+            self.cache.put(CACHE_PACKAGE, key, ec.package_path)
+
+    def _get_package_key(self, prj):
+        """
+        Content key of the package of the given project: the hash of
+        its base project and of all its (modified) descriptors, i.e.,
+        the MPs and the VNFD-affecting parameters (cpu_bw, cpu_cores,
+        mem_max, disk_max, ...). Without the hash of the base project
+        (--no-cache), the key is only unique within one invocation.
+        """
+        return hash_object([prj.content_hash, prj.projd, prj.descriptors])
 
-    def _add_mp_vnfd_to_project(self, mp, ec,
+    def _get_mp_vnfd_template(self, template=TEMPLATE_VNFD_MP):
+        """
+        Returns a copy of the MP VNFD template (parsed only once).
+        """
+        if template not in self._templates:
+            tpath = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), template)
+            self._templates[template] = read_yaml(tpath)
+        return copy.deepcopy(self._templates.get(template))
+
+    def _add_mp_vnfd_to_project(self, mp, ec, prj,
                                 template=TEMPLATE_VNFD_MP):
         """
         Uses templates/tango_vnfd_mp.yml as basis,
-        extends it and stores it in project folder.
-        Finally the project.yml is updated.
+        extends it and adds it to the project.
         """
-        tpath = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), template)
-        vnfd = read_yaml(tpath)
+        vnfd = self._get_mp_vnfd_template(template)
         # TODO better use template engine like Jinja
         # replace placeholder fields (this highly depends on used template!)
         vnfd["name"] = mp.get("name")
@@ -277,30 +522,21 @@ class TangoServiceConfigurationGenerator(
                 for cp in vdu["connection_points"]:
                     if cp.get("id") == "data":
                         cp["address"] = mp.get("address")
-        # write vnfd to project
+        # add vnfd to project (and its project.yml)
         vname = "{}.yaml".format(mp.get("name"))
-        write_yaml(os.path.join(ec.project_path, vname), vnfd)
-        # add vnfd to project.yml
-        ppath = os.path.join(ec.project_path, "project.yml")
-        projd = read_yaml(ppath)
-        projd.get("files").append({
-            "path": vname,
-            "type": "application/vnd.5gtango.vnfd",
-            "tags": ["eu.5gtango", "mp"]
-        })
-        write_yaml(ppath, projd)
+        prj.add_descriptor(vname, MIME_VNFD, vnfd, tags=["eu.5gtango", "mp"])
         LOG.debug("Added MP VNFD {} to project {}"
-                  .format(vname, projd.get("name")))
+                  .format(vname, prj.projd.get("name")))
 
-    def _add_mp_to_nsd(self, mp, ec):
+    def _add_mp_to_nsd(self, mp, ec, prj):
         """
         Add MP to NSD:
         - add VNF to functions section
         - connect measurement points w. virt. links
         - update forwarding graph
         """
-        # 1. load NSD
-        nsd = read_yaml(self._get_nsd_path(ec))
+        # 1. get NSD
+        _, nsd = prj.get_nsd()
         # 2. add MP VNF to NSD
         nsd.get("network_functions").append({
                 "vnf_id": mp.get("name"),
@@ -335,8 +571,7 @@ class TangoServiceConfigurationGenerator(
             fg["number_of_endpoints"] -= 1
             LOG.debug("Updated forwarding graph '{}': {}"
                       .format(fg.get("fg_id"), fg))
-        # 5. store updated nsd
-        write_yaml(self._get_nsd_path(ec), nsd)
+        # 5. keep updated nsd (written together with the project)
         ec.nsd = nsd
         # 6. log
         LOG.debug("Added measurement point VNF '{}' to NDS '{}'"
@@ -412,46 +647,6 @@ class TangoServiceConfigurationGenerator(
         # LOG.debug("Updated '{}' in VNFD '{}' to: {}"
         #          .format(field_name, vnfd.get("name"), rr))
 
-    def _get_nsd_path(self, ec):
-        """
-        Returns path of NSD for given EC project.
-        """
-        nsd_paths = self._get_paths_from_projectdescriptor(
-            ec, "application/vnd.5gtango.nsd")
-        if len(nsd_paths) > 0:
-            # always use the first NSD we find (TODO improve)
-            return nsd_paths[0]
-        raise BaseException(
-            "No NSD found for {}".format(ec.experiment))
-
-    def _get_vnfd_paths(self, ec):
-        """
-        Returns paths of VNFDs for given EC project.
-        """
-        return self._get_paths_from_projectdescriptor(
-            ec, "application/vnd.5gtango.vnfd")
-
-    def _get_paths_from_projectdescriptor(self, ec, mime_type):
-        """
-        Get paths from project.yml for given mime_type.
-        """
-        projd = read_yaml(os.path.join(ec.project_path, "project.yml"))
-        r = list()
-        for f in projd.get("files"):
-            if f.get("type") == mime_type:
-                r.append(os.path.join(ec.project_path, f.get("path")))
-        return r
-
-    def _read_vnfds(self, ec):
-        """
-        Real all VNFDs from given project.
-        Return {path, dict(vnfd)}.
-        """
-        r = dict()
-        for p in self._get_vnfd_paths(ec):
-            r[p] = read_yaml(p)
-        return r
-
     def _is_tango_project(self, in_pkg_path):
         if not str(in_pkg_path).endswith(".tgo"):
             if (os.path.exists(
@@ -467,5 +662,147 @@ class TangoServiceConfigurationGenerator(
         print("-" * 80)
         print("Generated packages for {} experiments with {} configurations."
               .format(self.stat_n_ex, self.stat_n_ec))
+        print("Built {} distinct packages (repetitions share packages)."
+              .format(self.stat_n_pkg))
         print("Total time: %s" % "%.4f" % (time.time() - self.start_time))
         print("-" * 80)
+
+
+def _generate_project_worker(task):
+    """
+    Generates a single configuration inside a worker process.
+    Returns the generation results that need to be attached
+    to the original configuration object in the parent process.
+    """
+    args, base_project, ec = task
+    try:
+        g = TangoServiceConfigurationGenerator(args)
+        g._generate_project(base_project, ec)
+    except BaseException as ex:
+        # the pool only handles Exception: a BaseException would kill
+        # the worker and the parent would wait for its result forever
+        LOG.exception("Generation of {} failed".format(ec))
+        return {"name": ec.name, "error": str(ex)}
+    return {"name": ec.name,
+            "project_path": ec.project_path,
+            "package_path": ec.package_path,
+            "package_key": ec.package_key,
+            "function_ids": ec.function_ids,
+            "nsd": ec.nsd,
+            "vnfds": ec.vnfds}
+
+
+class TangoProject(object):
+    """
+    In-memory representation of a 5GTANGO SDK project.
+    The descriptors of the base project are parsed only once.
+    Each experiment configuration modifies a structural copy of them
+    and the project is written to disk once, right before packaging.
+    """
+
+    def __init__(self, path, projd, descriptors):
+        self.path = path  # folder of the original project
+        self.projd = projd  # contents of project.yml
+        self.descriptors = descriptors  # relative path -> descriptor
+        self.content_hash = None  # hash of the unpacked input (if known)
+
+    @staticmethod
+    def load(path):
+        """
+        Parse project.yml and all NSDs/VNFDs of the project in path.
+        """
+        projd = read_yaml(os.path.join(path, PROJECT_DESCRIPTOR))
+        descriptors = dict()
+        for f in projd.get("files"):
+            if f.get("type") in [MIME_NSD, MIME_VNFD]:
+                descriptors[f.get("path")] = read_yaml(
+                    os.path.join(path, f.get("path")))
+        LOG.debug("Loaded project {} with {} descriptors"
+                  .format(path, len(descriptors)))
+        return TangoProject(path, projd, descriptors)
+
+    def copy(self):
+        """
+        Structural copy that can be modified independently.
+        """
+        prj = TangoProject(self.path,
+                           copy.deepcopy(self.projd),
+                           copy.deepcopy(self.descriptors))
+        prj.content_hash = self.content_hash
+        return prj
+
+    def get_paths(self, mime_type):
+        """
+        Get (relative) paths from project.yml for given mime_type.
+        """
+        return [f.get("path") for f in self.projd.get("files")
+                if f.get("type") == mime_type]
+
+    def get_nsd(self):
+        """
+        Returns (path, NSD) of the project.
+        """
+        nsd_paths = self.get_paths(MIME_NSD)
+        if len(nsd_paths) > 0:
+            # always use the first NSD we find (TODO improve)
+            return nsd_paths[0], self.descriptors.get(nsd_paths[0])
+        raise BaseException("No NSD found in {}".format(self.path))
+
+    def get_vnfds(self):
+        """
+        Returns {path: VNFD} of the project.
+        """
+        return {p: self.descriptors.get(p)
+                for p in self.get_paths(MIME_VNFD)}
+
+    def add_descriptor(self, path, mime_type, descriptor, tags=None):
+        """
+        Add a new descriptor to the project (and to its project.yml).
+        """
+        self.descriptors[path] = descriptor
+        self.projd.get("files").append({
+            "path": path,
+            "type": mime_type,
+            "tags": tags if tags is not None else list()
+        })
+
+    def write(self, dst_path):
+        """
+        Write project to dst_path. Files that are not modified
+        in memory are hard linked (or copied) from the original project.
+        """
+        # paths in project.yml are not necessarily normalized
+        in_memory = {os.path.normpath(p) for p in self.descriptors}
+        in_memory.add(PROJECT_DESCRIPTOR)
+        for root, dirs, files in os.walk(self.path):
+            for dname in dirs:  # keep (empty) folders of the project
+                os.makedirs(os.path.join(
+                    dst_path, os.path.relpath(
+                        os.path.join(root, dname), self.path)),
+                    exist_ok=True)
+            for fname in files:
+                src = os.path.join(root, fname)
+                rel = os.path.relpath(src, self.path)
+                if rel in in_memory:
+                    continue  # will be written from memory
+                dst = os.path.join(dst_path, rel)
+                ensure_dir(dst)
+                if os.path.lexists(dst):
+                    os.unlink(dst)
+                link_or_copy(src, dst)
+        for rel, descriptor in self.descriptors.items():
+            _write_unlinked(os.path.join(dst_path, rel), descriptor)
+        _write_unlinked(os.path.join(dst_path, PROJECT_DESCRIPTOR),
+                        self.projd)
+
+
+def _write_unlinked(dst, data):
+    """
+    Write YAML to dst. An existing dst is removed first: it could be
+    a hard link to a file of the original project (or of the cache)
+    that must not be truncated.
+    """
+    ensure_dir(dst)
+    if os.path.lexists(dst):
+        os.unlink(dst)
+    write_yaml(dst, data)
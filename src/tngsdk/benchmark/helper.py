@@ -42,12 +42,16 @@ except ImportError as e:
 
 LOG = TangoLogger.getLogger(__name__)
 
+# use libyaml (C) if PyYAML was built with it (much faster)
+YAML_LOADER = getattr(yaml, "CFullLoader", yaml.FullLoader)
+YAML_DUMPER = getattr(yaml, "CDumper", yaml.Dumper)
+
 
 def read_yaml(path):
     yml = None
     with open(path, "r") as f:
         try:
-            yml = yaml.load(f, Loader=yaml.FullLoader)
+            yml = yaml.load(f, Loader=YAML_LOADER)
         except yaml.YAMLError as ex:
             LOG.exception("YAML error while reading %r." % path)
             LOG.debug(ex)
@@ -68,7 +72,7 @@ def read_json(path):
 def write_yaml(path, data):
     with open(path, "w") as f:
         try:
-            yaml.dump(data, f, default_flow_style=False)
+            yaml.dump(data, f, default_flow_style=False, Dumper=YAML_DUMPER)
         except yaml.YAMLError as ex:
             LOG.exception("YAML error while writing %r" % path)
             LOG.debug(ex)
@@ -87,7 +91,12 @@ def ensure_dir(d):
     d = os.path.dirname(d)
     if not os.path.exists(d):
         LOG.debug("Creating path '{}'".format(d))
-        os.makedirs(d)
+        try:
+            os.makedirs(d)
+        except OSError:
+            # might have been created concurrently by another worker
+            if not os.path.isdir(d):
+                raise
 
 
 def relative_path(path):
@@ -127,11 +136,32 @@ def compute_cartesian_product(p_dict):
           {"number": 3, "color": "blue"}
         ]
     """
+    return list(iter_cartesian_product(p_dict))
+
+
+def iter_cartesian_product(p_dict):
+    """
+    Generator version of compute_cartesian_product:
+    Yields one dict at a time (same order, keys sorted,
+    last key varies fastest).
+    """
+    p_names = sorted(p_dict)
+    for prod in it.product(*(p_dict[n] for n in p_names)):
+        yield dict(zip(p_names, prod))
+
+
+def get_cartesian_product_element(p_dict, index):
+    """
+    Return the element at position index of the Cartesian product
+    (same order as iter_cartesian_product) without computing
+    the elements before it.
+    """
     p_names = sorted(p_dict)
-    return [dict(
-        zip(p_names, prod))
-            for prod in it.product(
-                    *(p_dict[n] for n in p_names))]
+    values = list()
+    for n in reversed(p_names):
+        index, pos = divmod(index, len(p_dict[n]))
+        values.append(p_dict[n][pos])
+    return dict(zip(p_names, reversed(values)))
 
 
 def parse_ec_parameter_key(name):
@@ -32,14 +32,21 @@
 import os
 import yaml
 import json
-from tngsdk.benchmark.helper import ensure_dir
+import multiprocessing
+from tngsdk.benchmark.helper import ensure_dir, YAML_DUMPER
+from tngsdk.benchmark.helper import read_yaml, read_json, write_json
+from tngsdk.benchmark.ietf.patch import make_patch, apply_patch
 from tngsdk.benchmark.logger import TangoLogger
-from tngsdk.benchmark.ietf.vnf_bd import vnf_bd as VNF_BD_Model
-import pyangbind.lib.pybindJSON as pybindJSON
 
 
 LOG = TangoLogger.getLogger(__name__)
 
+BD_ROOT = "vnf-bd:vnf-bd"  # root of the model's IETF JSON representation
+UINT32_MAX = 4294967295
+PATH_BD = "{}-bd.yaml"  # full BD of a configuration
+PATH_BASE_BD = "{}-base-bd.yaml"  # shared base BD of an experiment
+PATH_DELTA_BD = "{}-bd.patch.json"  # BD of a configuration as delta
+
 
 class IetfBmwgVnfBD_Generator(object):
 
@@ -56,16 +63,48 @@ class IetfBmwgVnfBD_Generator(object):
             LOG.info("IETF BMWG BD dir not specified (--ibbd). Skipping.")
             return
         # generate IETF BMWG BD, PP, BR
+        tasks = list()
         for ex_id, ex in enumerate(self.service_experiments):
+            base = None
+            if getattr(self.args, "ibbd_mode", "full") == "delta":
+                base = self._generate_base_bd(ex_id, ex)
             # iterate over all experiment configurations
             for _, ec in enumerate(ex.experiment_configurations):
-                # generate assets
-                try:
-                    bd_path = self._generate_bd(ex_id, ec)
-                    LOG.debug("Generated IETF BMWG BD: {}".format(bd_path))
-                except BaseException as exx:
-                    LOG.error("Could not generate IETF VNF BD for EC: {}\n{}"
-                              .format(ec, exx))
+                tasks.append((ex_id, ec, base))
+        n_workers = min(getattr(self.args, "result_workers", 1), len(tasks))
+        if n_workers < 2:
+            results = (self._try_generate_bd(ex_id, ec, base)
+                       for ex_id, ec, base in tasks)
+            self._log_results(results)
+            return
+        LOG.info("Generating {} IETF BMWG BDs with {} workers"
+                 .format(len(tasks), n_workers))
+        # spawn: like the generator's worker pool (safe with threads)
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(n_workers) as pool:
+            self._log_results(pool.imap_unordered(
+                _generate_bd_worker,
+                [(self.args, ex_id, ec.detached_copy(), base)
+                 for ex_id, ec, base in tasks],
+                chunksize=max(1, len(tasks) // (4 * n_workers))))
+
+    def _try_generate_bd(self, ex_id, ec, base=None):
+        """
+        Generate BD of a single EC.
+        return tuple: (EC name, BD path or None, error or None)
+        """
+        try:
+            return (str(ec), self._generate_bd(ex_id, ec, base), None)
+        except BaseException as exx:
+            return (str(ec), None, str(exx))
+
+    def _log_results(self, results):
+        for ec_name, bd_path, error in results:
+            if error is None:
+                LOG.debug("Generated IETF BMWG BD: {}".format(bd_path))
+            else:
+                LOG.error("Could not generate IETF VNF BD for EC: {}\n{}"
+                          .format(ec_name, error))
 
     def _find_vnf_id(self, vnf_name, nsd):
         """
@@ -76,12 +115,213 @@ class IetfBmwgVnfBD_Generator(object):
                 return f.get("vnf_id")
         return vnf_name
 
-    def _generate_bd(self, ex_id, ec):
-        # instantiate model
-        m = VNF_BD_Model()
+    def _generate_base_bd(self, ex_id, ex):
+        """
+        Write the base BD of an experiment (--ibbd-mode delta):
+        the BD of its first configuration.
+        return tuple: (base BD file name, base BD) or None
+        """
+        for ec in ex.experiment_configurations:
+            try:
+                bd = self._build_bd(ex_id, ec)
+            except BaseException:
+                continue  # error is reported with the EC's own BD
+            base_path = os.path.join(self.args.ibbd_dir,
+                                     PATH_BASE_BD.format(ex.name))
+            ensure_dir(base_path)
+            with open(base_path, "w") as f:
+                yaml.dump(bd, f, Dumper=YAML_DUMPER)
+            LOG.debug("Generated IETF BMWG base BD: {}".format(base_path))
+            return (os.path.basename(base_path), bd)
+        return None
+
+    def _generate_bd(self, ex_id, ec, base=None):
+        """
+        Write the BD of the given EC. As YAML file or,
+        if base is given, as JSON patch to the base BD.
+        """
+        bd = self._build_bd(ex_id, ec)
+        if getattr(self.args, "ibbd_validate", False):
+            # slow: compare against the pyangbind model
+            if bd != self._build_bd_model(ex_id, ec):
+                raise BaseException(
+                    "BD does not match the vnf_bd model: {}".format(ec))
+        if base is not None:
+            base_name, base_bd = base
+            bd_path = os.path.join(self.args.ibbd_dir,
+                                   PATH_DELTA_BD.format(ec.name))
+            ensure_dir(bd_path)
+            write_json(bd_path, {"base": base_name,
+                                 "patch": make_patch(base_bd, bd)})
+            return bd_path
         # output path for YAML file
         bd_path = os.path.join(self.args.ibbd_dir,
-                               "{}-bd.yaml".format(ec.name))
+                               PATH_BD.format(ec.name))
+        # write BD
+        ensure_dir(bd_path)
+        with open(bd_path, "w") as f:
+            yaml.dump(bd, f, Dumper=YAML_DUMPER)
+        return bd_path
+
+    def _build_bd(self, ex_id, ec):
+        """
+        Build the BD as plain dict that is equal to the IETF JSON
+        representation of the (pyangbind) vnf_bd model,
+        see _build_bd_model. Much faster than using the model.
+        """
+        target = self.args.config.get("targets")[0]
+        bd = {
+            # 1. header section
+            "id": "{:05d}".format(ec.run_id),
+            "name": ec.name,
+            "version": "0.1",
+            "author": "tng-bench",
+            "description": ("BD generated by"
+                            + " tng-bench (https://sndzoo.github.io/)."),
+            # 2. experiments section
+            "experiments": {
+                "methods": _uint32(ex_id),
+                "tests": _uint32(
+                    ec.parameter.get("ep::header::all::config_id", -1)),
+                "trials": _uint32(
+                    ec.parameter.get("ep::header::all::repetition", -1))},
+            # 3. environment section
+            "environment": {
+                "name": str(target.get("name")),
+                "description": str(target.get("description")),
+                "plugin": {
+                    "type": str(target.get("pdriver")),
+                    "parameters": [{
+                        "input": "entrypoint",
+                        "value": str(target.get(
+                            "pdriver_config").get("host"))}]}},
+            # 4. targets section
+            "targets": [{
+                "id": "01",
+                "author": str(ec.experiment.target.get("vendor")),
+                "name": str(ec.experiment.target.get("name")),
+                "version": str(ec.experiment.target.get("version"))}],
+            "scenario": {"nodes": list(), "links": list()},
+            "proceedings": {"attributes": list(),
+                            "agents": list(),
+                            "monitors": list()}}
+        t1 = bd["targets"][0]
+        # 5. scenario section
+        # 5.1. nodes
+        if ec.vnfds is not None:
+            for path, vnfd in ec.vnfds.items():
+                if "mp." in vnfd.get("name"):
+                    nid = vnfd.get("name")
+                    short_nid = nid
+                else:
+                    # full tripple nid
+                    nid = "{}.{}.{}".format(
+                        vnfd.get("vendor"),
+                        vnfd.get("name"),
+                        vnfd.get("version"))
+                    # short vnf_id defined in NSD
+                    if ec.nsd is not None:
+                        short_nid = self._find_vnf_id(vnfd.get("name"), ec.nsd)
+                    else:
+                        short_nid = nid
+                # attention: assumes single VDU
+                vdu = vnfd.get("virtual_deployment_units")[0]
+                # 5.1.1. resources
+                res = vdu.get("resource_requirements")
+                cpu = dict()
+                if res.get("cpu").get("vcpus"):
+                    cpu["vcpus"] = _uint32(res.get("cpu").get("vcpus"))
+                if res.get("cpu").get("cpu_bw"):
+                    cpu["cpu_bw"] = str(res.get("cpu").get("cpu_bw"))
+                if res.get("cpu").get("vcpus"):
+                    cpu["pinning"] = str(res.get("cpu").get("vcpus"))
+                memory = dict()
+                if res.get("memory").get("size"):
+                    memory["size"] = _uint32(res.get("memory").get("size"))
+                if res.get("memory").get("size_unit"):
+                    memory["unit"] = str(res.get("memory").get("size_unit"))
+                storage = dict()
+                if res.get("storage").get("size"):
+                    storage["size"] = _uint32(res.get("storage").get("size"))
+                if res.get("storage").get("size_unit"):
+                    storage["unit"] = str(
+                        res.get("storage").get("size_unit"))
+                storage["volumes"] = str(None)  # not supported
+                n1 = _add(bd["scenario"]["nodes"], "id", nid, {
+                    "type": "external",  # tng-bench always uses ext. ones?
+                    "image": str(vdu.get("vm_image")),
+                    "image_format": str(vdu.get("vm_image_format")),
+                    "resources": {"cpu": cpu,
+                                  "memory": memory,
+                                  "storage": storage},
+                    "connection_points": list(),
+                    "lifecycle": list()})
+                # 5.1.2. connection points
+                for cp in vnfd.get("connection_points", []):
+                    # build connection point id: node_id:cp_id
+                    cp_id = "{}:{}".format(short_nid, cp.get("id"))
+                    _add(n1["connection_points"], "id", cp_id, {
+                        "interface": str(cp.get("interface")),
+                        "type": str(cp.get("type"))})
+                # 5.1.3. lifecycle
+                # tng-bench only has two lifecycle events: start and stop
+                # tng-bench does not support parameters (add two cmds instead)
+                for workflow in ["start", "stop"]:
+                    _add(n1["lifecycle"], "workflow", workflow, {
+                        "implementation": str(ec.parameter.get(
+                            "ep::function::{}::cmd_{}".format(
+                                nid, workflow), ""))})
+        # 5.2. links
+        if ec.nsd is not None:
+            for vl in ec.nsd.get("virtual_links"):
+                _add(bd["scenario"]["links"], "id", vl.get("id"), {
+                    "type": str(vl.get("connectivity_type")),
+                    "connection_point_refs": [
+                        str(cpr) for cpr
+                        in vl.get("connection_points_reference")]})
+        # 6. proceedings section
+        # 6.1. attributes
+        _add(bd["proceedings"]["attributes"], "name", "duration", {
+            "value": str(ec.parameter.get("ep::header::all::time_limit"))})
+        # 6.2 agents (turn tng-bench measurement points into agents)
+        for mp in ec.experiment.measurement_points:
+            parameters = list()
+            for k, v in mp.items():
+                # add mp info as properties
+                _add(parameters, "input", k, {"value": str(v)})
+            for workflow in ["start", "stop"]:
+                _add(parameters, "input", workflow, {
+                    "value": str(ec.parameter.get(
+                        "ep::function::{}::cmd_{}".format(
+                            mp.get("name"), workflow), ""))})
+            _add(bd["proceedings"]["agents"], "id", mp.get("name"), {
+                "host": {"setting": "internal",
+                         "node": str(mp.get("name"))},
+                "probers": [{"id": "1",
+                             "instances": _uint32(1),
+                             "name": str(mp.get("name")),
+                             "parameters": parameters}]})
+        # 6.3 monitors (only add the default prometheus monitor)
+        node = "{}.{}.{}".format(t1["author"], t1["name"], t1["version"])
+        bd["proceedings"]["monitors"].append({
+            "id": "default",
+            "host": {"setting": "external", "node": node},
+            "listeners": [{"id": "1",
+                           "name": "prometheus",
+                           "parameters": [{"input": "target",
+                                           "value": node}]}]})
+        return {BD_ROOT: _prune(bd)}
+
+    def _build_bd_model(self, ex_id, ec):
+        """
+        Build the BD using the (pyangbind) vnf_bd model.
+        Returns the model's IETF JSON representation.
+        """
+        # import on first use (loading the generated model is slow)
+        from tngsdk.benchmark.ietf.vnf_bd import vnf_bd as VNF_BD_Model
+        import pyangbind.lib.pybindJSON as pybindJSON
+        # instantiate model
+        m = VNF_BD_Model()
         # populate the model with the actual data
         # (always assing strings, assigning ints does not work,
         # types seem to be automaticall converted by the model)
@@ -214,14 +454,8 @@ class IetfBmwgVnfBD_Generator(object):
         li1.name = "prometheus"
         p1 = li1.parameters.add("target")
         p1.value = mo1.host.node
-        # render BD using template
-        bd_str_json = pybindJSON.dumps(m, mode="ietf")  # serialize
-        bd_str = yaml.dump(json.loads(bd_str_json))  # translate json to yaml
-        # write BD
-        ensure_dir(bd_path)
-        with open(bd_path, "w") as f:
-            f.write(bd_str)
-        return bd_path
+        # serialize
+        return json.loads(pybindJSON.dumps(m, mode="ietf"))
 
     def _get_ep_from_ec(self, ec, node, ep_name):
         """
@@ -235,3 +469,81 @@ class IetfBmwgVnfBD_Generator(object):
         LOG.warning("Could not find resource limit for node: {}"
                     .format(node))
         return None
+
+
+def _generate_bd_worker(task):
+    """
+    Generates the BD of a single EC in a worker process.
+    """
+    args, ex_id, ec, base = task
+    return IetfBmwgVnfBD_Generator(args, list())._try_generate_bd(
+        ex_id, ec, base)
+
+
+def load_bd(path):
+    """
+    Load a generated BD: a full BD (YAML) or a BD stored as
+    delta (JSON patch) to the base BD of its experiment
+    (--ibbd-mode delta).
+    """
+    return _load_bd(path, dict())
+
+
+def iter_bds(ibbd_dir):
+    """
+    Yield (name, BD) for all BDs in the given folder
+    (full and delta BDs, sorted by name). Base BDs
+    are loaded only once.
+    """
+    base_cache = dict()
+    for f in sorted(os.listdir(ibbd_dir)):
+        if f.endswith(PATH_BASE_BD.format("")):
+            continue
+        for suffix in [PATH_BD.format(""), PATH_DELTA_BD.format("")]:
+            if f.endswith(suffix):
+                yield (f[:-len(suffix)],
+                       _load_bd(os.path.join(ibbd_dir, f), base_cache))
+
+
+def _load_bd(path, base_cache):
+    if not path.endswith(PATH_DELTA_BD.format("")):
+        return read_yaml(path)
+    delta = read_json(path)
+    base_path = os.path.join(os.path.dirname(path), delta.get("base"))
+    if base_path not in base_cache:
+        base_cache[base_path] = read_yaml(base_path)
+    return apply_patch(base_cache[base_path], delta.get("patch"))
+
+
+def _uint32(value):
+    """
+    Convert like the model's uint32 leafs.
+    """
+    value = int(str(value))
+    if value < 0 or value > UINT32_MAX:
+        raise ValueError("{} not in uint32 range".format(value))
+    return value
+
+
+def _add(entries, key_name, key, entry):
+    """
+    Add entry to a keyed list (keys are unique like in the model).
+    """
+    key = str(key)
+    if any(e.get(key_name) == key for e in entries):
+        raise KeyError("Duplicate list entry: {}".format(key))
+    entry[key_name] = key
+    entries.append(entry)
+    return entry
+
+
+def _prune(obj):
+    """
+    Remove empty containers and lists (not part of the IETF JSON output).
+    """
+    if isinstance(obj, dict):
+        obj = {k: _prune(v) for k, v in obj.items()}
+        return {k: v for k, v in obj.items() if v != dict() and v != list()}
+    if isinstance(obj, list):
+        return [_prune(v) for v in obj]
+    return obj
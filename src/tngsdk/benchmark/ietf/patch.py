@@ -0,0 +1,116 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import copy
+
+
+# Minimal JSON patch (RFC 6902) support used to store BDs as deltas
+# to a shared base BD. Only the operations add, remove and replace
+# are generated and applied.
+
+
+def make_patch(src, dst, path=""):
+    """
+    Return list of operations that turns src into dst.
+    Lists of equal length are compared element-wise,
+    otherwise they are replaced as a whole.
+    """
+    if type(src) is not type(dst):
+        return [{"op": "replace", "path": path, "value": dst}]
+    if isinstance(src, dict):
+        ops = list()
+        for k in sorted(src):
+            if k not in dst:
+                ops.append({"op": "remove",
+                            "path": "{}/{}".format(path, _escape(k))})
+        for k in sorted(dst):
+            p = "{}/{}".format(path, _escape(k))
+            if k not in src:
+                ops.append({"op": "add", "path": p, "value": dst[k]})
+            else:
+                ops.extend(make_patch(src[k], dst[k], p))
+        return ops
+    if isinstance(src, list) and len(src) == len(dst):
+        ops = list()
+        for i, (s, d) in enumerate(zip(src, dst)):
+            ops.extend(make_patch(s, d, "{}/{}".format(path, i)))
+        return ops
+    if src != dst:
+        return [{"op": "replace", "path": path, "value": dst}]
+    return list()
+
+
+def apply_patch(doc, patch):
+    """
+    Apply the operations of patch to a copy of doc and return it.
+    """
+    doc = copy.deepcopy(doc)
+    for op in patch:
+        keys = [_unescape(k) for k in op.get("path").split("/")[1:]]
+        if len(keys) < 1:  # whole document
+            if op.get("op") == "remove":
+                raise BaseException("Cannot remove the document root")
+            doc = copy.deepcopy(op.get("value"))
+            continue
+        parent = doc
+        for k in keys[:-1]:
+            parent = parent[int(k) if isinstance(parent, list) else k]
+        k = keys[-1]
+        if isinstance(parent, list):
+            k = len(parent) if k == "-" else int(k)
+        if op.get("op") == "add":
+            if isinstance(parent, list):
+                parent.insert(k, copy.deepcopy(op.get("value")))
+            else:
+                parent[k] = copy.deepcopy(op.get("value"))
+        elif op.get("op") == "replace":
+            if isinstance(parent, list):
+                if not 0 <= k < len(parent):
+                    raise IndexError("Cannot replace missing index {} of {}"
+                                     .format(k, op.get("path")))
+            elif k not in parent:
+                raise KeyError("Cannot replace missing key {} of {}"
+                               .format(k, op.get("path")))
+            parent[k] = copy.deepcopy(op.get("value"))
+        elif op.get("op") == "remove":
+            del parent[k]
+        else:
+            raise BaseException("Unsupported patch operation: {}"
+                                .format(op.get("op")))
+    return doc
+
+
+def _escape(key):
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(key):
+    return key.replace("~1", "/").replace("~0", "~")
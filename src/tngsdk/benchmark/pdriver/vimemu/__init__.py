@@ -32,9 +32,13 @@
 import os
 import time
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from tngsdk.benchmark.pdriver.vimemu.emuc import LLCMClient
 from tngsdk.benchmark.pdriver.vimemu.emuc import EmuSrvClient
+from tngsdk.benchmark.pdriver.vimemu.emuc import create_session
 from tngsdk.benchmark.pdriver.vimemu.dockerc import EmuDockerClient
+from tngsdk.benchmark.pdriver.vimemu.sampler import EmuContainerSampler
+from tngsdk.benchmark.pdriver.vimemu.sampler import SAMPLER_IMAGE
 # from tngsdk.benchmark.pdriver.vimemu.dockerc import EmuDockerMonitor
 from tngsdk.benchmark.helper import parse_ec_parameter_key, write_json
 from tngsdk.benchmark.logger import TangoLogger
@@ -46,6 +50,9 @@ LOG = TangoLogger.getLogger(__name__)
 # global configurations
 WAIT_SHUTDOWN_TIME = 2  # FIXME give experiment some cooldown time
 WAIT_PADDING_TIME = 3  # FIXME extra time to wait (to have some buffer)
+WAIT_NUMBER_OF_OUTPUTS = 10  # status outputs while waiting
+PROBE_INTERVAL = .2  # seconds between two readiness probe checks
+COLLECT_WORKERS = 8  # containers collected in parallel
 PATH_SHARE = "/tngbench_share"
 PATH_CMD_START_LOG = "cmd_start.log"
 PATH_CMD_STOP_LOG = "cmd_stop.log"
@@ -80,10 +87,26 @@ class VimEmuDriver(object):
                                    config.get("docker_port")))
         self.t_experiment_start = None
         self.t_experiment_stop = None
-        # initialize sub-driver
-        self.emusrvc = EmuSrvClient(self.emusrv_url)
-        self.llcmc = LLCMClient(self.llcm_url)
+        # epoch time the current run started (filters container logs)
+        self.t_run_start = None
+        # fixed waiting times (can be reduced in the target config)
+        self.wait_shutdown_time = float(config.get(
+            "wait_shutdown_time", WAIT_SHUTDOWN_TIME))
+        self.wait_padding_time = float(config.get(
+            "wait_padding_time", WAIT_PADDING_TIME))
+        # package of the running service (if emulation is kept alive)
+        self.active_package = None
+        # initialize sub-driver (sharing one HTTP session)
+        self.session = create_session()
+        self.emusrvc = EmuSrvClient(self.emusrv_url, self.session)
+        self.llcmc = LLCMClient(self.llcm_url, self.session)
         self.emudocker = EmuDockerClient(self.docker_url)
+        # optional: sample container counters (sampler_rate in Hz)
+        self.sampler = None
+        if float(config.get("sampler_rate", 0)) > 0:
+            self.sampler = EmuContainerSampler(
+                self.emudocker, config.get("sampler_rate"),
+                config.get("sampler_image", SAMPLER_IMAGE))
         LOG.info("Initialized VimEmuDriver with {}"
                  .format(self.config))
 
@@ -92,7 +115,18 @@ class VimEmuDriver(object):
         self.emusrvc.check_platform_ready()
 
     def setup_experiment(self, ec):
-        # start emulator
+        self.t_run_start = time.time()
+        if self.active_package is not None:
+            if self.active_package == self._get_package_id(ec):
+                # same package: only differs in repetition or commands
+                LOG.info("Reusing running emulation and service: {}"
+                         .format(self.nsi_uuid))
+                self._reset_share_folders()
+                return
+            # other package: we need a fresh emulation
+            self._stop_active_emulation()
+        # start emulator (with new containers)
+        self.emudocker.clear_cache()
         self.emusrvc.start_emulation()
         # wait for emulator ready
         self.emusrvc.wait_emulation_ready(self.llcmc)
@@ -101,6 +135,8 @@ class VimEmuDriver(object):
         # instantiate service
         self.nsi_uuid = self.llcmc.instantiate_service(ns_uuid)
         LOG.info("Instantiated service: {}".format(self.nsi_uuid))
+        if getattr(self.args, "reuse_emulation", False):
+            self.active_package = self._get_package_id(ec)
 
     def execute_experiment(self, ec):
         # start container monitoring (dedicated thread)
@@ -125,17 +161,19 @@ class VimEmuDriver(object):
         # 4. mp_in_cmd_stop
         # 5. mp_out_cmd_stop
         # 6. vnf_cmd_stop
+        # commands of all VNFs are dispatched concurrently
         # FIXME make this user-configurable and more flexible
+        if self.sampler is not None:
+            self.sampler.start(self.emudocker.list_emu_containers())
         LOG.debug("Executing start commands inside containers ...")
-        for vnf_cname, cmd in vnf_cmd_start_dict.items():
-            self.emudocker.execute(vnf_cname, cmd,
+        self.emudocker.execute_all(vnf_cmd_start_dict,
                                    os.path.join(PATH_SHARE,
                                                 PATH_CMD_START_LOG))
         # give the VNF time to start: wait for "time_warmup"
+        # or until all readiness probes are successful
         time_warmup = int(ec.parameter.get(
             "ep::header::all::time_warmup"))
-        LOG.info("Warmup period ({}s) ...".format(time_warmup))
-        time.sleep(time_warmup)
+        self._wait_warmup(ec, time_warmup)
         LOG.info("Stimulating ...")
         self.emudocker.execute(MP_OUT_NAME, mp_out_cmd_start,
                                os.path.join(PATH_SHARE, PATH_CMD_START_LOG))
@@ -154,12 +192,17 @@ class VimEmuDriver(object):
         self.emudocker.execute(MP_OUT_NAME, mp_out_cmd_stop,
                                os.path.join(PATH_SHARE,
                                             PATH_CMD_STOP_LOG), block=True)
-        for vnf_cname, cmd in vnf_cmd_stop_dict.items():
-            self.emudocker.execute(vnf_cname, cmd,
+        self.emudocker.execute_all(vnf_cmd_stop_dict,
                                    os.path.join(PATH_SHARE,
                                                 PATH_CMD_STOP_LOG), block=True)
-        self._wait_time(WAIT_SHUTDOWN_TIME,
-                        "Finalizing experiment '{}'".format(ec))
+        if self._has_stop_commands(ec):
+            # all blocking stop commands returned: nothing to wait for
+            LOG.debug("Stop commands finished, skipping shutdown wait")
+        else:
+            self._wait_time(self.wait_shutdown_time,
+                            "Finalizing experiment '{}'".format(ec))
+        if self.sampler is not None:
+            self.sampler.stop(os.path.join(self.args.result_dir, ec.name))
         # wait for monitoring thread to finalize
         # LOG.debug("Waiting for container monitoring thread ...")
         # self.emudocker_mon.join()
@@ -168,27 +211,56 @@ class VimEmuDriver(object):
         LOG.info("Finalized '{}'".format(ec))
 
     def teardown_experiment(self, ec):
+        if self.active_package is not None:
+            # keep emulation alive (--reuse-emulation), it is stopped
+            # once a different package or teardown_platform comes
+            return
         # tearminate the test service
         # self.llcmc.terminate_service(self.nsi_uuid)  # disabled for now
         # stop the emulation
         self.emusrvc.stop_emulation()
+        self.emudocker.clear_cache()
 
     def teardown_platform(self):
-        pass
+        if self.active_package is not None:
+            self._stop_active_emulation()
+
+    def _get_package_id(self, ec):
+        """
+        Configurations that only differ in repetition or commands
+        have different package files with the same content key.
+        """
+        key = getattr(ec, "package_key", None)
+        return key if key is not None else ec.package_path
+
+    def _stop_active_emulation(self):
+        LOG.info("Stopping reused emulation of {}"
+                 .format(self.active_package))
+        self.active_package = None
+        self.emusrvc.stop_emulation()
+        self.emudocker.clear_cache()
+
+    def _reset_share_folders(self):
+        """
+        Clean the share folders of all containers, so that a reused
+        service starts with the same state as a freshly deployed one.
+        """
+        for c in self.emudocker.list_emu_containers():
+            self.emudocker.reset_folder(c.name, PATH_SHARE)
 
     def _collect_experiment_results(self, ec):
         LOG.info("Collecting experiment results ...")
         # generate result paths
         dst_path = os.path.join(self.args.result_dir, ec.name)
-        # for each container collect files from containers
-        for c in self.emudocker.list_emu_containers():
-            c_dst_path = os.path.join(dst_path, c.name)
-            self.emudocker.copy_folder(c.name, PATH_SHARE, c_dst_path)
-        # for each container collect log outputs and write to files
-        for c in self.emudocker.list_emu_containers():
-            c_dst_path = os.path.join(dst_path, c.name)
-            self.emudocker.store_logs(
-                c.name, os.path.join(c_dst_path, PATH_CONTAINER_LOG))
+        # collect files and log outputs from all containers (in parallel)
+        containers = self.emudocker.list_emu_containers()
+        if len(containers) > 0:
+            with ThreadPoolExecutor(max_workers=min(
+                    len(containers), COLLECT_WORKERS)) as pool:
+                # list: re-raise exceptions of the workers
+                list(pool.map(
+                    lambda c: self._collect_container_results(c, dst_path),
+                    containers))
         # colelct and store continous monitoring data
         # self.emudocker_mon.store_stats(
         #    os.path.join(dst_path, PATH_CONTAINER_MON))
@@ -199,6 +271,14 @@ class VimEmuDriver(object):
         self._store_times(
             os.path.join(dst_path, PATH_EXPERIMENT_TIMES))
 
+    def _collect_container_results(self, c, dst_path):
+        c_dst_path = os.path.join(dst_path, c.name)
+        self.emudocker.copy_folder(c.name, PATH_SHARE, c_dst_path)
+        # only the logs of this run (containers can be reused)
+        self.emudocker.store_logs(
+            c.name, os.path.join(c_dst_path, PATH_CONTAINER_LOG),
+            since=self.t_run_start)
+
     def _store_times(self, path):
         data = {
             "experiment_start": str(self.t_experiment_start),
@@ -251,11 +331,82 @@ class VimEmuDriver(object):
                 ec.function_ids.get(
                     param_func_name, param_func_name), param_unit_name)
 
+    def _wait_warmup(self, ec, time_warmup):
+        """
+        Wait until all readiness probes defined in the PED are
+        successful. time_warmup is used as upper bound.
+        Without probes, we always wait for time_warmup.
+        """
+        probes = ec.experiment.readiness_probes
+        if probes is None or len(probes) < 1:
+            LOG.info("Warmup period ({}s) ...".format(time_warmup))
+            self._wait_time(time_warmup, "Warmup '{}'".format(ec))
+            return
+        LOG.info("Warmup period (max. {}s, {} readiness probes) ..."
+                 .format(time_warmup, len(probes)))
+        t_start = time.monotonic()
+        pending = list(probes)
+        while True:
+            pending = [p for p in pending
+                       if not self._check_readiness_probe(ec, p)]
+            if len(pending) < 1:
+                LOG.info("All readiness probes successful after {:.1f}s"
+                         .format(time.monotonic() - t_start))
+                return
+            if time.monotonic() - t_start >= time_warmup:
+                break
+            time.sleep(PROBE_INTERVAL)
+        LOG.warning("Readiness probes not successful after {}s: {}"
+                    .format(time_warmup, pending))
+
+    def _check_readiness_probe(self, ec, probe):
+        """
+        Executes a single readiness probe inside the container of
+        the probed function. Supported probe types:
+        - tcp_port: TCP port is open (optional host, default: localhost)
+        - log_match: regex found in log file (default: cmd_start log)
+        - cmd: command returns exit code 0
+        The probed unit is given as function: "vnf/vdu" (like in
+        the experiment parameters) or as separate function and
+        unit keys (default unit: vdu01).
+        """
+        function, unit = probe.get("function"), probe.get("unit")
+        if unit is None and function is not None and "/" in function:
+            function, unit = function.split("/", 1)
+        cname = self.get_cname_by_parameter(ec, function, unit)
+        if probe.get("tcp_port") is not None:
+            cmd = ["bash", "-c", "</dev/tcp/{}/{}".format(
+                probe.get("host", "127.0.0.1"), probe.get("tcp_port"))]
+        elif probe.get("log_match") is not None:
+            cmd = ["grep", "-qE", str(probe.get("log_match")),
+                   probe.get("log_file",
+                             os.path.join(PATH_SHARE, PATH_CMD_START_LOG))]
+        elif probe.get("cmd") is not None:
+            cmd = ["bash", "-c", str(probe.get("cmd"))]
+        else:
+            raise BaseException("Unknown readiness probe: {}"
+                                .format(probe))
+        return self.emudocker.check(cname, cmd) == 0
+
+    def _has_stop_commands(self, ec):
+        """
+        True if both MPs and all started VNFs have a stop command.
+        """
+        if (ec.parameter.get("{}cmd_stop".format(MP_IN_KEY)) is None
+                or ec.parameter.get("{}cmd_stop".format(MP_OUT_KEY)) is None):
+            return False
+        vnf_cmd_start_dict, vnf_cmd_stop_dict = self._collect_vnf_commands(ec)
+        return all(vnf_cmd_stop_dict.get(c) is not None
+                   for c in vnf_cmd_start_dict.keys())
+
     def _experiment_wait_time(self, ec):
         time_limit = int(ec.parameter.get("ep::header::all::time_limit", 0))
         if time_limit < 1:
             return time_limit
-        time_limit += WAIT_PADDING_TIME
+        probes = ec.experiment.readiness_probes
+        if probes is None or len(probes) < 1:
+            # buffer for VNFs that are not ready when the warmup ends
+            time_limit += self.wait_padding_time
         return time_limit
 
     def _wait_experiment(self, ec, text="Running experiment"):
@@ -265,12 +416,13 @@ class VimEmuDriver(object):
         self._wait_time(time_limit, "{} '{}'".format(text, ec))
 
     def _wait_time(self, time_limit, text="Wait"):
-        WAIT_NUMBER_OF_OUTPUTS = 10  # FIXME make configurable
-        if time_limit < 1:
+        if time_limit <= 0:
             return  # we don't need to wait
-        time_slot = int(time_limit / WAIT_NUMBER_OF_OUTPUTS)
-        # wait and print status
+        # wait exactly time_limit and print status in between
+        t_end = time.monotonic() + time_limit
         for i in range(0, WAIT_NUMBER_OF_OUTPUTS):
-            time.sleep(time_slot)
+            t_next = t_end - (time_limit / WAIT_NUMBER_OF_OUTPUTS
+                              * (WAIT_NUMBER_OF_OUTPUTS - i - 1))
+            time.sleep(max(0, t_next - time.monotonic()))
             LOG.debug("{}\t... {}%"
                       .format(text, (100 / WAIT_NUMBER_OF_OUTPUTS) * (i + 1)))
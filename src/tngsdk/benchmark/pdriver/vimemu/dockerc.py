@@ -29,20 +29,21 @@
 # the Horizon 2020 and 5G-PPP programmes. The authors would like to
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
-import os
+import io
+import logging
 import docker
 import tarfile
 import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from tngsdk.benchmark.logger import TangoLogger
-from tngsdk.benchmark.helper import ensure_dir
 
 LOG = TangoLogger.getLogger(__name__)
 
 
 MONITORING_RATE = .5  # monitoring records per second
-PATH_TEMP_TAR = "/tmp/tng-bench/.tngbench_share.tar"
+EXECUTE_WORKERS = 8  # commands dispatched in parallel
 
 
 class EmuDockerClient(object):
@@ -54,6 +55,8 @@ class EmuDockerClient(object):
     def __init__(self, endpoint):
         self.endpoint = "{}".format(endpoint)
         self.client = None
+        # container objects of the running experiment (by name)
+        self._containers = dict()
         try:
             self.client = docker.DockerClient(
                 base_url=self.endpoint, timeout=5)
@@ -79,7 +82,7 @@ class EmuDockerClient(object):
         LOG.debug("Execute on '{}' to logfile '{}': '{}'".format(
             container_name, logfile, cmd))
         # get the container
-        c = self.client.containers.get(container_name)
+        c = self.get_container(container_name)
         assert(c is not None)
         # build full cmd
         postfix = ""
@@ -91,13 +94,89 @@ class EmuDockerClient(object):
             cmd, stdin=False, stdout=False, detach=(not block))
         LOG.debug("Out (empty in detach mode): return code: {}; stdout: '{}'"
                   .format(rcode, rdata))
-        LOG.debug("Top on '{}': {}".format(container_name, c.top()))
+        if LOG.isEnabledFor(logging.DEBUG):  # extra round trip
+            LOG.debug("Top on '{}': {}".format(container_name, c.top()))
+
+    def execute_all(self, commands, logfile, block=False):
+        """
+        Run commands on multiple containers concurrently.
+        commands: dict container_name -> cmd
+        Returns once all commands are dispatched
+        (or finished if block=True).
+        """
+        if len(commands) < 1:
+            return
+        if len(commands) == 1:  # no need for a thread pool
+            for container_name, cmd in commands.items():
+                self.execute(container_name, cmd, logfile, block=block)
+            return
+        with ThreadPoolExecutor(max_workers=min(
+                len(commands), EXECUTE_WORKERS)) as pool:
+            # list: re-raise exceptions of the workers
+            list(pool.map(
+                lambda item: self.execute(
+                    item[0], item[1], logfile, block=block),
+                commands.items()))
+
+    def check(self, container_name, cmd):
+        """
+        Run command on container and wait for it.
+        Returns the exit code of the command.
+        """
+        container_name = "mn.{}".format(container_name)
+        try:
+            c = self.get_container(container_name)
+            rcode, _ = c.exec_run(cmd, stdin=False, stdout=False)
+        except BaseException as ex:
+            LOG.debug("Check on '{}' failed: {}".format(container_name, ex))
+            return -1
+        LOG.debug("Check on '{}': '{}' returned {}"
+                  .format(container_name, cmd, rcode))
+        return rcode
+
+    def reset_folder(self, container_name, path):
+        """
+        Remove all contents of the given folder inside the container.
+        """
+        LOG.debug("Reset folder '{}' in docker {}".format(
+            path, container_name))
+        c = self.get_container(container_name)
+        rcode, _ = c.exec_run(
+            "find {} -mindepth 1 -delete".format(path),
+            stdin=False, stdout=False)
+        if rcode != 0:
+            LOG.warning("Could not reset folder '{}' in docker {}"
+                        .format(path, container_name))
 
     def list_emu_containers(self):
         """
         Return all containers with "mn." as name prefix.
         """
-        return [c for c in self.client.containers.list() if "mn." in c.name]
+        cl = [c for c in self.client.containers.list() if "mn." in c.name]
+        for c in cl:
+            self._containers[c.name] = c
+        return cl
+
+    def get_container(self, container_name):
+        """
+        Return container object (cached, to avoid a round trip
+        for each command).
+        """
+        c = self._containers.get(container_name)
+        if c is None:
+            c = self.client.containers.get(container_name)
+            self._containers[container_name] = c
+        return c
+
+    def clear_cache(self, container_name=None):
+        """
+        Forget all container objects, e.g., when the emulation stops
+        (or only the given one).
+        """
+        if container_name is not None:
+            self._containers.pop(container_name, None)
+            return
+        self._containers = dict()
 
     def copy_folder(self, container_name, src_path, dst_path):
         """
@@ -107,31 +186,32 @@ class EmuDockerClient(object):
         LOG.debug("Collect files from docker {}: {} -> {}".format(
             container_name, src_path, dst_path))
         try:
-            c = self.client.containers.get(container_name)
+            c = self.get_container(container_name)
             strm, _ = c.get_archive(src_path)
-            # write to intermediate tar
-            ensure_dir(PATH_TEMP_TAR)
-            with open(PATH_TEMP_TAR, 'wb') as f:
-                for d in strm:
-                    f.write(d)
-            tar = tarfile.TarFile(PATH_TEMP_TAR)
-            tar.extractall(dst_path)
-            os.remove(PATH_TEMP_TAR)
+            # extract while downloading (no intermediate tar file)
+            with tarfile.open(fileobj=io.BufferedReader(ChunkReader(strm)),
+                              mode="r|") as tar:
+                tar.extractall(dst_path)
         except BaseException as ex:
             LOG.warning("Could not collect froles from docker {}: {}"
                         .format(container_name, ex))
 
-    def store_logs(self, container_name, dst_path):
+    def store_logs(self, container_name, dst_path, since=None):
         """
         Get logs from given container and store them to dst_path.
+        since: only logs after this epoch time (float), e.g.,
+        the start of the current run if the container is reused.
         """
         LOG.debug("Collect logs from docker {} -> {}".format(
             container_name, dst_path))
-        c = self.client.containers.get(container_name)
+        c = self.get_container(container_name)
         try:
             with open(dst_path, "w") as f:
                 # can be emtpy since we do not use Docker's default CMD ep.
-                f.write(str(c.logs()))
+                if since is None:
+                    f.write(str(c.logs()))
+                else:
+                    f.write(str(c.logs(since=since)))
         except IOError as ex:
             LOG.warning("Could not store logs to {}: {}".format(dst_path, ex))
 
@@ -180,3 +260,28 @@ class EmuDockerMonitor(threading.Thread):
         LOG.debug("Writing Docker stats: {}".format(dst_path))
         with open(dst_path, "w") as f:
             f.write(json.dumps(self.recorded_stats))
+
+
+class ChunkReader(io.RawIOBase):
+    """
+    File-like (read-only) wrapper around an iterator of bytes chunks,
+    e.g., the stream returned by Docker's get_archive.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buf = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self.buf) < 1:
+            try:
+                self.buf = next(self.chunks)
+            except StopIteration:
+                return 0  # EOF
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
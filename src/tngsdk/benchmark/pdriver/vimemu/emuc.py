@@ -32,20 +32,40 @@
 import requests
 import time
 import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tngsdk.benchmark.logger import TangoLogger
 
 LOG = TangoLogger.getLogger(__name__)
 
 
+HTTP_RETRIES = 3  # retries of idempotent requests (not POST)
+HTTP_BACKOFF = .1  # seconds (doubled for each retry)
+
+
+def create_session():
+    """
+    HTTP session with keep-alive connections and automatic retries,
+    shared by the clients of a target.
+    """
+    session = requests.Session()
+    retry = Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF,
+                  status_forcelist=[502, 503, 504])
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    return session
+
+
 class EmuSrvClient(object):
 
-    def __init__(self, endpoint):
+    def __init__(self, endpoint, session=None):
         self.emu_endpoint = "{}/api/v1/emulation".format(endpoint)
+        self.session = session if session is not None else create_session()
         LOG.debug("Initialized EmuSrv client for {}".format(endpoint))
 
     def check_platform_ready(self):
         try:
-            r = requests.get(self.emu_endpoint)
+            r = self.session.get(self.emu_endpoint)
         except BaseException as ex:
             LOG.debug(ex)
             raise BaseException("con't connect to tng-bench-emusrv ")
@@ -56,7 +76,7 @@ class EmuSrvClient(object):
 
     def start_emulation(self):
         try:
-            r = requests.post(self.emu_endpoint)
+            r = self.session.post(self.emu_endpoint)
         except BaseException as ex:
             LOG.debug(ex)
             raise BaseException("con't connect to tng-bench-emusrv ")
@@ -73,7 +93,7 @@ class EmuSrvClient(object):
         stopped = False
         for i in range(0, 5):
             try:
-                r = requests.delete(self.emu_endpoint)
+                r = self.session.delete(self.emu_endpoint)
                 stopped = True
                 break
             except BaseException as ex:
@@ -85,37 +105,40 @@ class EmuSrvClient(object):
             raise BaseException(
                 "tng-bench-emusrv couldn't stop emulation")
 
-    def wait_emulation_ready(self, llcmc, timeout=60):
-        for i in range(0, timeout):
+    def wait_emulation_ready(self, llcmc, timeout=60, interval=.2):
+        t_start = time.monotonic()
+        LOG.info("Waiting for emulator LLCM (timeout: {}s) ..."
+                 .format(timeout))
+        while time.monotonic() - t_start < timeout:
             try:
-                LOG.info("Waiting for emulator LLCM ... {}/{}"
-                         .format(i, timeout))
                 r = llcmc.list_packages()
                 if r.status_code == 200:
-                    LOG.info("Emulator LLCM ready")
+                    LOG.info("Emulator LLCM ready after {:.1f}s"
+                             .format(time.monotonic() - t_start))
                     return True
             except BaseException:
                 pass  # ignore connection failures
-            time.sleep(1)  # wait for retry
+            time.sleep(interval)  # wait for retry
         raise BaseException("Timeout. Emulation LLCM was not ready in time")
 
 
 class LLCMClient(object):
 
-    def __init__(self, endpoint):
+    def __init__(self, endpoint, session=None):
         self.pkg_endpoint = "{}/packages".format(endpoint)
+        self.session = session if session is not None else create_session()
         self.nsi_endpoint = "{}/instantiations".format(endpoint)
         LOG.debug("Initialized LLCM client for {}".format(endpoint))
 
     def list_packages(self):
-        return requests.get(self.pkg_endpoint)
+        return self.session.get(self.pkg_endpoint)
 
     def upload_package(self, pkg_path):
         LOG.info("On-boarding to LLCM: {}".format(pkg_path))
         with open(pkg_path, "rb") as f:
             data = {"package": f.read()}
             t_start = time.time()
-            r = requests.post(
+            r = self.session.post(
                 self.pkg_endpoint, files=data)
             self._t_onboarding = time.time() - t_start
             if r.status_code == 201:
@@ -126,7 +149,7 @@ class LLCMClient(object):
         LOG.info("Instantiating NS: {}".format(uuid))
         data = {"service_uuid": uuid}
         t_start = time.time()
-        r = requests.post(
+        r = self.session.post(
             self.nsi_endpoint, json=data)
         self._t_instantiation = time.time() - t_start
         if r.status_code == 201:
@@ -136,7 +159,7 @@ class LLCMClient(object):
     def terminate_service(self, uuid):
         LOG.info("Terminating NS: {}".format(uuid))
         data = {"service_instance_uuid": uuid}
-        r = requests.delete(
+        r = self.session.delete(
             self.nsi_endpoint, json=data)
         if r.status_code == 200:
             return r.text
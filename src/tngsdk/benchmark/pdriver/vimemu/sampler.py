@@ -0,0 +1,270 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import json
+import numpy as np
+from tngsdk.benchmark.logger import TangoLogger
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+SAMPLER_NAME = "tngbench-sampler"
+SAMPLER_IMAGE = "python:3.6-slim"
+SAMPLER_OUTPUT = "/tmp/samples.bin"
+SAMPLER_STOP_TIMEOUT = 5  # seconds
+PATH_SAMPLES = "samples.bin"
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# Executed with python3 inside the sampler container
+# (host PID namespace, host cgroup fs mounted read-only).
+# argv: containers (JSON: [[name, id, pid], ...]), rate, output[, cgroup]
+# Output: one JSON header line followed by records of little-endian
+# doubles: t (monotonic), then the header's fields for each container
+# (NaN: missing).
+SAMPLER_SCRIPT = r'''
+import sys, os, time, json, struct, signal
+CONTAINERS = json.loads(sys.argv[1])
+RATE = float(sys.argv[2])
+OUT = sys.argv[3]
+CG = sys.argv[4] if len(sys.argv) > 4 else "/sys/fs/cgroup"
+NAN = float("nan")
+V2 = os.path.exists(os.path.join(CG, "cgroup.controllers"))
+
+
+def rd(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except (IOError, OSError):
+        return None
+
+
+def first(paths):
+    for p in paths:
+        if os.path.exists(p):
+            return p
+    return paths[0]
+
+
+def kv(text):
+    # "key value" lines (cpu.stat) or "dev k1=v1 k2=v2" lines (io.stat)
+    r = dict()
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) == 2 and "=" not in parts[1]:
+            r[parts[0]] = float(parts[1])
+            continue
+        for t in parts:
+            if "=" in t:
+                k, v = t.split("=", 1)
+                r[k] = r.get(k, 0.) + float(v)
+    return r
+
+
+def paths(cid):
+    if V2:
+        d = first([os.path.join(CG, "system.slice",
+                                "docker-{}.scope".format(cid)),
+                   os.path.join(CG, "docker", cid)])
+        return (os.path.join(d, "cpu.stat"),
+                os.path.join(d, "memory.current"),
+                os.path.join(d, "io.stat"))
+    return (first([os.path.join(CG, c, "docker", cid, "cpuacct.usage")
+                   for c in ["cpuacct", "cpu,cpuacct"]]),
+            os.path.join(CG, "memory", "docker", cid,
+                         "memory.usage_in_bytes"),
+            os.path.join(CG, "blkio", "docker", cid,
+                         "blkio.throttle.io_service_bytes"))
+
+
+def cpu(p):
+    t = rd(p)
+    if t is None:
+        return NAN
+    if V2:
+        return kv(t).get("usage_usec", NAN) * 1000.
+    return float(t)
+
+
+def mem(p):
+    t = rd(p)
+    return NAN if t is None else float(t)
+
+
+def blk(p):
+    t = rd(p)
+    if t is None:
+        return NAN, NAN
+    if V2:
+        r = kv(t)
+        return r.get("rbytes", 0.), r.get("wbytes", 0.)
+    r, w = 0., 0.
+    for line in t.splitlines():
+        parts = line.split()
+        if len(parts) == 3 and parts[1] == "Read":
+            r += float(parts[2])
+        elif len(parts) == 3 and parts[1] == "Write":
+            w += float(parts[2])
+    return r, w
+
+
+def net(pid):
+    t = rd("/proc/{}/net/dev".format(pid))
+    if t is None:
+        return NAN, NAN
+    rx, tx = 0., 0.
+    for line in t.splitlines()[2:]:
+        name, data = line.split(":", 1)
+        if name.strip() == "lo":
+            continue
+        data = data.split()
+        rx += float(data[0])
+        tx += float(data[8])
+    return rx, tx
+
+
+def stop(*args):
+    sys.exit(0)
+
+
+signal.signal(signal.SIGTERM, stop)
+signal.signal(signal.SIGINT, stop)
+P = [(paths(cid), pid) for _, cid, pid in CONTAINERS]
+FMT = "<{}d".format(1 + 6 * len(P))
+with open(OUT, "wb") as f:
+    f.write((json.dumps({
+        "containers": [n for n, _, _ in CONTAINERS],
+        "fields": ["cpu_ns", "mem_bytes", "net_rx_bytes", "net_tx_bytes",
+                   "blk_read_bytes", "blk_write_bytes"],
+        "rate": RATE,
+        "t_wall": time.time(),
+        "t_monotonic": time.monotonic()}) + "\n").encode())
+    f.flush()
+    t_next = time.monotonic()
+    while True:
+        values = [time.monotonic()]
+        for (p_cpu, p_mem, p_blk), pid in P:
+            values.append(cpu(p_cpu))
+            values.append(mem(p_mem))
+            values.extend(net(pid))
+            values.extend(blk(p_blk))
+        f.write(struct.pack(FMT, *values))
+        t_next += 1. / RATE
+        time.sleep(max(0, t_next - time.monotonic()))
+'''
+
+
+class EmuContainerSampler(object):
+    """
+    Samples cgroup counters (CPU, memory, network, block IO) of all
+    emulated containers in one pass at a fixed rate.
+    Runs as an additional container on the target machine and
+    writes a compact binary file that is collected after each run.
+    """
+
+    def __init__(self, emudocker, rate, image=SAMPLER_IMAGE):
+        self.emudocker = emudocker
+        self.rate = float(rate)
+        self.image = image
+        self.container = None
+        LOG.info("Initialized container sampler with {} Hz ({})"
+                 .format(self.rate, self.image))
+
+    def start(self, containers):
+        """
+        Start sampling the given containers.
+        """
+        self._remove_old_sampler()
+        clist = [[c.name, c.id, c.attrs.get("State", dict()).get("Pid", 0)]
+                 for c in containers]
+        LOG.debug("Starting sampler for: {}".format(clist))
+        self.container = self.emudocker.client.containers.run(
+            self.image,
+            ["python3", "-c", SAMPLER_SCRIPT,
+             json.dumps(clist), str(self.rate), SAMPLER_OUTPUT],
+            name=SAMPLER_NAME,
+            detach=True,
+            pid_mode="host",
+            volumes={CGROUP_ROOT: {"bind": CGROUP_ROOT, "mode": "ro"}})
+
+    def stop(self, dst_path):
+        """
+        Stop sampling and store the samples in dst_path (folder).
+        """
+        if self.container is None:
+            return
+        try:
+            self.container.stop(timeout=SAMPLER_STOP_TIMEOUT)
+            self.emudocker.copy_folder(SAMPLER_NAME, SAMPLER_OUTPUT,
+                                       dst_path)
+        finally:
+            self._remove_old_sampler()
+            self.container = None
+
+    def _remove_old_sampler(self):
+        try:
+            self.emudocker.client.containers.get(SAMPLER_NAME).remove(
+                force=True)
+        except BaseException:
+            pass  # no old sampler
+        self.emudocker.clear_cache(SAMPLER_NAME)
+
+
+def read_samples(path):
+    """
+    Read a samples file written by the sampler.
+    Returns: header dict, numpy array (one row per sample:
+    t, then header["fields"] for each container in header["containers"])
+    """
+    with open(path, "rb") as f:
+        header = json.loads(f.readline().decode())
+        data = np.frombuffer(f.read(), dtype="<f8")
+    n_cols = 1 + len(header.get("fields")) * len(header.get("containers"))
+    # ignore incomplete last record (sampler stopped while writing)
+    n_rows = len(data) // n_cols
+    return header, data[:n_rows * n_cols].reshape(n_rows, n_cols)
+
+
+def samples_to_rows(header, data):
+    """
+    One row (dict) per sample and container.
+    """
+    rows = list()
+    fields = header.get("fields")
+    t0 = data[0, 0] if len(data) > 0 else 0
+    for sample in data:
+        for i, cname in enumerate(header.get("containers")):
+            row = {"timestamp": sample[0] - t0,
+                   "cname": cname.replace("mn.", "")}
+            for j, field in enumerate(fields):
+                row[field] = sample[1 + i * len(fields) + j]
+            rows.append(row)
+    return rows
@@ -0,0 +1,199 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import datetime
+import numpy as np
+import pandas as pd
+from tngsdk.benchmark.logger import TangoLogger
+from tngsdk.benchmark.helper import read_json, write_json
+from tngsdk.benchmark.pdriver.vimemu.emuc import create_session
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+PATH_EX_CONFIG = "ex_config.json"
+PATH_EXPERIMENT_TIMES = "experiment_times.json"
+PATH_PROMETHEUS_TS = "prometheus_ts.csv"  # per run
+PATH_PROMETHEUS_SUMMARY = "prometheus_summary.json"  # per run
+PATH_OUTPUT_PROMETHEUS_TS = "result_prometheus_ts.csv"
+
+DEFAULT_URL = "http://127.0.0.1:9090"  # see prometheus/docker-compose.yml
+DEFAULT_STEP = 1  # seconds
+QUERY_TIMEOUT = 30  # seconds
+AGGREGATES = [("mean", np.mean),
+              ("p50", lambda v: np.percentile(v, 50)),
+              ("p95", lambda v: np.percentile(v, 95)),
+              ("max", np.max)]
+
+
+class PrometheusResultProcessor(object):
+    """
+    Fetches the time series of the configured metrics from Prometheus
+    for the time window of each run (experiment_times.json).
+    Stores them per run together with summary aggregates
+    (picked up by VimemuResultProcessor for the result table).
+    Config (.tng-bench.conf):
+        prometheus:
+          url: "http://127.0.0.1:9090"
+          step: 1  # resolution in seconds
+          metrics:  # metric names, fetched with one query per run
+            - "container_cpu_usage_seconds_total"
+    """
+
+    def __init__(self, args, service_experiments, config=None):
+        self.args = args
+        self.result_dir = args.result_dir
+        self.service_experiments = service_experiments
+        if config is None:
+            config = (args.config or dict()).get("prometheus", dict())
+        self.url = config.get("url", DEFAULT_URL).rstrip("/")
+        self.step = config.get("step", DEFAULT_STEP)
+        self.metrics = config.get("metrics", list())
+        self.session = create_session()
+
+    def __repr__(self):
+        return "PrometheusResultProcessor({})".format(self.url)
+
+    def run(self):
+        if not os.path.exists(self.result_dir):
+            LOG.info("Result dir '{}' does not exist. Skipping"
+                     .format(self.result_dir))
+            return
+        if len(self.metrics) < 1:
+            LOG.info("No Prometheus metrics configured. Skipping")
+            return
+        rdlist = sorted([os.path.join(self.result_dir, rd)
+                        for rd in os.listdir(self.result_dir)
+                        if os.path.exists(os.path.join(
+                            self.result_dir, rd, PATH_EXPERIMENT_TIMES))])
+        frames = list()
+        for idx, rd in enumerate(rdlist):
+            try:
+                if (not getattr(self.args, "no_incremental", False)
+                        and os.path.exists(
+                            os.path.join(rd, PATH_PROMETHEUS_SUMMARY))):
+                    # fetched by an earlier pass
+                    frames.append(self.read_run(rd))
+                    continue
+                LOG.info("Fetching Prometheus metrics {}/{}"
+                         .format(idx + 1, len(rdlist)))
+                frames.append(self.process_run(rd))
+            except BaseException as ex:
+                LOG.error("Couldn't fetch Prometheus metrics for {}: {}"
+                          .format(rd, ex))
+        if len(frames) > 0:
+            pd.concat(frames, ignore_index=True).to_csv(
+                os.path.join(self.result_dir, PATH_OUTPUT_PROMETHEUS_TS))
+
+    def process_run(self, rd):
+        """
+        Fetch, store and summarize the time series of a single run.
+        return pandas (time series of the run)
+        """
+        times = read_json(os.path.join(rd, PATH_EXPERIMENT_TIMES))
+        t_start = parse_time(times.get("experiment_start"))
+        t_stop = parse_time(times.get("experiment_stop"))
+        series = self.query_range(t_start, t_stop)
+        rows = list()
+        summary = dict()
+        for name, values in series.items():
+            for ts, v in values:
+                rows.append({"timestamp": ts - t_start,
+                             "series": name,
+                             "value": v})
+            vs = np.array([v for _, v in values])
+            for agg, fun in AGGREGATES:
+                summary["prom__{}__{}".format(name, agg)] = (
+                    float(fun(vs)) if len(vs) > 0 else None)
+        df = pd.DataFrame(rows, columns=["timestamp", "series", "value"])
+        df.to_csv(os.path.join(rd, PATH_PROMETHEUS_TS), index=False)
+        write_json(os.path.join(rd, PATH_PROMETHEUS_SUMMARY), summary)
+        df.insert(0, "run_id", read_json(
+            os.path.join(rd, PATH_EX_CONFIG)).get("run_id", -1))
+        return df
+
+    def read_run(self, rd):
+        """
+        Time series of a single run fetched by an earlier pass.
+        return pandas
+        """
+        df = pd.read_csv(os.path.join(rd, PATH_PROMETHEUS_TS))
+        df.insert(0, "run_id", read_json(
+            os.path.join(rd, PATH_EX_CONFIG)).get("run_id", -1))
+        return df
+
+    def query_range(self, t_start, t_stop):
+        """
+        All configured metrics in a single query_range call.
+        return dict: series name -> list of (timestamp, value)
+        """
+        query = '{{__name__=~"{}"}}'.format(
+            "|".join(self.metrics))
+        r = self.session.get(
+            "{}/api/v1/query_range".format(self.url),
+            params={"query": query,
+                    "start": t_start,
+                    "end": t_stop,
+                    "step": self.step},
+            timeout=QUERY_TIMEOUT)
+        r.raise_for_status()
+        data = r.json()
+        if data.get("status") != "success":
+            raise BaseException("Prometheus query failed: {}"
+                                .format(data.get("error")))
+        result = dict()
+        for s in data.get("data", dict()).get("result", list()):
+            result[get_series_name(s.get("metric", dict()))] = [
+                (float(ts), float(v)) for ts, v in s.get("values", list())]
+        return result
+
+
+def get_series_name(metric):
+    """
+    {"__name__": "cpu", "name": "mn.vnf0"} -> "cpu__name=mn.vnf0"
+    """
+    labels = ["{}={}".format(k, v) for k, v in sorted(metric.items())
+              if k != "__name__"]
+    return "__".join([metric.get("__name__", "")] + labels)
+
+
+def parse_time(s):
+    """
+    Timestamp (str(datetime.now())) of experiment_times.json to epoch.
+    """
+    for fmt in ["%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d %H:%M:%S"]:
+        try:
+            return datetime.datetime.strptime(s, fmt).timestamp()
+        except ValueError:
+            pass
+    raise BaseException("Cannot parse time: {}".format(s))
@@ -30,11 +30,19 @@
 # acknowledge the contributions of their colleagues of the SONATA
 # partner consortium (www.5gtango.eu).
 import os
+import csv
+import json
+import shutil
+import hashlib
+import multiprocessing
 import pandas as pd
 from flatten_dict import flatten
 from tngsdk.benchmark.logger import TangoLogger
 from tngsdk.benchmark.helper import read_json, read_yaml
 from tngsdk.benchmark.helper import dubunderscore_reducer
+from tngsdk.benchmark.pdriver.vimemu.sampler import PATH_SAMPLES
+from tngsdk.benchmark.pdriver.vimemu.sampler import read_samples
+from tngsdk.benchmark.pdriver.vimemu.sampler import samples_to_rows
 
 
 LOG = TangoLogger.getLogger(__name__)
@@ -44,9 +52,29 @@ PATH_EX_CONFIG = "ex_config.json"
 PATH_CONTAINER_MONITORING = "cmon.json"
 PATH_CONTAINER_RESULT = "tngbench_share/result.yml"
 PATH_EXPERIMENT_TIMES = "experiment_times.json"
+PATH_PROMETHEUS_SUMMARY = "prometheus_summary.json"
 
 PATH_OUTPUT_EC_METRICS = "result_ec_metrics.csv"
 PATH_OUTPUT_TS_METRICS = "result_ts_metrics.csv"
+# columnar outputs (--result-format): folders partitioned by
+# experiment=<name>/config_id=<id>/
+PATH_OUTPUT_EC_METRICS_DIR = "result_ec_metrics"
+PATH_OUTPUT_TS_METRICS_DIR = "result_ts_metrics"
+COLUMN_EXPERIMENT = "experiment"
+COLUMN_CONFIG_ID = "param__header__all__config_id"
+TIME_COLUMNS = ["experiment_start", "experiment_stop"]
+# processed runs: run folder -> signature and experiment metrics
+PATH_MANIFEST = "result_manifest.json"
+
+
+def get_metric_column(name):
+    """
+    Column name of a container result metric, e.g.,
+    "mp.output__throughput" -> "metric__mp.output__throughput"
+    """
+    if name.startswith("metric__"):
+        return name
+    return "metric__{}".format(name)
 
 
 class VimemuResultProcessor(object):
@@ -65,51 +93,256 @@ class VimemuResultProcessor(object):
         # gen. list of result folder per experiment run
         rdlist = sorted([os.path.join(self.result_dir, rd)
                         for rd in os.listdir(self.result_dir)
-                        if os.path.isdir(os.path.join(self.result_dir, rd))])
+                        if os.path.isdir(os.path.join(self.result_dir, rd))
+                        and os.path.exists(os.path.join(
+                            self.result_dir, rd, PATH_EX_CONFIG))])
+        result_format = getattr(self.args, "result_format", "csv")
+        if result_format != "csv":
+            self.run_columnar(rdlist, result_format)
+            return
         # read experiment metrics
         df_em = self.read_experiment_metrics(rdlist)
-        # read timeseries metrics
-        # df_tm = self.read_timeseries_metrics(rdlist)
         df_em.info()
-        # df_tm.info()
         # store the data frames
         df_em.to_csv(os.path.join(self.result_dir, PATH_OUTPUT_EC_METRICS))
-        # df_tm.to_csv(os.path.join(self.result_dir, PATH_OUTPUT_TS_METRICS))
+        # read and store timeseries metrics
+        self.write_timeseries_metrics_csv(rdlist)
+        self._store_manifest(self.manifest)
 
-    def read_experiment_metrics(self, rdlist):
+    def write_timeseries_metrics_csv(self, rdlist):
         """
-        return pandas
+        Write the timeseries metrics of all runs to one CSV file.
+        If runs were only added since the last invocation, only the
+        rows of the new runs are parsed and appended to the file.
+        The number of rows of each run is kept in the manifest.
         """
-        rows = list()
+        path = os.path.join(self.result_dir, PATH_OUTPUT_TS_METRICS)
+        header = self._get_appendable_ts_header(path)
+        if header is not None:
+            new_runs = [rd for rd in rdlist if rd not in self.unchanged_runs]
+            ts_rows = self._read_timeseries_rows(new_runs)
+            df_tm = pd.DataFrame(
+                [r for rd in new_runs for r in ts_rows[rd]])
+            if set(df_tm.columns) <= set(header[1:]):
+                LOG.info("Appending timeseries metrics of {} new runs"
+                         .format(len(new_runs)))
+                # continue the index of the existing rows
+                df_tm.index += sum(
+                    self.manifest[os.path.basename(rd)].get("ts_rows")
+                    for rd in self.unchanged_runs)
+                df_tm.reindex(columns=header[1:]).to_csv(
+                    path, mode="a", header=False)
+                self._set_ts_rows(ts_rows)
+                return
+            LOG.info("New timeseries columns: rewriting {}".format(path))
+        ts_rows = self._read_timeseries_rows(rdlist)
+        df_tm = pd.DataFrame([r for rd in rdlist for r in ts_rows[rd]])
+        self._set_ts_rows(ts_rows)
+        if len(df_tm) > 0:  # only if samples were recorded
+            df_tm.info()
+            df_tm.to_csv(path)
+        elif os.path.exists(path):
+            os.remove(path)  # outdated
+
+    def _get_appendable_ts_header(self, path):
+        """
+        Header of the existing timeseries CSV file if new rows can
+        be appended to it: all runs of the last invocation still exist
+        and did not change. None otherwise.
+        """
+        if (len(self.unchanged_runs) < 1
+                or not os.path.exists(path)
+                or self.previous_runs != set(
+                    os.path.basename(rd) for rd in self.unchanged_runs)
+                or any(self.manifest[os.path.basename(rd)].get("ts_rows")
+                       is None for rd in self.unchanged_runs)):
+            return None
+        with open(path, "r") as f:
+            return next(csv.reader(f), None)
+
+    def _set_ts_rows(self, ts_rows):
+        for rd, rows in ts_rows.items():
+            self.manifest[os.path.basename(rd)]["ts_rows"] = len(rows)
+
+    def run_columnar(self, rdlist, result_format):
+        """
+        Write the results as Parquet/Feather files, partitioned by
+        experiment and config_id. Time series are written run by run.
+        """
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise BaseException(
+                "Result format '{}' requires pyarrow to be installed."
+                .format(result_format))
+        # experiment metrics
+        df_em = convert_dtypes(self.read_experiment_metrics(rdlist))
+        dst = os.path.join(self.result_dir, PATH_OUTPUT_EC_METRICS_DIR)
+        shutil.rmtree(dst, ignore_errors=True)
+        if len(df_em) > 0:
+            if COLUMN_CONFIG_ID not in df_em.columns:
+                df_em[COLUMN_CONFIG_ID] = -1
+            df_em[COLUMN_CONFIG_ID] = df_em[COLUMN_CONFIG_ID].fillna(-1)
+            for (ex, cid), df in df_em.groupby(
+                    [COLUMN_EXPERIMENT, COLUMN_CONFIG_ID]):
+                write_partition(df, dst, ex, cid, "part-0", result_format)
+        df_em.info()
+        # timeseries metrics (one file per run, never all in memory)
+        dst = os.path.join(self.result_dir, PATH_OUTPUT_TS_METRICS_DIR)
+        if len(self.unchanged_runs) < 1:
+            shutil.rmtree(dst, ignore_errors=True)
         for idx, rd in enumerate(rdlist):
-            LOG.info("Processing experiment metrics {}/{}"
+            row = self.unchanged_runs.get(rd)
+            if row is not None and os.path.exists(get_partition_path(
+                    dst, row.get(COLUMN_EXPERIMENT),
+                    row.get(COLUMN_CONFIG_ID),
+                    "run-{:05d}".format(row.get("run_id")), result_format)):
+                continue  # already written
+            LOG.info("Processing timeseries metrics {}/{}"
                      .format(idx + 1, len(rdlist)))
-            row = dict()
             try:
-                # collect data from different sources
-                row.update(self._collect_ecs(rd))
-                row.update(self._collect_times(rd))
-                row.update(self._collect_container_results(rd))
+                df = pd.DataFrame(self._collect_ts(rd))
+                if len(df) < 1:
+                    continue
+                ec = self._collect_ecs(rd)
+                write_partition(
+                    convert_dtypes(df), dst,
+                    ec.get(COLUMN_EXPERIMENT), ec.get(COLUMN_CONFIG_ID),
+                    "run-{:05d}".format(ec.get("run_id")), result_format)
             except IOError as ex:
                 LOG.error("Result corrupted: {}".format(ex))
-            rows.append(row)
-        # to Pandas
-        return pd.DataFrame(rows)
+
+    def read_experiment_metrics(self, rdlist):
+        """
+        Only new or changed runs are parsed, the rows of all other
+        runs are taken from the manifest (if not --no-incremental).
+        return pandas
+        """
+        manifest = dict()
+        if not getattr(self.args, "no_incremental", False):
+            manifest = self._load_manifest()
+        self.previous_runs = set(manifest)
+        new_manifest = dict()
+        self.unchanged_runs = dict()  # run folder -> row
+        signatures = dict()
+        for rd in rdlist:
+            signatures[rd] = get_run_signature(rd)
+            entry = manifest.get(os.path.basename(rd), dict())
+            if entry.get("signature") == signatures[rd]:
+                self.unchanged_runs[rd] = entry.get("row")
+        # parse new or changed runs
+        rows = dict(self.unchanged_runs)
+        rows.update(self._read_experiment_metrics_rows(
+            [rd for rd in rdlist if rd not in self.unchanged_runs]))
+        LOG.info("Parsed {} new or changed runs, reused {} runs"
+                 .format(len(rdlist) - len(self.unchanged_runs),
+                         len(self.unchanged_runs)))
+        for rd in rdlist:
+            name = os.path.basename(rd)
+            new_manifest[name] = {
+                "signature": signatures[rd], "row": rows[rd]}
+            if rd in self.unchanged_runs:
+                # number of timeseries rows (CSV output)
+                new_manifest[name]["ts_rows"] = manifest.get(
+                    name).get("ts_rows")
+        self.manifest = new_manifest
+        self._store_manifest(new_manifest)
+        # to Pandas (ordered by run_id)
+        return pd.DataFrame(sorted(
+            [rows[rd] for rd in rdlist],
+            key=lambda r: r.get("run_id", -1)))
+
+    def _read_experiment_metrics_rows(self, rdlist):
+        """
+        Parse the given run folders (in parallel with --result-workers).
+        return dict: run folder -> row
+        """
+        n_workers = min(getattr(self.args, "result_workers", 1),
+                        len(rdlist))
+        if n_workers < 2:
+            rows = dict()
+            for idx, rd in enumerate(rdlist):
+                LOG.info("Processing experiment metrics {}/{}"
+                         .format(idx + 1, len(rdlist)))
+                rows[rd] = self._read_experiment_metrics_row(rd)
+            return rows
+        LOG.info("Processing experiment metrics of {} runs with {} workers"
+                 .format(len(rdlist), n_workers))
+        # spawn: like the generator's worker pool (safe with threads)
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(n_workers) as pool:
+            return dict(zip(rdlist, pool.map(
+                _read_experiment_metrics_row_worker,
+                [(self.args, rd) for rd in rdlist],
+                chunksize=max(1, len(rdlist) // (4 * n_workers)))))
+
+    def _read_experiment_metrics_row(self, rd):
+        row = dict()
+        try:
+            # collect data from different sources
+            row.update(self._collect_ecs(rd))
+            row.update(self._collect_times(rd))
+            row.update(self._collect_container_results(rd))
+            row.update(self._collect_prometheus_summary(rd))
+        except IOError as ex:
+            LOG.error("Result corrupted: {}".format(ex))
+        return row
+
+    def _load_manifest(self):
+        path = os.path.join(self.result_dir, PATH_MANIFEST)
+        if not os.path.exists(path):
+            return dict()
+        try:
+            return read_json(path)
+        except BaseException as ex:
+            LOG.warning("Ignoring broken manifest {}: {}".format(path, ex))
+            return dict()
+
+    def _store_manifest(self, manifest):
+        path = os.path.join(self.result_dir, PATH_MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f, default=str)
+        os.replace(path + ".tmp", path)
+
+    def read_run_metrics(self, rd):
+        """
+        Configuration and metrics of a single (finished) run.
+        return dict (same columns as read_experiment_metrics)
+        """
+        row = dict()
+        row.update(self._collect_ecs(rd))
+        row.update(self._collect_container_results(rd))
+        return row
 
     def read_timeseries_metrics(self, rdlist):
         """
         return pandas
         """
-        rows = list()
+        ts_rows = self._read_timeseries_rows(rdlist)
+        # to Pandas
+        return pd.DataFrame([r for rd in rdlist for r in ts_rows[rd]])
+
+    def _read_timeseries_rows(self, rdlist):
+        """
+        return dict: run folder -> list of timeseries rows
+        """
+        ts_rows = dict()
         for idx, rd in enumerate(rdlist):
             LOG.info("Processing timeseries metrics {}/{}"
                      .format(idx + 1, len(rdlist)))
             try:
-                rows.extend(self._collect_ts_container_monitoring(rd))
+                ts_rows[rd] = self._collect_ts(rd)
             except IOError as ex:
                 LOG.error("Result corrupted: {}".format(ex))
-        # to Pandas
-        return pd.DataFrame(rows)
+                ts_rows[rd] = list()
+        return ts_rows
+
+    def _collect_ts(self, rd):
+        if os.path.exists(os.path.join(rd, PATH_SAMPLES)):
+            return self._collect_ts_samples(rd)
+        if os.path.exists(os.path.join(rd, PATH_CONTAINER_MONITORING)):
+            return self._collect_ts_container_monitoring(rd)
+        return list()
 
     def _collect_ecs(self, rd):
         """
@@ -119,6 +352,9 @@ class VimemuResultProcessor(object):
         jo = read_json(os.path.join(rd, PATH_EX_CONFIG))
         r["run_id"] = jo.get("run_id", -1)
         r["experiment_name"] = jo.get("name")
+        # older results: derive experiment from run name (<ex>_<run_id>)
+        r[COLUMN_EXPERIMENT] = jo.get(
+            "experiment", str(jo.get("name")).rsplit("_", 1)[0])
         if "parameter" in jo:
             for k, v in jo.get("parameter").items():
                 # clean up the parameter keys
@@ -134,6 +370,16 @@ class VimemuResultProcessor(object):
         """
         return read_json(os.path.join(rd, PATH_EXPERIMENT_TIMES))
 
+    def _collect_prometheus_summary(self, rd):
+        """
+        Collect aggregated Prometheus metrics (if fetched)
+        from 'PATH_PROMETHEUS_SUMMARY'
+        """
+        path = os.path.join(rd, PATH_PROMETHEUS_SUMMARY)
+        if not os.path.exists(path):
+            return dict()
+        return read_json(path)
+
     def _collect_container_results(self, rd):
         """
         Collect ECs from '<container_name>/PATH_CONTAINER_RESULT'
@@ -145,13 +391,27 @@ class VimemuResultProcessor(object):
                 yml = read_yaml(os.path.join(rd, cd, PATH_CONTAINER_RESULT))
                 for k, v in yml.items():
                     # add container name as key prefix
-                    k = "metric__{}__{}".format(self._get_clean_cname(cd), k)
+                    k = get_metric_column("{}__{}".format(
+                        self._get_clean_cname(cd), k))
                     r[k] = v
             except BaseException as ex:
                 LOG.warning("Couldn't process all container results: {}"
                             .format(ex))
         return r
 
+    def _collect_ts_samples(self, rd):
+        """
+        Collect time series data from 'PATH_SAMPLES'
+        (written by the container sampler)
+        Returns list of rows (one per sample and container)
+        """
+        header, data = read_samples(os.path.join(rd, PATH_SAMPLES))
+        run_id = read_json(os.path.join(rd, PATH_EX_CONFIG)).get("run_id")
+        rows = samples_to_rows(header, data)
+        for row in rows:
+            row["run_id"] = run_id
+        return rows
+
     def _collect_ts_container_monitoring(self, rd):
         """
         Collect time series data from 'PATH_CONTAINER_MONITORING'
@@ -185,3 +445,74 @@ class VimemuResultProcessor(object):
             r["cname"] = cname
             r.update(flatten(data, reducer=dubunderscore_reducer))
         return r
+
+
+def _read_experiment_metrics_row_worker(task):
+    """
+    Parses a single run folder in a worker process.
+    """
+    args, rd = task
+    return VimemuResultProcessor(args, list())._read_experiment_metrics_row(
+        rd)
+
+
+def convert_dtypes(df):
+    """
+    Use numeric and datetime dtypes instead of strings where possible.
+    Remaining mixed columns are converted to strings.
+    """
+    for c in df.columns:
+        if not (pd.api.types.is_object_dtype(df[c])
+                or pd.api.types.is_string_dtype(df[c])):
+            continue
+        if c in TIME_COLUMNS:
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+            continue
+        try:
+            df[c] = pd.to_numeric(df[c])
+        except (ValueError, TypeError):
+            pass  # not numeric: keep the column as it is
+        if df[c].dtype == object:
+            df[c] = df[c].map(lambda v: v if v is None else str(v))
+    return df
+
+
+def write_partition(df, dst, experiment, config_id, name, result_format):
+    """
+    Write df to dst/experiment=<..>/config_id=<..>/<name>.<format>
+    """
+    path = get_partition_path(dst, experiment, config_id, name,
+                              result_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # partition keys are part of the path
+    df = df.drop(columns=[c for c in [COLUMN_EXPERIMENT, COLUMN_CONFIG_ID]
+                          if c in df.columns]).reset_index(drop=True)
+    if result_format == "feather":
+        df.to_feather(path)
+    else:
+        df.to_parquet(path, index=False)
+
+
+def get_partition_path(dst, experiment, config_id, name, result_format):
+    return os.path.join(
+        dst, "experiment={}".format(experiment),
+        "config_id={}".format(-1 if pd.isnull(config_id)
+                              else int(config_id)),
+        "{}.{}".format(name, result_format))
+
+
+def get_run_signature(rd):
+    """
+    Signature of a run folder based on the names, sizes and
+    modification times of all its files (no need to read them).
+    """
+    h = hashlib.sha1()
+    for root, dirs, files in os.walk(rd):
+        dirs.sort()
+        for fn in sorted(files):
+            path = os.path.join(root, fn)
+            st = os.stat(path)
+            h.update("{}:{}:{}\n".format(
+                os.path.relpath(path, rd), st.st_size,
+                st.st_mtime_ns).encode())
+    return h.hexdigest()
@@ -0,0 +1,197 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import math
+import random
+import itertools as it
+from tngsdk.benchmark.logger import TangoLogger
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+DEFAULT_SEED = 0  # fixed default: same PED -> same sample (--resume)
+STRATEGIES = ["full", "random", "lhs", "sobol", "factorial"]
+
+
+def sample_parameter_space(sampling, radices, rep_pos):
+    """
+    Select points of a mixed-radix parameter space (Cartesian product
+    over sorted keys, last key varies fastest) based on the
+    sampling definition of a PED experiment:
+        {"strategy": "lhs", "budget": 0.05, "seed": 42}
+    The budget is a number of configurations (int) or a fraction
+    of all configurations (float). The repetition dimension
+    (position rep_pos) is not sampled: every selected configuration
+    is executed with all of its repetitions.
+    Returns: sorted list of indices into the full parameter space
+    """
+    n_rep = radices[rep_pos]
+    n_inner = 1
+    for r in radices[rep_pos + 1:]:
+        n_inner *= r
+    c_radices = radices[:rep_pos] + radices[rep_pos + 1:]
+    c_indices = sample_configurations(sampling, c_radices)
+    # map configuration indices to the full space (add repetitions)
+    result = list()
+    for c in c_indices:
+        outer, inner = divmod(c, n_inner)
+        for rep in range(0, n_rep):
+            result.append((outer * n_rep + rep) * n_inner + inner)
+    return sorted(result)
+
+
+def sample_configurations(sampling, radices):
+    """
+    Select budget points of the given mixed-radix space.
+    Returns: sorted list of indices
+    """
+    strategy = sampling.get("strategy", "random")
+    if strategy not in STRATEGIES:
+        raise BaseException("Unknown sampling strategy '{}'. Use one of: {}"
+                            .format(strategy, STRATEGIES))
+    n_total = _product(radices)
+    budget = get_budget(sampling.get("budget"), n_total)
+    rnd = random.Random(sampling.get("seed", DEFAULT_SEED))
+    if strategy == "full" or budget >= n_total:
+        return list(range(0, n_total))
+    if strategy == "random":
+        selected = rnd.sample(range(0, n_total), budget)
+    elif strategy == "lhs":
+        selected = _sample_lhs(radices, budget, rnd)
+    elif strategy == "sobol":
+        selected = _sample_sobol(radices, budget, rnd)
+    elif strategy == "factorial":
+        selected = _sample_factorial(radices, budget)
+    # discrete designs can hit a point twice: fill up randomly
+    selected = set(selected)
+    if strategy != "factorial":
+        while len(selected) < budget:
+            selected.add(rnd.randrange(0, n_total))
+    LOG.info("Sampled {} of {} configurations (strategy: {})"
+             .format(len(selected), n_total, strategy))
+    return sorted(selected)
+
+
+def get_budget(budget, n_total):
+    """
+    Budget as absolute number: int or fraction (float) of n_total.
+    """
+    if budget is None:
+        return n_total
+    if isinstance(budget, float):
+        if budget <= 0 or budget > 1:
+            raise BaseException("Sampling budget fraction must be in (0, 1]")
+        budget = int(math.ceil(budget * n_total))
+    return max(1, min(int(budget), n_total))
+
+
+def _product(radices):
+    n = 1
+    for r in radices:
+        n *= r
+    return n
+
+
+def _to_index(levels, radices):
+    i = 0
+    for lvl, r in zip(levels, radices):
+        i = i * r + lvl
+    return i
+
+
+def _unit_to_index(point, radices):
+    """
+    Map a point of the unit hypercube [0, 1)^d to the parameter space.
+    """
+    return _to_index([min(int(x * r), r - 1)
+                      for x, r in zip(point, radices)], radices)
+
+
+def _sample_lhs(radices, budget, rnd):
+    """
+    Latin hypercube: every dimension is split into budget strata
+    and each stratum is used exactly once.
+    """
+    columns = list()
+    for _ in radices:
+        perm = list(range(0, budget))
+        rnd.shuffle(perm)
+        columns.append([(p + rnd.random()) / budget for p in perm])
+    return [_unit_to_index(point, radices) for point in zip(*columns)]
+
+
+def _sample_sobol(radices, budget, rnd):
+    """
+    Scrambled Sobol sequence (requires scipy>=1.7).
+    """
+    try:
+        from scipy.stats import qmc
+    except ImportError:
+        raise BaseException(
+            "Sampling strategy 'sobol' requires scipy>=1.7 to be installed")
+    sampler = qmc.Sobol(d=len(radices), scramble=True,
+                        seed=rnd.randrange(0, 2**32))
+    # balance properties of Sobol need powers of 2
+    points = sampler.random_base2(m=max(0, (budget - 1).bit_length()))
+    return [_unit_to_index(point, radices) for point in points[:budget]]
+
+
+def _sample_factorial(radices, budget):
+    """
+    Two-level (fractional) factorial design using the lowest and
+    highest value of every parameter with more than one value.
+    A full factorial over the first m factors is created, the other
+    factors are aliased to interactions of these base factors.
+    The design has 2^m >= budget points (more if the budget is too
+    small to alias all factors).
+    """
+    factors = [d for d, r in enumerate(radices) if r > 1]
+    k = len(factors)
+    if k < 1:
+        return [0]
+    m = min(k, max(1, (budget - 1).bit_length()))
+    # need one interaction (generator) per non-base factor
+    while 2**m - m - 1 < k - m:
+        m += 1
+    # generators: interactions of base factors (highest order first)
+    generators = [g for size in range(m, 1, -1)
+                  for g in it.combinations(range(0, m), size)]
+    result = list()
+    for run in it.product([-1, 1], repeat=m):
+        signs = list(run)
+        for g in generators[:k - m]:
+            signs.append(_product([run[f] for f in g]))
+        levels = [0] * len(radices)
+        for d, s in zip(factors, signs):
+            levels[d] = 0 if s < 0 else radices[d] - 1
+        result.append(_to_index(levels, radices))
+    return result
@@ -0,0 +1,202 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import os
+import math
+from tngsdk.benchmark.logger import TangoLogger
+from tngsdk.benchmark.resultprocessor.vimemu import VimemuResultProcessor
+from tngsdk.benchmark.resultprocessor.vimemu import get_metric_column
+
+
+LOG = TangoLogger.getLogger(__name__)
+
+
+KEY_REPETITION = "ep::header::all::repetition"
+KEY_CONFIG_ID = "ep::header::all::config_id"
+DEFAULT_MIN_REPETITIONS = 3
+DEFAULT_CONFIDENCE = .95
+DEFAULT_TOLERANCE = .05  # CI half width relative to the mean
+
+
+class EarlyStopping(object):
+    """
+    Statistical early stopping of repetitions.
+    The experiment's repetitions are the maximum number of runs
+    per configuration. Further repetitions of a configuration are
+    skipped once the confidence intervals of all given metrics are
+    narrow enough.
+    PED (experiment level):
+        early_stopping:
+          metrics: ["mp.output__throughput"]  # result.yml values
+          min_repetitions: 3
+          confidence: 0.95
+          tolerance: 0.05  # max. CI half width relative to the mean
+    """
+
+    def __init__(self, args, experiment):
+        self.args = args
+        self.ex = experiment
+        definition = experiment.early_stopping
+        self.metrics = [get_metric_column(m)
+                        for m in definition.get("metrics", list())]
+        if len(self.metrics) < 1:
+            raise BaseException("Early stopping of '{}' needs metrics."
+                                .format(experiment.name))
+        self.min_repetitions = max(2, int(definition.get(
+            "min_repetitions", DEFAULT_MIN_REPETITIONS)))
+        self.confidence = float(definition.get(
+            "confidence", DEFAULT_CONFIDENCE))
+        self.tolerance = float(definition.get(
+            "tolerance", DEFAULT_TOLERANCE))
+        self.rp = VimemuResultProcessor(args, [experiment])
+        self.started = dict()  # config_id -> names of started ecs
+        self.stopped = set()  # config_ids without further repetitions
+        self.executed = list() if experiment.has_configuration_list() \
+            else None
+        self.n_skipped = 0
+
+    def filter(self, ec_iter):
+        """
+        Yields all configurations of ec_iter, except repetitions
+        of configurations that are already precise enough.
+        """
+        for ec in ec_iter:
+            if not self.skip(ec):
+                yield ec
+        self.finish()
+
+    def skip(self, ec):
+        """
+        True if ec is a repetition of a configuration that is
+        already precise enough. Otherwise, ec is counted as started.
+        """
+        if self._is_stable(ec):
+            self.n_skipped += 1
+            LOG.debug("Early stopping: skipping '{}'".format(ec))
+            return True
+        self.started.setdefault(
+            ec.parameter.get(KEY_CONFIG_ID), list()).append(ec.name)
+        if self.executed is not None:
+            self.executed.append(ec)
+        return False
+
+    def finish(self):
+        """
+        Called after the last configuration. The experiment only keeps
+        the executed configurations (if it keeps a list at all).
+        """
+        LOG.info("Early stopping: skipped {} repetitions of '{}'"
+                 .format(self.n_skipped, self.ex.name))
+        if self.executed is not None:
+            self.ex.experiment_configurations = self.executed
+
+    def _is_stable(self, ec):
+        cid = ec.parameter.get(KEY_CONFIG_ID)
+        if cid in self.stopped:
+            return True
+        started = self.started.get(cid, list())
+        if len(started) < self.min_repetitions:
+            return False
+        # only finished runs have results
+        runs = [r for r in (self._read_metrics(n) for n in started)
+                if r is not None]
+        if len(runs) < self.min_repetitions:
+            return False
+        for m in self.metrics:
+            values = [r.get(m) for r in runs if r.get(m) is not None]
+            if len(values) < self.min_repetitions:
+                return False
+            mean, half_width = confidence_interval(values, self.confidence)
+            if half_width > self.tolerance * abs(mean):
+                return False
+        LOG.info("Early stopping: config {} stable after {} repetitions"
+                 .format(cid, len(runs)))
+        self.stopped.add(cid)
+        self.started.pop(cid, None)
+        return True
+
+    def _read_metrics(self, ec_name):
+        rd = os.path.join(self.args.result_dir, ec_name)
+        if not os.path.exists(rd):
+            return None
+        try:
+            r = self.rp.read_run_metrics(rd)
+        except BaseException as ex:
+            LOG.debug("Early stopping: no results in {}: {}".format(rd, ex))
+            return None
+        r = {m: float(r.get(m)) for m in self.metrics
+             if r.get(m) is not None}
+        return r if len(r) > 0 else None
+
+
+def confidence_interval(values, confidence=DEFAULT_CONFIDENCE):
+    """
+    Mean and half width of the (Student's t) confidence interval.
+    """
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, float("inf")
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    t = t_quantile(1 - (1 - confidence) / 2, n - 1)
+    return mean, t * math.sqrt(var / n)
+
+
+def norm_quantile(p):
+    """
+    Quantile of the standard normal distribution (bisection on erf).
+    """
+    lo, hi = -10., 10.
+    for _ in range(0, 100):
+        mid = (lo + hi) / 2
+        if .5 * (1 + math.erf(mid / math.sqrt(2))) < p:
+            lo = mid
+        else:
+            hi = mid
+    return (lo + hi) / 2
+
+
+def t_quantile(p, df):
+    """
+    Quantile of Student's t distribution with df degrees of
+    freedom (exact for df <= 2, Cornish-Fisher expansion otherwise).
+    """
+    if df == 1:
+        return math.tan(math.pi * (p - .5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = norm_quantile(p)
+    return (z
+            + (z**3 + z) / (4 * df)
+            + (5 * z**5 + 16 * z**3 + 3 * z) / (96 * df**2)
+            + (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / (384 * df**3)
+            + (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3
+               - 945 * z) / (92160 * df**4))
@@ -0,0 +1,181 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import os
+import time
+import shutil
+import unittest
+import tempfile
+from tngsdk.benchmark import ProfileManager, parse_args
+from tngsdk.benchmark.cache import ContentCache, hash_path
+from tngsdk.benchmark.generator.tango import TangoServiceConfigurationGenerator
+
+
+TEST_PED_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fixtures/unittest_ped1.yml")
+TEST_TNG_PKG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fixtures/5gtango-test-package.tgo")
+
+
+class UnitCacheTests(unittest.TestCase):
+
+    def _create_file(self, size):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"x" * size)
+        return path
+
+    def test_put_get(self):
+        c = ContentCache(tempfile.mkdtemp(), 1024)
+        self.assertIsNone(c.get("files", "a"))
+        src = tempfile.mkdtemp()
+        os.makedirs(os.path.join(src, "sub"))
+        with open(os.path.join(src, "sub", "f.txt"), "w") as f:
+            f.write("data")
+        p = c.put("folders", hash_path(src), src)
+        self.assertEqual(c.get("folders", hash_path(src)), p)
+        with open(os.path.join(p, "sub", "f.txt")) as f:
+            self.assertEqual(f.read(), "data")
+        # inserting an existing entry again is fine
+        self.assertEqual(c.put("folders", hash_path(src), src), p)
+        # content changes result in a new key
+        with open(os.path.join(src, "sub", "f.txt"), "w") as f:
+            f.write("changed")
+        self.assertIsNone(c.get("folders", hash_path(src)))
+
+    def test_evict_lru(self):
+        c = ContentCache(tempfile.mkdtemp(), 1000)
+        c.put("files", "a", self._create_file(400))
+        c.put("files", "b", self._create_file(400))
+        # use a: b is now the least recently used one
+        past = time.time() - 10
+        os.utime(os.path.join(c.path, "files", "a"), (past, past))
+        os.utime(os.path.join(c.path, "files", "b"), (past - 10, past - 10))
+        c.get("files", "a")
+        c.put("files", "c", self._create_file(400))
+        self.assertIsNotNone(c.get("files", "a"))
+        self.assertIsNone(c.get("files", "b"))
+        self.assertIsNotNone(c.get("files", "c"))
+        # larger than the cache: only the new entry is kept
+        c.put("files", "d", self._create_file(2000))
+        self.assertEqual(os.listdir(os.path.join(c.path, "files")), ["d"])
+
+    def test_running_size(self):
+        scans = list()
+
+        class CountingCache(ContentCache):
+            def _list_entries(self):
+                scans.append(1)
+                return super()._list_entries()
+
+        c = CountingCache(tempfile.mkdtemp(), 1000)
+        for i in range(0, 10):
+            c.put("files", str(i), self._create_file(50))
+        # counted once, then updated on each insert
+        self.assertEqual(len(scans), 1)
+        self.assertEqual(c.size, 500)
+        # existing entries are kept and not counted twice
+        c.put("files", "0", self._create_file(60))
+        self.assertEqual(c.size, 500)
+        self.assertEqual(os.path.getsize(c.get("files", "0")), 50)
+        for i in range(10, 20):
+            c.put("files", str(i), self._create_file(50))
+        self.assertLessEqual(c.size, 1000)
+        self.assertEqual(c.size, c._count_size())
+
+    def test_base_project_cache(self):
+        args = parse_args(["-p", "unused",
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp()])
+        unpacked = list()
+
+        class CountingGenerator(TangoServiceConfigurationGenerator):
+            def _unpack(self, pkg_path, proj_path):
+                unpacked.append(pkg_path)
+                return super()._unpack(pkg_path, proj_path)
+
+        p1 = CountingGenerator(args)._get_base_project(TEST_TNG_PKG)
+        p2 = CountingGenerator(args)._get_base_project(TEST_TNG_PKG)
+        self.assertEqual(len(unpacked), 1)
+        self.assertTrue(os.path.exists(os.path.join(p2, "project.yml")))
+        self.assertEqual(hash_path(p1), hash_path(p2))
+        # the used base project is not the cache entry (can be evicted)
+        self.assertFalse(p2.startswith(args.cache_dir))
+        shutil.rmtree(args.cache_dir)
+        self.assertTrue(os.path.exists(os.path.join(p2, "project.yml")))
+        # opt-out
+        args.no_cache = True
+        CountingGenerator(args)._get_base_project(TEST_TNG_PKG)
+        self.assertEqual(len(unpacked), 2)
+
+    def test_package_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        packed = list()
+
+        class CountingGenerator(TangoServiceConfigurationGenerator):
+            def _pack(self, proj_path, pkg_path):
+                packed.append(pkg_path)
+                return super()._pack(proj_path, pkg_path)
+
+        def generate(ped_update=None):
+            args = parse_args(["-p", TEST_PED_FILE,
+                               "--work-dir", tempfile.mkdtemp(),
+                               "--cache-dir", cache_dir])
+            p = ProfileManager(args)
+            ped = p._load_ped_file(p.args.ped)
+            if ped_update is not None:
+                ped_update(ped.get("service_experiments")[0])
+            ex_list, _ = p._generate_experiment_specifications(ped)
+            CountingGenerator(args).generate(TEST_TNG_PKG, None, ex_list)
+            for ec in ex_list[0].experiment_configurations:
+                self.assertTrue(os.path.exists(ec.package_path))
+                self.assertTrue(os.path.exists(ec.project_path))
+            return ex_list[0].experiment_configurations
+
+        # cmd_start does not change the packages: 8 distinct ones
+        generate()
+        self.assertEqual(len(packed), 8)
+        # nothing changed
+        generate()
+        self.assertEqual(len(packed), 8)
+
+        def update(ex):
+            ex["time_limit"] = 60
+            ex["experiment_parameters"][0]["cpu_bw"]["max"] = 0.25
+
+        # additional cpu_bw value: 2 new packages (mem_max: 64, 128)
+        ecs = generate(update)
+        self.assertEqual(len(ecs), 40)
+        self.assertEqual(len(packed), 10)
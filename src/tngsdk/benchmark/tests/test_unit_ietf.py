@@ -0,0 +1,141 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import os
+import unittest
+import tempfile
+from tngsdk.benchmark import ProfileManager, parse_args
+from tngsdk.benchmark.generator.tango import TangoServiceConfigurationGenerator
+from tngsdk.benchmark.ietf import IetfBmwgVnfBD_Generator
+from tngsdk.benchmark.ietf import load_bd, iter_bds
+from tngsdk.benchmark.ietf.patch import make_patch, apply_patch
+
+
+# get path to our test files
+TEST_PED_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fixtures/unittest_ped1.yml")
+TEST_TNG_PKG = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "fixtures/5gtango-test-package.tgo")
+TEST_CONFIG = {"targets": [{"name": "unittest",
+                            "description": "unittest target",
+                            "pdriver": "vimemu",
+                            "pdriver_config": {"host": "127.0.0.1"}}]}
+
+
+class UnitIetfBmwgVnfBDTests(unittest.TestCase):
+
+    def _generate_experiments(self, args):
+        p = ProfileManager(args)
+        ped = p._load_ped_file(p.args.ped)
+        ped.get("service_experiments")[0]["target"] = {
+            "vendor": "eu.5gtango", "name": "ns-1vnf", "version": "0.1"}
+        ex_list, _ = p._generate_experiment_specifications(ped)
+        g = TangoServiceConfigurationGenerator(args)
+        g.generate(TEST_TNG_PKG, None, ex_list)
+        args.config = TEST_CONFIG
+        return ex_list
+
+    def _read_bds(self, path):
+        bds = dict()
+        for f in sorted(os.listdir(path)):
+            with open(os.path.join(path, f)) as fh:
+                bds[f] = fh.read()
+        return bds
+
+    def test_bd_matches_model(self):
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--max-experiments", "4",
+                           "--ibbd", tempfile.mkdtemp(),
+                           "--ibbd-validate"])
+        ex_list = self._generate_experiments(args)
+        g = IetfBmwgVnfBD_Generator(args, ex_list)
+        for ec in ex_list[0].experiment_configurations:
+            self.assertEqual(g._build_bd(0, ec), g._build_bd_model(0, ec))
+        g.run()
+        self.assertEqual(len(os.listdir(args.ibbd_dir)), 4)
+
+    def test_bd_workers(self):
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--max-experiments", "4",
+                           "--ibbd", tempfile.mkdtemp()])
+        ex_list = self._generate_experiments(args)
+        IetfBmwgVnfBD_Generator(args, ex_list).run()
+        bds = self._read_bds(args.ibbd_dir)
+        self.assertEqual(len(bds), 4)
+        args.ibbd_dir = tempfile.mkdtemp()
+        args.result_workers = 2
+        IetfBmwgVnfBD_Generator(args, ex_list).run()
+        self.assertEqual(self._read_bds(args.ibbd_dir), bds)
+
+    def test_bd_delta_roundtrip(self):
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--max-experiments", "4",
+                           "--ibbd", tempfile.mkdtemp(),
+                           "--ibbd-mode", "delta"])
+        ex_list = self._generate_experiments(args)
+        g = IetfBmwgVnfBD_Generator(args, ex_list)
+        g.run()
+        self.assertEqual(sorted(os.listdir(args.ibbd_dir)),
+                         ["service_throughput-base-bd.yaml"]
+                         + ["service_throughput_{:05d}-bd.patch.json"
+                            .format(i) for i in range(0, 4)])
+        bds = dict(iter_bds(args.ibbd_dir))
+        for ec in ex_list[0].experiment_configurations:
+            bd = g._build_bd(0, ec)
+            self.assertEqual(bds.get(ec.name), bd)
+            self.assertEqual(load_bd(os.path.join(
+                args.ibbd_dir, "{}-bd.patch.json".format(ec.name))), bd)
+
+    def test_patch(self):
+        src = {"a": 1, "b": [1, 2], "c": {"x/y": "1", "~z": 2}, "d": 0}
+        dst = {"a": 2, "b": [1, 2, 3], "c": {"x/y": "2"}, "e": None}
+        patch = make_patch(src, dst)
+        self.assertEqual(apply_patch(src, patch), dst)
+        self.assertEqual(make_patch(dst, dst), [])
+        # source is not modified
+        self.assertEqual(src["c"], {"x/y": "1", "~z": 2})
+        # replace needs an existing target
+        with self.assertRaises(KeyError):
+            apply_patch(src, [{"op": "replace", "path": "/c/z", "value": 1}])
+        with self.assertRaises(IndexError):
+            apply_patch(src, [{"op": "replace", "path": "/b/2", "value": 1}])
+        self.assertEqual(apply_patch(src, [
+            {"op": "replace", "path": "/b/1", "value": 3}])["b"], [1, 3])
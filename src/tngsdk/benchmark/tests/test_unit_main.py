@@ -35,7 +35,12 @@ import os
 import unittest
 import tempfile
 from tngsdk.benchmark.helper import compute_cartesian_product
+from tngsdk.benchmark.helper import iter_cartesian_product
+from tngsdk.benchmark.helper import get_cartesian_product_element
 from tngsdk.benchmark import ProfileManager, parse_args
+from tngsdk.benchmark.executor import Executor
+from tngsdk.benchmark.adaptive import AdaptiveExplorer
+from tngsdk.benchmark.stopping import t_quantile
 
 
 # get path to our test files
@@ -173,3 +178,248 @@ class UnitHelperTests(unittest.TestCase):
         self.assertEqual(len(result), len(OUTPUT))
         for d in result:
             self.assertTrue(_dict_is_in_list(d, OUTPUT))
+
+    def test_populate_config_ids(self):
+        """
+        Test that repetitions of a configuration share its config_id.
+        """
+        args = parse_args(["-p", TEST_PED_FILE])
+        p = ProfileManager(args)
+        ped = p._load_ped_file(p.args.ped)
+        ped.get("service_experiments")[0]["repetitions"] = 3
+        se, _ = p._generate_experiment_specifications(ped)
+        ids = dict()
+        for ec in se[0].experiment_configurations:
+            c = dict(ec.parameter)
+            del c["ep::header::all::repetition"]
+            cid = c.pop("ep::header::all::config_id")
+            ids.setdefault(str(sorted(c.items())), set()).add(cid)
+        self.assertEqual(len(ids), 32)
+        self.assertEqual(sorted(min(v) for v in ids.values()),
+                         list(range(32)))
+        self.assertTrue(all(len(v) == 1 for v in ids.values()))
+
+
+class DummyDriver(object):
+    """
+    Platform driver stand-in that only records executed configurations.
+    """
+
+    def __init__(self, name, executed, result_dir=None, metric=None):
+        self.name = name
+        self.executed = executed
+        # optional: write a result for each run: metric(ec)
+        self.result_dir = result_dir
+        self.metric = metric
+
+    def setup_platform(self):
+        pass
+
+    def setup_experiment(self, ec):
+        pass
+
+    def execute_experiment(self, ec):
+        self.executed.append((self.name, ec.name))
+        if self.metric is None:
+            return
+        path = os.path.join(self.result_dir, ec.name,
+                            "mn.mp.output", "tngbench_share")
+        os.makedirs(path)
+        with open(os.path.join(path, "result.yml"), "w") as f:
+            f.write("throughput: {}\n".format(self.metric(ec)))
+
+    def teardown_experiment(self, ec):
+        pass
+
+    def teardown_platform(self):
+        pass
+
+
+class UnitExecutorTests(unittest.TestCase):
+
+    def _get_executor(self, targets, all_targets, repetitions=None):
+        executed = list()
+
+        class DummyExecutor(Executor):
+            def _load_pdriver(self, t):
+                return DummyDriver(t.get("name"), executed)
+
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "-rd", tempfile.mkdtemp()])
+        p = ProfileManager(args)
+        args.all_targets = all_targets
+        args.config = {"targets": [{"name": n, "pdriver": "dummy"}
+                                   for n in targets]}
+        ped = p._load_ped_file(p.args.ped)
+        if repetitions is not None:
+            ped.get("service_experiments")[0]["repetitions"] = repetitions
+        se, _ = p._generate_experiment_specifications(ped)
+        return DummyExecutor(args, se), se, executed
+
+    def test_run_default_target(self):
+        exe, se, executed = self._get_executor(["default", "t2"], False)
+        self.assertEqual(len(exe.pd_list), 1)
+        exe.setup()
+        exe.run()
+        exe.teardown()
+        self.assertEqual(len(executed), 32)
+        self.assertEqual(set(n for n, _ in executed), {"default"})
+
+    def test_run_all_targets(self):
+        exe, se, executed = self._get_executor(
+            ["default", "t2", "t3"], True)
+        self.assertEqual(len(exe.pd_list), 3)
+        exe.setup()
+        exe.run()
+        exe.teardown()
+        # every configuration is executed exactly once
+        self.assertEqual(
+            sorted(ecn for _, ecn in executed),
+            sorted(ec.name for ec in se[0].experiment_configurations))
+
+    def test_run_early_stopping(self):
+        exe, se, executed = self._get_executor(
+            ["default"], False, repetitions=6)
+        se[0].early_stopping = {"metrics": ["mp.output__throughput"],
+                                "min_repetitions": 3,
+                                "tolerance": 0.05}
+
+        def metric(ec):
+            # odd configurations are noisy
+            cid = ec.parameter.get("ep::header::all::config_id")
+            rep = ec.parameter.get("ep::header::all::repetition")
+            return 100 + (cid % 2) * (rep % 2) * 50
+
+        exe.pd_list = [("default", DummyDriver(
+            "default", executed, exe.args.result_dir, metric))]
+        se[0].materialize_configurations()
+        exe.run()
+        # 16 stable configs with 3 runs, 16 noisy configs with 6 runs
+        self.assertEqual(len(executed), 16 * 3 + 16 * 6)
+        self.assertEqual(len(se[0].experiment_configurations), len(executed))
+
+    def test_t_quantile(self):
+        # two-sided 95% quantiles (tables)
+        for df, t in [(1, 12.706), (2, 4.303), (3, 3.182),
+                      (5, 2.571), (30, 2.042)]:
+            self.assertAlmostEqual(t_quantile(.975, df), t, delta=.005)
+
+    def test_run_pipelined_early_stopping(self):
+        exe, se, executed = self._get_executor(
+            ["default"], False, repetitions=6)
+        se[0].early_stopping = {"metrics": ["mp.output__throughput"],
+                                "min_repetitions": 3,
+                                "tolerance": 0.05}
+        exe.args.pipeline = True
+        exe.pd_list = [("default", DummyDriver(
+            "default", executed, exe.args.result_dir,
+            lambda ec: 100))]
+        # configurations handed over by the (pipelined) generator
+        exe.run(iter(list(se[0].iter_configurations())))
+        # all configs are stable after 3 runs
+        self.assertEqual(len(executed), 32 * 3)
+
+    def test_run_streamed(self):
+        exe, se, executed = self._get_executor(["default"], False)
+        self.assertFalse(se[0].has_configuration_list())
+        exe.run()
+        self.assertEqual(len(executed), 32)
+        # configurations are created on the fly, never kept in a list
+        self.assertFalse(se[0].has_configuration_list())
+        self.assertEqual(se[0].count_configurations(), 32)
+
+    def test_run_resume(self):
+        exe, se, executed = self._get_executor(["default"], False)
+        ecs = se[0].experiment_configurations
+        # simulate an interrupted execution: 10 finished, 1 incomplete
+        for ec in ecs[:11]:
+            exe._write_experiment_configuration(ec)
+        for ec in ecs[:10]:
+            open(os.path.join(exe.args.result_dir, ec.name,
+                              "experiment_times.json"), "w").close()
+        exe.args.resume = True
+        exe.run()
+        self.assertEqual(len(executed), 22)
+        self.assertEqual(executed[0][1], ecs[10].name)
+        # results of a changed PED cannot be resumed
+        ecs[0].parameter["ep::header::all::time_limit"] = -1
+        with self.assertRaises(BaseException):
+            exe.run()
+
+    def test_run_adaptive(self):
+        exe, se, executed = self._get_executor(["default"], False)
+        p_cpu = "ep::function::eu.5gtango.myvnf.0.1/vdu01::cpu_bw"
+        se[0].adaptive = {"metric": "mp.output__throughput",
+                          "parameters": [p_cpu],
+                          "initial": 2,
+                          "tolerance": 0.1}
+        n_total = len(se[0].experiment_configurations)
+        exe.pd_list = [("default", DummyDriver(
+            "default", executed, exe.args.result_dir,
+            lambda ec: 100 * ec.parameter.get(p_cpu)))]
+        exe.run()
+        # stops before all configurations are executed
+        self.assertLess(len(executed), n_total)
+        self.assertGreaterEqual(len(executed), 2)
+        # only the executed configurations are kept
+        self.assertEqual(
+            sorted(ecn for _, ecn in executed),
+            sorted(ec.name for ec in se[0].experiment_configurations))
+
+    def test_adaptive_partial_results(self):
+        exe, se, executed = self._get_executor(
+            ["default"], False, repetitions=2)
+        se[0].adaptive = {"metric": "mp.output__throughput"}
+        ae = AdaptiveExplorer(exe.args, se[0])
+        driver = DummyDriver("default", executed, exe.args.result_dir,
+                             lambda ec: 100 + 100 * ec.parameter.get(
+                                 "ep::header::all::repetition"))
+        first, second = ae.configs[ae.config_ids[0]]
+        # only the first repetition is finished
+        exe._write_experiment_configuration(first)
+        driver.execute_experiment(first)
+        ae._read_results([0])
+        self.assertEqual(ae.observed.get(0), 100)
+        self.assertNotIn(0, ae.complete)
+        # the mean is updated once all repetitions are finished
+        exe._write_experiment_configuration(second)
+        driver.execute_experiment(second)
+        ae._read_results([0])
+        self.assertEqual(ae.observed.get(0), 150)
+        self.assertIn(0, ae.complete)
+
+
+class UnitSamplingTests(unittest.TestCase):
+
+    def _populate(self, sampling, repetitions=1):
+        args = parse_args(["-p", TEST_PED_FILE])
+        p = ProfileManager(args)
+        ped = p._load_ped_file(p.args.ped)
+        ped.get("service_experiments")[0]["sampling"] = sampling
+        ped.get("service_experiments")[0]["repetitions"] = repetitions
+        se, _ = p._generate_experiment_specifications(ped)
+        return se[0].experiment_configurations
+
+    def test_cartesian_product_element(self):
+        INPUT = {"x": [1, 2, 3], "y": ["value1", "value2"], "z": [0]}
+        for i, d in enumerate(iter_cartesian_product(INPUT)):
+            self.assertEqual(get_cartesian_product_element(INPUT, i), d)
+
+    def test_sampling_strategies(self):
+        full = [ec.parameter for ec in self._populate(None, repetitions=2)]
+        for strategy in ["random", "lhs", "factorial"]:
+            ecs = self._populate(
+                {"strategy": strategy, "budget": 0.25}, repetitions=2)
+            # 8 of 32 configurations, each with two repetitions
+            self.assertEqual(len(ecs), 16)
+            for ec in ecs:
+                # same configuration (and config_id) as in the full space
+                self.assertIn(ec.parameter, full)
+        # the same seed gives the same sample
+        self.assertEqual(
+            [ec.parameter for ec in self._populate(
+                {"strategy": "lhs", "budget": 5, "seed": 3})],
+            [ec.parameter for ec in self._populate(
+                {"strategy": "lhs", "budget": 5, "seed": 3})])
+        with self.assertRaises(BaseException):
+            self._populate({"strategy": "unknown"})
@@ -0,0 +1,118 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import os
+import json
+import unittest
+import tempfile
+import threading
+import http.server
+import urllib.parse
+from tngsdk.benchmark import parse_args
+from tngsdk.benchmark.helper import read_json, write_json
+from tngsdk.benchmark.resultprocessor.prometheus \
+    import PrometheusResultProcessor, parse_time
+
+
+class PrometheusStandIn(http.server.BaseHTTPRequestHandler):
+    """
+    Answers query_range requests with two series (one sample per step).
+    """
+    queries = list()
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        q = dict(urllib.parse.parse_qsl(url.query))
+        PrometheusStandIn.queries.append((url.path, q))
+        start, end = float(q.get("start")), float(q.get("end"))
+        ts = [start + i for i in range(0, int(end - start) + 1)]
+        result = [{"metric": {"__name__": "cpu", "name": n},
+                   "values": [[t, str(f * i)] for i, t in enumerate(ts)]}
+                  for n, f in [("mn.vnf0", 1), ("mn.vnf1", 2)]]
+        body = json.dumps({"status": "success",
+                           "data": {"resultType": "matrix",
+                                    "result": result}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class UnitPrometheusTests(unittest.TestCase):
+
+    def setUp(self):
+        self.srv = http.server.HTTPServer(("127.0.0.1", 0), PrometheusStandIn)
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.srv.shutdown()
+        self.srv.server_close()
+
+    def test_fetch_run_metrics(self):
+        rd = tempfile.mkdtemp()
+        run = os.path.join(rd, "service_throughput_00000")
+        os.makedirs(run)
+        write_json(os.path.join(run, "ex_config.json"), {"run_id": 0})
+        write_json(os.path.join(run, "experiment_times.json"),
+                   {"experiment_start": "2019-01-01 12:00:00.000000",
+                    "experiment_stop": "2019-01-01 12:00:10.500000"})
+        args = parse_args(["-p", "unused", "-rd", rd])
+        PrometheusStandIn.queries = list()
+        rp = PrometheusResultProcessor(
+            args, list(),
+            config={"url": "http://127.0.0.1:{}".format(
+                self.srv.server_port),
+                "metrics": ["cpu", "mem"]})
+        rp.run()
+        # a single (batched) query per run
+        self.assertEqual(len(PrometheusStandIn.queries), 1)
+        path, q = PrometheusStandIn.queries[0]
+        self.assertEqual(path, "/api/v1/query_range")
+        self.assertEqual(q.get("query"), '{__name__=~"cpu|mem"}')
+        self.assertEqual(float(q.get("start")),
+                         parse_time("2019-01-01 12:00:00"))
+        # summary aggregates per run
+        summary = read_json(os.path.join(run, "prometheus_summary.json"))
+        self.assertEqual(summary.get("prom__cpu__name=mn.vnf0__max"), 10)
+        self.assertEqual(summary.get("prom__cpu__name=mn.vnf1__mean"), 10)
+        self.assertEqual(summary.get("prom__cpu__name=mn.vnf1__p50"), 10)
+        self.assertAlmostEqual(
+            summary.get("prom__cpu__name=mn.vnf0__p95"), 9.5)
+        # time series
+        self.assertTrue(os.path.exists(os.path.join(run, "prometheus_ts.csv")))
+        self.assertTrue(os.path.exists(
+            os.path.join(rd, "result_prometheus_ts.csv")))
@@ -0,0 +1,215 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import os
+import json
+import struct
+import unittest
+import tempfile
+import pandas as pd
+from tngsdk.benchmark import parse_args
+from tngsdk.benchmark.helper import write_json
+from tngsdk.benchmark.resultprocessor.vimemu import VimemuResultProcessor
+from tngsdk.benchmark.resultprocessor.vimemu import convert_dtypes
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def create_results(rd, n_runs=4, first_run=0):
+    """
+    Fake results of n_runs runs (two configurations, two repetitions).
+    """
+    for run_id in range(first_run, first_run + n_runs):
+        run = os.path.join(rd, "service_throughput_{:05d}".format(run_id))
+        share = os.path.join(run, "mn.mp.output", "tngbench_share")
+        os.makedirs(share)
+        write_json(os.path.join(run, "ex_config.json"), {
+            "name": os.path.basename(run),
+            "experiment": "service_throughput",
+            "run_id": run_id,
+            "parameter": {"ep::header::all::config_id": run_id // 2,
+                          "ep::header::all::repetition": run_id % 2,
+                          "ep::function::vnf0::cpu_bw": 0.1 * run_id}})
+        write_json(os.path.join(run, "experiment_times.json"), {
+            "experiment_start": "2019-01-01 12:00:00.000000",
+            "experiment_stop": "2019-01-01 12:00:10.000000"})
+        with open(os.path.join(share, "result.yml"), "w") as f:
+            f.write("throughput: '{}'\n".format(100 * run_id))
+        # two samples of one container
+        with open(os.path.join(run, "samples.bin"), "wb") as f:
+            f.write((json.dumps({"containers": ["mn.vnf0"],
+                                 "fields": ["cpu_ns"]}) + "\n").encode())
+            f.write(struct.pack("<4d", 10., 1., 11., 2.))
+
+
+class UnitResultProcessorTests(unittest.TestCase):
+
+    def test_csv(self):
+        rd = tempfile.mkdtemp()
+        create_results(rd)
+        args = parse_args(["-p", "unused", "-rd", rd])
+        VimemuResultProcessor(args, list()).run()
+        df = pd.read_csv(os.path.join(rd, "result_ec_metrics.csv"))
+        self.assertEqual(len(df), 4)
+        df = pd.read_csv(os.path.join(rd, "result_ts_metrics.csv"))
+        self.assertEqual(len(df), 8)
+
+    @unittest.skipIf(pyarrow is None, "pyarrow not installed")
+    def test_parquet(self):
+        rd = tempfile.mkdtemp()
+        create_results(rd)
+        args = parse_args(["-p", "unused", "-rd", rd,
+                           "--result-format", "parquet"])
+        VimemuResultProcessor(args, list()).run()
+        path = os.path.join(rd, "result_ec_metrics")
+        self.assertEqual(sorted(os.listdir(os.path.join(
+            path, "experiment=service_throughput"))),
+            ["config_id=0", "config_id=1"])
+        df = pd.read_parquet(os.path.join(
+            path, "experiment=service_throughput", "config_id=1"))
+        self.assertEqual(sorted(df["run_id"]), [2, 3])
+        # numbers and times are not stored as strings
+        self.assertEqual(
+            df["metric__mp.output__throughput"].dtype.kind, "i")
+        self.assertEqual(df["experiment_start"].dtype.kind, "M")
+        # one time series file per run
+        path = os.path.join(rd, "result_ts_metrics",
+                            "experiment=service_throughput", "config_id=0")
+        self.assertEqual(sorted(os.listdir(path)),
+                         ["run-00000.parquet", "run-00001.parquet"])
+        df = pd.read_parquet(os.path.join(path, "run-00001.parquet"))
+        self.assertEqual(list(df["cpu_ns"]), [1., 2.])
+
+    def test_convert_dtypes(self):
+        df = convert_dtypes(pd.DataFrame({
+            "n": ["1", "2"], "f": [.5, "1.5"], "s": ["a", 1],
+            "experiment_start": ["2019-01-01 12:00:00", None]}))
+        self.assertEqual(df["n"].dtype.kind, "i")
+        self.assertEqual(df["f"].dtype.kind, "f")
+        # not numeric: strings only
+        self.assertEqual(list(df["s"]), ["a", "1"])
+        self.assertEqual(df["experiment_start"].dtype.kind, "M")
+
+    def test_incremental(self):
+        rd = tempfile.mkdtemp()
+        create_results(rd)
+        args = parse_args(["-p", "unused", "-rd", rd])
+        parsed = list()
+
+        class CountingResultProcessor(VimemuResultProcessor):
+            def _read_experiment_metrics_row(self, rd):
+                parsed.append(os.path.basename(rd))
+                return super()._read_experiment_metrics_row(rd)
+
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 4)
+        # nothing changed: use the manifest
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 4)
+        # one changed and one new run
+        with open(os.path.join(rd, "service_throughput_00001",
+                               "mn.mp.output", "tngbench_share",
+                               "result.yml"), "w") as f:
+            f.write("throughput: 42\n")
+        create_results(os.path.join(rd, "new"), n_runs=1)
+        os.rename(os.path.join(rd, "new", "service_throughput_00000"),
+                  os.path.join(rd, "service_throughput_00004"))
+        os.rmdir(os.path.join(rd, "new"))
+        path = os.path.join(rd, "service_throughput_00004", "ex_config.json")
+        with open(path) as f:
+            ex_config = json.load(f)
+        ex_config["run_id"] = 4
+        write_json(path, ex_config)
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(sorted(parsed[4:]), ["service_throughput_00001",
+                                              "service_throughput_00004"])
+        df = pd.read_csv(os.path.join(rd, "result_ec_metrics.csv"))
+        self.assertEqual(len(df), 5)
+        self.assertEqual(list(df["metric__mp.output__throughput"])[1], 42)
+        # opt-out
+        args.no_incremental = True
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 11)
+
+    def test_incremental_timeseries(self):
+        rd = tempfile.mkdtemp()
+        create_results(rd)
+        args = parse_args(["-p", "unused", "-rd", rd])
+        parsed = list()
+
+        class CountingResultProcessor(VimemuResultProcessor):
+            def _collect_ts(self, rd):
+                parsed.append(os.path.basename(rd))
+                return super()._collect_ts(rd)
+
+        path = os.path.join(rd, "result_ts_metrics.csv")
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 4)
+        # nothing changed: nothing parsed
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 4)
+        self.assertEqual(len(pd.read_csv(path)), 8)
+        # new run: only its rows are appended
+        create_results(rd, n_runs=1, first_run=4)
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(parsed[4:], ["service_throughput_00004"])
+        df = pd.read_csv(path, index_col=0)
+        self.assertEqual(list(df.index), list(range(0, 10)))
+        self.assertEqual(list(df["run_id"]), [0, 0, 1, 1, 2, 2, 3, 3, 4, 4])
+        # same result as a complete rewrite
+        args.no_incremental = True
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 10)
+        pd.testing.assert_frame_equal(pd.read_csv(path, index_col=0), df)
+        # changed run: complete rewrite
+        args.no_incremental = False
+        with open(os.path.join(rd, "service_throughput_00001",
+                               "samples.bin"), "ab") as f:
+            f.write(struct.pack("<2d", 12., 3.))
+        CountingResultProcessor(args, list()).run()
+        self.assertEqual(len(parsed), 15)
+        self.assertEqual(len(pd.read_csv(path)), 11)
+
+    def test_result_workers(self):
+        rd = tempfile.mkdtemp()
+        create_results(rd)
+        args = parse_args(["-p", "unused", "-rd", rd, "--no-incremental"])
+        VimemuResultProcessor(args, list()).run()
+        df1 = pd.read_csv(os.path.join(rd, "result_ec_metrics.csv"))
+        args.result_workers = 2
+        VimemuResultProcessor(args, list()).run()
+        df2 = pd.read_csv(os.path.join(rd, "result_ec_metrics.csv"))
+        self.assertEqual(list(df2["run_id"]), [0, 1, 2, 3])
+        pd.testing.assert_frame_equal(df1, df2)
@@ -0,0 +1,94 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import os
+import sys
+import json
+import time
+import signal
+import unittest
+import tempfile
+import subprocess
+from tngsdk.benchmark.pdriver.vimemu.sampler import SAMPLER_SCRIPT
+from tngsdk.benchmark.pdriver.vimemu.sampler import read_samples
+from tngsdk.benchmark.pdriver.vimemu.sampler import samples_to_rows
+
+
+class UnitSamplerTests(unittest.TestCase):
+
+    def _create_cgroup_v1(self, cid):
+        """
+        Fake cgroup (v1) file system with a single container.
+        """
+        cg = tempfile.mkdtemp()
+        files = {
+            "cpuacct/docker/{}/cpuacct.usage": "1000",
+            "memory/docker/{}/memory.usage_in_bytes": "2048",
+            "blkio/docker/{}/blkio.throttle.io_service_bytes":
+            "8:0 Read 10\n8:0 Write 20\n8:0 Total 30\nTotal 30\n"}
+        for path, content in files.items():
+            path = os.path.join(cg, path.format(cid))
+            os.makedirs(os.path.dirname(path))
+            with open(path, "w") as f:
+                f.write(content)
+        return cg
+
+    def test_sampler_script(self):
+        """
+        Run the sampler locally and read its samples.
+        """
+        cg = self._create_cgroup_v1("abc")
+        out = os.path.join(tempfile.mkdtemp(), "samples.bin")
+        p = subprocess.Popen(
+            [sys.executable, "-c", SAMPLER_SCRIPT,
+             json.dumps([["mn.vnf0", "abc", os.getpid()],
+                         ["mn.gone", "xyz", 0]]),
+             "50", out, cg])
+        time.sleep(1)
+        p.send_signal(signal.SIGTERM)
+        p.wait(timeout=5)
+        header, data = read_samples(out)
+        self.assertEqual(header.get("containers"), ["mn.vnf0", "mn.gone"])
+        self.assertGreater(len(data), 10)
+        rows = samples_to_rows(header, data)
+        self.assertEqual(len(rows), 2 * len(data))
+        vnf0 = rows[0]
+        self.assertEqual(vnf0.get("cname"), "vnf0")
+        self.assertEqual(vnf0.get("timestamp"), 0)
+        self.assertEqual(vnf0.get("cpu_ns"), 1000)
+        self.assertEqual(vnf0.get("mem_bytes"), 2048)
+        self.assertEqual(vnf0.get("blk_read_bytes"), 10)
+        self.assertEqual(vnf0.get("blk_write_bytes"), 20)
+        self.assertGreaterEqual(vnf0.get("net_rx_bytes"), 0)
+        # missing containers are NaN
+        self.assertNotEqual(rows[1].get("cpu_ns"), rows[1].get("cpu_ns"))
@@ -0,0 +1,84 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+import sys
+import time
+import json
+import unittest
+import subprocess
+
+
+# must not be loaded by 'import tngsdk.benchmark' and argument parsing
+HEAVY_MODULES = ["pandas",
+                 "numpy",
+                 "docker",
+                 "requests",
+                 "flatten_dict",
+                 "pyangbind",
+                 "tngsdk.package",
+                 "tngsdk.benchmark.ietf.vnf_bd",
+                 "tngsdk.benchmark.executor",
+                 "tngsdk.benchmark.generator.tango"]
+
+# generous upper bound, only catches gross regressions
+MAX_STARTUP_TIME = 5.0  # seconds
+
+
+STARTUP_SCRIPT = """
+import sys
+import json
+import time
+t_start = time.time()
+from tngsdk.benchmark import parse_args
+parse_args(["-p", "unused"])
+print(json.dumps({"time": time.time() - t_start,
+                  "modules": sorted(sys.modules)}))
+"""
+
+
+class UnitStartupTests(unittest.TestCase):
+
+    def _startup(self):
+        # fresh interpreter: other tests already imported everything
+        out = subprocess.check_output([sys.executable, "-c", STARTUP_SCRIPT])
+        return json.loads(out.decode().strip().splitlines()[-1])
+
+    def test_no_heavy_imports(self):
+        r = self._startup()
+        for m in HEAVY_MODULES:
+            self.assertNotIn(m, r.get("modules"))
+
+    def test_startup_time(self):
+        t_start = time.time()
+        r = self._startup()
+        print("Startup: import+parse_args {:.3f}s, process {:.3f}s"
+              .format(r.get("time"), time.time() - t_start))
+        self.assertLess(r.get("time"), MAX_STARTUP_TIME)
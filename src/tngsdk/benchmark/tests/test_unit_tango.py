@@ -37,6 +37,7 @@ import tempfile
 from tngsdk.benchmark.helper import read_yaml
 from tngsdk.benchmark import ProfileManager, parse_args
 from tngsdk.benchmark.generator.tango import TangoServiceConfigurationGenerator
+from tngsdk.benchmark.generator.tango import TangoProject
 
 
 # get path to our test files
@@ -70,7 +71,8 @@ class UnitTangoGeneratorTests(unittest.TestCase):
         Test extraction and loading of test *.son package and the contained
         service.
         """
-        args = parse_args(["-p", TEST_PED_FILE])
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--cache-dir", tempfile.mkdtemp()])
         print(args)
         # unpack
         g = TangoServiceConfigurationGenerator(args)
@@ -80,12 +82,65 @@ class UnitTangoGeneratorTests(unittest.TestCase):
         self.assertTrue(os.path.exists(
             os.path.join(pp, "project.yml")))
 
+    def test_project_model(self):
+        """
+        Test the in-memory project model used for generation.
+        """
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--cache-dir", tempfile.mkdtemp()])
+        g = TangoServiceConfigurationGenerator(args)
+        base = TangoProject.load(g._unpack(TEST_TNG_PKG, tempfile.mkdtemp()))
+        self.assertEqual(len(base.get_vnfds()), 1)
+        prj = base.copy()
+        prj.add_descriptor("mp.yaml", "application/vnd.5gtango.vnfd",
+                           {"name": "mp"})
+        _, nsd = prj.get_nsd()
+        nsd["name"] = "changed"
+        # the base project is not modified
+        self.assertEqual(len(base.get_vnfds()), 1)
+        self.assertNotEqual(base.get_nsd()[1].get("name"), "changed")
+        # write the modified project
+        dst = os.path.join(tempfile.mkdtemp(), "prj")
+        prj.write(dst)
+        self.assertEqual(len(read_yaml(
+            os.path.join(dst, "project.yml")).get("files")),
+            len(base.projd.get("files")) + 1)
+        self.assertTrue(os.path.exists(os.path.join(dst, "mp.yaml")))
+        self.assertEqual(read_yaml(os.path.join(
+            dst, prj.get_nsd()[0])).get("name"), "changed")
+
+    def test_project_write_keeps_base(self):
+        """
+        Test that writing a project never modifies the files of
+        its base project (hard links).
+        """
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--cache-dir", tempfile.mkdtemp()])
+        g = TangoServiceConfigurationGenerator(args)
+        base = TangoProject.load(g._unpack(TEST_TNG_PKG, tempfile.mkdtemp()))
+        nsd_path, _ = base.get_nsd()
+        base_nsd = read_yaml(os.path.join(base.path, nsd_path))
+        prj = base.copy()
+        # not normalized key of the same file
+        prj.descriptors["./{}".format(nsd_path)] = \
+            prj.descriptors.pop(nsd_path)
+        prj.descriptors["./{}".format(nsd_path)]["name"] = "changed"
+        dst = os.path.join(tempfile.mkdtemp(), "prj")
+        # dst exists and links to the base project
+        base.write(dst)
+        prj.write(dst)
+        self.assertEqual(read_yaml(os.path.join(dst, nsd_path)).get("name"),
+                         "changed")
+        self.assertEqual(read_yaml(os.path.join(base.path, nsd_path)),
+                         base_nsd)
+
     def test_generate_projects(self):
         """
         Test the generation of experiment projects / packages using
         the give base package / project and test experiments.
         """
-        args = parse_args(["-p", TEST_PED_FILE, "-v"])
+        args = parse_args(["-p", TEST_PED_FILE, "-v",
+                           "--cache-dir", tempfile.mkdtemp()])
         # generate test experiments based on PED
         ex_list = self._generate_experiments_from_ped(args)
         self.assertEqual(1, len(ex_list))
@@ -151,3 +206,106 @@ class UnitTangoGeneratorTests(unittest.TestCase):
                 # check generated package artifacts exist
                 pkg_p = ec.package_path
                 self.assertTrue(os.path.exists(pkg_p))
+
+    def test_generate_projects_reuse_repetitions(self):
+        """
+        Test that repetitions of a configuration share a single package
+        (also with worker processes).
+        """
+        for n_workers in ["1", "2"]:
+            args = parse_args(["-p", TEST_PED_FILE,
+                               "--work-dir", tempfile.mkdtemp(),
+                               "--cache-dir", tempfile.mkdtemp(),
+                               "--gen-workers", n_workers])
+            p = ProfileManager(args)
+            ped = p._load_ped_file(p.args.ped)
+            ped.get("service_experiments")[0]["repetitions"] = 3
+            ex_list, _ = p._generate_experiment_specifications(ped)
+            ecs = ex_list[0].experiment_configurations
+            self.assertEqual(96, len(ecs))
+            g = TangoServiceConfigurationGenerator(args)
+            g.generate(TEST_TNG_PKG, None, ex_list)
+            self.assertEqual(32, g.stat_n_pkg)
+            self.assertEqual(96, g.stat_n_ec)
+            self.assertEqual(32, len(set(ec.package_path for ec in ecs)))
+            for ec in ecs:
+                self.assertTrue(os.path.exists(ec.package_path))
+                self.assertIsNotNone(ec.vnfds)
+
+    def test_generate_projects_workers(self):
+        """
+        Test the generation of experiment packages with worker processes.
+        """
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--gen-workers", "2"])
+        ex_list = self._generate_experiments_from_ped(args)
+        g = TangoServiceConfigurationGenerator(args)
+        g.generate(TEST_TNG_PKG, None, ex_list)
+        for ec in ex_list[0].experiment_configurations:
+            self.assertIn(ec.name, ec.project_path)
+            self.assertTrue(os.path.exists(ec.package_path))
+            self.assertIn(ec.name, ec.package_path)
+            self.assertIsNotNone(ec.nsd)
+            self.assertEqual(len(ec.vnfds), 3)
+        # only the commands differ: same package content
+        self.assertEqual(8, len(set(
+            ec.package_key
+            for ec in ex_list[0].experiment_configurations)))
+
+    def test_generate_projects_workers_error(self):
+        """
+        Test that a failing worker process fails the generation
+        (instead of blocking it forever).
+        """
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--gen-workers", "2"])
+        ex_list = self._generate_experiments_from_ped(args)
+        g = TangoServiceConfigurationGenerator(args)
+        base = TangoProject.load(g._unpack(TEST_TNG_PKG, tempfile.mkdtemp()))
+        # without NSD, get_nsd raises a BaseException
+        base.projd["files"] = [f for f in base.projd.get("files")
+                               if f.get("path") != base.get_nsd()[0]]
+        with self.assertRaises(BaseException) as cm:
+            list(g._iter_generate_projects(
+                base, ex_list[0].iter_configurations()))
+        self.assertIn("No NSD found", str(cm.exception))
+
+    def test_generate_and_execute_pipelined(self):
+        """
+        Test that the pipelined mode hands over each configuration
+        to the execution as soon as its package exists.
+        """
+        consumed = list()
+
+        class PipelineProfileManager(ProfileManager):
+            def _load_ped_file(self, ped_path):
+                ped = super()._load_ped_file(ped_path)
+                ped.get("service_experiments")[0]["repetitions"] = 3
+                return ped
+
+            def execute_experiments(self, ec_iter=None):
+                for ec in ec_iter:
+                    assert os.path.exists(ec.package_path)
+                    consumed.append(ec)
+
+        args = parse_args(["-p", TEST_PED_FILE,
+                           "--work-dir", tempfile.mkdtemp(),
+                           "--cache-dir", tempfile.mkdtemp(),
+                           "--pipeline", "--no-display"])
+        p = PipelineProfileManager(args)
+        p.populate_experiments()
+        p.ped["service_package"] = TEST_TNG_PKG
+        p.cgen = p.load_generator()
+        p.generate_and_execute_experiments()
+        # PED order: repetitions follow their generated configuration
+        self.assertEqual(
+            [ec.name for ec in consumed],
+            [ec.name for ec
+             in p.service_experiments[0].experiment_configurations])
+        n_switches = sum(1 for a, b in zip(consumed, consumed[1:])
+                         if a.package_path != b.package_path)
+        self.assertEqual(n_switches, 31)
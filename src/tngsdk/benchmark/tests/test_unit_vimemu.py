@@ -0,0 +1,424 @@
+#  Copyright (c) 2018 SONATA-NFV, 5GTANGO, Paderborn University
+# ALL RIGHTS RESERVED.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Neither the name of the SONATA-NFV, 5GTANGO, Paderborn University
+# nor the names of its contributors may be used to endorse or promote
+# products derived from this software without specific prior written
+# permission.
+#
+# This work has been performed in the framework of the SONATA project,
+# funded by the European Commission under Grant number 671517 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.sonata-nfv.eu).
+#
+# This work has also been performed in the framework of the 5GTANGO project,
+# funded by the European Commission under Grant number 761493 through
+# the Horizon 2020 and 5G-PPP programmes. The authors would like to
+# acknowledge the contributions of their colleagues of the SONATA
+# partner consortium (www.5gtango.eu).
+
+
+import io
+import os
+import time
+import tarfile
+import unittest
+import tempfile
+import threading
+from unittest import mock
+from tngsdk.benchmark import parse_args
+from tngsdk.benchmark.pdriver.vimemu import VimEmuDriver
+from tngsdk.benchmark.pdriver.vimemu import dockerc
+
+
+class FakeContainer(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeEmuDocker(object):
+    """
+    Stand-in for EmuDockerClient that records all calls
+    instead of talking to a remote Docker service.
+    """
+
+    def __init__(self, endpoint):
+        self.calls = list()
+        self.containers = [FakeContainer("mn.vnf0.vdu01.0"),
+                           FakeContainer("mn.mp.input.vdu01.0")]
+        # number of failing checks before a container is ready
+        self.ready_after = dict()
+
+    def execute(self, container_name, cmd, logfile, block=False):
+        self.calls.append(("execute", container_name, cmd))
+
+    def execute_all(self, commands, logfile, block=False):
+        for container_name, cmd in commands.items():
+            self.execute(container_name, cmd, logfile, block=block)
+
+    def check(self, container_name, cmd):
+        self.calls.append(("check", container_name, cmd))
+        n = self.ready_after.get(container_name, 0)
+        if n is None or n > 0:
+            if n is not None:
+                self.ready_after[container_name] = n - 1
+            return 1
+        return 0
+
+    def reset_folder(self, container_name, path):
+        self.calls.append(("reset_folder", container_name, path))
+
+    def list_emu_containers(self):
+        return self.containers
+
+    def clear_cache(self, container_name=None):
+        self.calls.append(("clear_cache", container_name))
+
+    def copy_folder(self, container_name, src_path, dst_path):
+        os.makedirs(dst_path, exist_ok=True)
+
+    def store_logs(self, container_name, dst_path, since=None):
+        self.calls.append(("store_logs", container_name, since))
+
+
+class FakeEmuSrv(object):
+
+    def __init__(self):
+        self.calls = list()
+
+    def start_emulation(self):
+        self.calls.append("start")
+
+    def stop_emulation(self):
+        self.calls.append("stop")
+
+    def wait_emulation_ready(self, llcmc):
+        pass
+
+
+class FakeLLCM(object):
+
+    def upload_package(self, pkg_path):
+        return "ns-uuid"
+
+    def instantiate_service(self, uuid):
+        return "nsi-uuid"
+
+    def store_stats(self, path):
+        pass
+
+
+class FakeExperiment(object):
+
+    def __init__(self, readiness_probes=None):
+        self.readiness_probes = readiness_probes
+
+
+class FakeConfiguration(object):
+
+    def __init__(self, name, package_path, experiment=None,
+                 package_key=None):
+        self.name = name
+        self.package_path = package_path
+        self.package_key = package_key
+        self.experiment = experiment or FakeExperiment()
+        self.function_ids = {"vnf0": "vnf0"}
+        self.parameter = {"ep::header::all::time_warmup": 0,
+                          "ep::header::all::time_limit": 0,
+                          "ep::function::vnf0::cmd_start": "./start.sh",
+                          "ep::function::vnf0::cmd_stop": "./stop.sh",
+                          "ep::function::mp.input::cmd_start": "in",
+                          "ep::function::mp.input::cmd_stop": "in_stop",
+                          "ep::function::mp.output::cmd_start": "out",
+                          "ep::function::mp.output::cmd_stop": "out_stop"}
+
+    def __repr__(self):
+        return self.name
+
+
+class UnitVimEmuDriverTests(unittest.TestCase):
+
+    def _get_driver(self, argv=None, config=None):
+        args = parse_args(["-p", "unused", "-rd", tempfile.mkdtemp()]
+                          + (argv or list()))
+        if config is None:
+            config = {"wait_shutdown_time": 0, "wait_padding_time": 0}
+        config["host"] = "127.0.0.1"
+        with mock.patch("tngsdk.benchmark.pdriver.vimemu.EmuDockerClient",
+                        FakeEmuDocker):
+            d = VimEmuDriver(args, config)
+        d.emusrvc = FakeEmuSrv()
+        d.llcmc = FakeLLCM()
+        return d
+
+    def test_reuse_emulation(self):
+        d = self._get_driver(["--reuse-emulation"])
+        d.setup_experiment(FakeConfiguration("r0", "pkg1.tgo"))
+        d.teardown_experiment(FakeConfiguration("r0", "pkg1.tgo"))
+        # same package: the running service is reused
+        d.setup_experiment(FakeConfiguration("r1", "pkg1.tgo"))
+        d.teardown_experiment(FakeConfiguration("r1", "pkg1.tgo"))
+        self.assertEqual(d.emusrvc.calls, ["start"])
+        self.assertEqual(
+            [c for c in d.emudocker.calls if c[0] == "reset_folder"],
+            [("reset_folder", c.name, "/tngbench_share")
+             for c in d.emudocker.containers])
+        # other package: fresh emulation
+        d.setup_experiment(FakeConfiguration("r2", "pkg2.tgo"))
+        self.assertEqual(d.emusrvc.calls, ["start", "stop", "start"])
+        d.teardown_platform()
+        self.assertEqual(d.emusrvc.calls, ["start", "stop", "start", "stop"])
+
+    def test_reuse_emulation_same_content(self):
+        d = self._get_driver(["--reuse-emulation"])
+        # configurations that only differ in their commands
+        d.setup_experiment(FakeConfiguration("r0", "r0.tgo", None, "k1"))
+        d.setup_experiment(FakeConfiguration("r1", "r1.tgo", None, "k1"))
+        self.assertEqual(d.emusrvc.calls, ["start"])
+        d.setup_experiment(FakeConfiguration("r2", "r2.tgo", None, "k2"))
+        self.assertEqual(d.emusrvc.calls, ["start", "stop", "start"])
+
+    def test_no_reuse_emulation(self):
+        d = self._get_driver()
+        # args of older callers do not have the flag
+        del d.args.reuse_emulation
+        for i in range(0, 2):
+            ec = FakeConfiguration("r{}".format(i), "pkg1.tgo")
+            d.setup_experiment(ec)
+            d.teardown_experiment(ec)
+        self.assertEqual(d.emusrvc.calls, ["start", "stop"] * 2)
+
+    def test_logs_of_current_run(self):
+        d = self._get_driver(["--reuse-emulation"])
+        since = list()
+        for i in range(0, 2):
+            ec = FakeConfiguration("r{}".format(i), "pkg1.tgo")
+            t = time.time()
+            d.setup_experiment(ec)
+            d._collect_experiment_results(ec)
+            logs = [c for c in d.emudocker.calls if c[0] == "store_logs"]
+            self.assertEqual(len(logs), 2 * (i + 1))
+            for _, _, s in logs[-2:]:
+                self.assertGreaterEqual(s, t)
+            since.append(logs[-1][2])
+        # logs of the reused containers start with the second run
+        self.assertGreater(since[1], since[0])
+
+    def test_readiness_probe_success(self):
+        d = self._get_driver()
+        probes = [{"function": "vnf0/vdu02", "tcp_port": 80},
+                  {"function": "vnf0", "log_match": "ready"},
+                  {"function": "vnf0", "unit": "vdu03", "cmd": "true"}]
+        ec = FakeConfiguration("r0", "pkg1.tgo", FakeExperiment(probes))
+        d.emudocker.ready_after["vnf0.vdu02.0"] = 2
+        t = time.monotonic()
+        d._wait_warmup(ec, 30)
+        self.assertLess(time.monotonic() - t, 5)
+        checks = [c[1:] for c in d.emudocker.calls if c[0] == "check"]
+        # the port probe needs 3 checks, the others succeed at once
+        self.assertEqual(
+            [n for n, _ in checks],
+            ["vnf0.vdu02.0", "vnf0.vdu01.0", "vnf0.vdu03.0",
+             "vnf0.vdu02.0", "vnf0.vdu02.0"])
+        self.assertEqual(checks[0][1],
+                         ["bash", "-c", "</dev/tcp/127.0.0.1/80"])
+        self.assertEqual(checks[1][1][:3], ["grep", "-qE", "ready"])
+        self.assertEqual(checks[2][1], ["bash", "-c", "true"])
+
+    def test_readiness_probe_timeout(self):
+        d = self._get_driver()
+        probes = [{"function": "vnf0", "cmd": "false"}]
+        ec = FakeConfiguration("r0", "pkg1.tgo", FakeExperiment(probes))
+        d.emudocker.ready_after["vnf0.vdu01.0"] = None  # never ready
+        t = time.monotonic()
+        d._wait_warmup(ec, 1)
+        # falls back to the fixed warmup time
+        self.assertGreaterEqual(time.monotonic() - t, 1)
+        self.assertLess(time.monotonic() - t, 3)
+        self.assertGreater(
+            len([c for c in d.emudocker.calls if c[0] == "check"]), 1)
+        # unknown probes are an error
+        ec = FakeConfiguration("r1", "pkg1.tgo", FakeExperiment(
+            [{"function": "vnf0", "http": "/"}]))
+        with self.assertRaises(BaseException):
+            d._wait_warmup(ec, 1)
+
+    def test_wait_time(self):
+        d = self._get_driver()
+        ec = FakeConfiguration("r0", "pkg1.tgo")
+        # without probes: fixed warmup time
+        t = time.monotonic()
+        d._wait_warmup(ec, .5)
+        self.assertGreaterEqual(time.monotonic() - t, .5)
+        t = time.monotonic()
+        d._wait_time(.3)
+        self.assertGreaterEqual(time.monotonic() - t, .3)
+        self.assertLess(time.monotonic() - t, .6)
+        t = time.monotonic()
+        d._wait_time(0)
+        self.assertLess(time.monotonic() - t, .1)
+
+    def test_execute_experiment_order(self):
+        d = self._get_driver()
+        ec = FakeConfiguration("r0", "pkg1.tgo")
+        d.setup_experiment(ec)
+        d.execute_experiment(ec)
+        self.assertEqual(
+            [c[1:] for c in d.emudocker.calls if c[0] == "execute"],
+            [("vnf0.vdu01.0", "./start.sh"),
+             ("mp.output.vdu01.0", "out"),
+             ("mp.input.vdu01.0", "in"),
+             ("mp.input.vdu01.0", "in_stop"),
+             ("mp.output.vdu01.0", "out_stop"),
+             ("vnf0.vdu01.0", "./stop.sh")])
+        self.assertTrue(os.path.exists(os.path.join(
+            d.args.result_dir, "r0", "experiment_times.json")))
+
+    def test_no_dead_time(self):
+        # default shutdown and padding times
+        d = self._get_driver(config=dict())
+        ec = FakeConfiguration("r0", "pkg1.tgo")
+        d.setup_experiment(ec)
+        t = time.monotonic()
+        d.execute_experiment(ec)
+        # all stop commands returned: no shutdown wait
+        self.assertLess(time.monotonic() - t, 1)
+        # a VNF without stop command: wait for the shutdown time
+        del ec.parameter["ep::function::vnf0::cmd_stop"]
+        d.wait_shutdown_time = .5
+        t = time.monotonic()
+        d.execute_experiment(ec)
+        self.assertGreaterEqual(time.monotonic() - t, .5)
+        # padding is only added without readiness probes
+        ec.parameter["ep::header::all::time_limit"] = 10
+        self.assertEqual(d._experiment_wait_time(ec), 13)
+        ec.experiment.readiness_probes = [{"function": "vnf0", "cmd": "true"}]
+        self.assertEqual(d._experiment_wait_time(ec), 10)
+
+
+class FakeDockerContainer(object):
+
+    def __init__(self, name, files):
+        self.name = name
+        self.files = files  # path -> bytes (for get_archive)
+        self.calls = list()
+        self.exec_delay = 0
+        self.active = 0  # concurrently running exec_run calls
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def exec_run(self, cmd, stdin=False, stdout=False, detach=False):
+        with self.lock:
+            self.calls.append(("exec_run", cmd))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        if not detach:
+            time.sleep(self.exec_delay)
+        with self.lock:
+            self.active -= 1
+        return 0, b""
+
+    def top(self):
+        self.calls.append(("top",))
+
+    def logs(self, since=None):
+        self.calls.append(("logs", since))
+        return b"log output"
+
+    def get_archive(self, path):
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w") as tar:
+            for name, data in self.files.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+        data = buf.getvalue()
+        # Docker streams the archive in chunks
+        return (data[i:i + 100] for i in range(0, len(data), 100)), dict()
+
+
+class FakeDockerClient(object):
+    """
+    Stand-in for docker.DockerClient with a containers collection.
+    """
+    CONTAINERS = dict()
+
+    def __init__(self, base_url=None, timeout=None):
+        self.containers = self
+        self.n_get = 0
+
+    def list(self):
+        return list(FakeDockerClient.CONTAINERS.values())
+
+    def get(self, name):
+        self.n_get += 1
+        return FakeDockerClient.CONTAINERS[name]
+
+
+class UnitEmuDockerClientTests(unittest.TestCase):
+
+    def setUp(self):
+        FakeDockerClient.CONTAINERS = {
+            n: FakeDockerContainer(n, {"tngbench_share/result.yml": b"x: 1"})
+            for n in ["mn.vnf0.vdu01.0", "mn.vnf1.vdu01.0",
+                      "mn.vnf2.vdu01.0", "other"]}
+        with mock.patch.object(dockerc.docker, "DockerClient",
+                               FakeDockerClient), \
+                mock.patch.object(dockerc.docker, "APIClient",
+                                  FakeDockerClient):
+            self.c = dockerc.EmuDockerClient("tcp://127.0.0.1:4998")
+
+    def test_container_cache(self):
+        self.assertEqual(len(self.c.list_emu_containers()), 3)
+        self.c.execute("vnf0.vdu01.0", "./start.sh", "/log")
+        self.c.execute("vnf0.vdu01.0", "./stop.sh", "/log")
+        self.c.store_logs("mn.vnf0.vdu01.0", os.devnull)
+        # handles of listed containers are reused
+        self.assertEqual(self.c.client.n_get, 0)
+        self.c.clear_cache()
+        self.c.execute("vnf0.vdu01.0", "./start.sh", "/log")
+        self.c.execute("vnf0.vdu01.0", "./stop.sh", "/log")
+        self.assertEqual(self.c.client.n_get, 1)
+        # no extra top() round trip without debug logging
+        c = FakeDockerClient.CONTAINERS.get("mn.vnf0.vdu01.0")
+        self.assertNotIn(("top",), c.calls)
+
+    def test_execute_all_concurrent(self):
+        for c in FakeDockerClient.CONTAINERS.values():
+            c.exec_delay = .5
+        commands = {"vnf{}.vdu01.0".format(i): "./stop.sh"
+                    for i in range(0, 3)}
+        t = time.monotonic()
+        self.c.execute_all(commands, "/log", block=True)
+        # all blocking commands run at the same time
+        self.assertLess(time.monotonic() - t, 1.4)
+        for n in commands.keys():
+            c = FakeDockerClient.CONTAINERS.get("mn.{}".format(n))
+            self.assertEqual(len([x for x in c.calls
+                                  if x[0] == "exec_run"]), 1)
+
+    def test_copy_folder_and_logs(self):
+        dst = tempfile.mkdtemp()
+        self.c.copy_folder("mn.vnf0.vdu01.0", "/tngbench_share", dst)
+        with open(os.path.join(dst, "tngbench_share", "result.yml")) as f:
+            self.assertEqual(f.read(), "x: 1")
+        path = os.path.join(dst, "clogs.log")
+        self.c.store_logs("mn.vnf0.vdu01.0", path, since=42.)
+        c = FakeDockerClient.CONTAINERS.get("mn.vnf0.vdu01.0")
+        self.assertIn(("logs", 42.), c.calls)
+        with open(path) as f:
+            self.assertIn("log output", f.read())